@@ -1,23 +1,73 @@
+import asyncio
 import json
+import multiprocessing
+import os
 import pickle
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext
 from copy import copy
+from functools import partial
 from datetime import datetime, timedelta, date
+from itertools import groupby
+from operator import itemgetter
 import sys
 
-from data.database import Database
-from data.regex import trip_RE, dutyday_RE, flights_RE, reserve_RE
-from model.scheduleClasses import Airport, Trip, Route, Equipment, Flight, Itinerary, DutyDay, GroundDuty
+import psycopg2
+
+from data.async_database import AsyncDatabase
+from data.database import Database, QueryStats, Session, savepoint
+from data.migrations import migrate, create_partitions, next_month
+from data.pbs_reader import read_trip_files, read_trips, get_json_trip, match_trip_block
+from data.regex import reserve_RE
+from data.tokenizer import read_json_trips, parse_trip_block
+from data.trip_cache import TripCache, read_cached_json_trips
+from data.trip_writer import save_trips
+from model import async_persistence
+from model.scheduleClasses import Airport, Trip, Route, Equipment, Flight, FlightIndex, Itinerary, DutyDay, GroundDuty, \
+    load_registries_from_db, save_registries, load_registries
 from model.timeClasses import DateTimeTracker
-
-Database.initialise(database="orgutrip", user="postgres", password="0933", host="localhost")
+from model.time_parser import parse_datetime
+
+# Threads building trips, None builds them in worker processes or one by one
+trip_threads = None
+# Each building thread borrows its own connection, besides the one used to store trips
+pool_min_connections = 1
+pool_max_connections = max(10, (trip_threads or 0) + 2)
+Database.initialise(minconn=pool_min_connections, maxconn=pool_max_connections,
+                    database="orgutrip", user="postgres", password="0933", host="localhost")
 source = "C:\\Users\\Xico\\PycharmProjects\\HappyTrip\\data\\iata_tzmap.txt"
+# Viaticum zone given to airports first stored by importing source, those already stored keep theirs
+imported_viaticum = 'low_cost'
 pbs_path = "C:\\Users\\Xico\\Google Drive\\Sobrecargo\\PBS\\2018 PBS\\201808 PBS\\"
 # file_names = ["201806 PBS EJE.txt"]
+# Month the PBS files are for, its trips may reach into the next one. Both months' partitions are created at start
+pbs_month = date(2018, 8, 1)
 file_names = ["201808 PBS vuelos EJE.txt", "201808 PBS vuelos SOB A.txt", "201808 PBS vuelos SOB B.txt"]
 reserve_files = ["201806 PBS reservas EJE.txt", "201806 PBS reservas SOB.txt"]
 pickled_unsaved_trips_file = 'pickled_unsaved_trips'
+# Processes used to build trips while reading PBS files, None builds them one by one
+trip_workers = os.cpu_count()
+# Either 'tokenizer' or 'regex', to read trips from PBS files
+trip_parser = 'tokenizer'
+# Parsed trips are kept here for all months, None parses every trip each time
+trip_cache_file = "C:\\Users\\Xico\\Google Drive\\Sobrecargo\\PBS\\trip_cache.sqlite"
+trip_cache_size = 256 * 2 ** 20
+# Built trips are stored this many at a time
+trip_batch_size = 200
+# Built trips are stored concurrently, this many at once each within its own transaction, None stores them in batches
+# Files are then no longer stored within a single transaction
+trip_saves_in_flight = None
+# Print how many times each statement ran and how long it took after each menu action
+query_stats = False
+# Statements run more than this many times within one menu action are flagged as N+1 queries
+query_n_plus_one = 50
+# Equipments, airports and routes are kept here so that worker processes start warm, None disables it
+registry_snapshot_file = "C:\\Users\\Xico\\Google Drive\\Sobrecargo\\PBS\\registries.pickle"
 session_routes = dict()
 session_equipments = dict()
+# Stored flights, each process loads those for the months it reads
+flight_index = FlightIndex()
 
 
 #
@@ -29,17 +79,22 @@ session_equipments = dict()
 #     return airport
 
 
-def get_route(name: str, origin: Airport, destination: Airport) -> Route:
+def get_route(name: str, origin: Airport, destination: Airport, session: Session = None,
+              postpone: bool = False) -> Route:
     route_key = name + origin.iata_code + destination.iata_code
-    if route_key not in Route._routes:
+    if route_key not in Route._routes and postpone:
+        # Registries are warmed up with every stored route, save_trips stores this one along with its trip
+        route = Route(name=name, origin=origin, destination=destination)
+    elif route_key not in Route._routes:
         # Route has not been loaded from the DB
         route = Route.load_from_db_by_fields(name=name,
                                              origin=origin,
-                                             destination=destination)
+                                             destination=destination,
+                                             session=session)
         if not route:
             # Route must be created and stored into DB
             route = Route(name=name, origin=origin, destination=destination)
-            route.save_to_db()
+            route.save_to_db(session)
     else:
         route = Route._routes[route_key]
     return route
@@ -74,16 +129,18 @@ class DutyDayBlockError(Exception):
         self.duty_day_dict = duty_day_dict
         self.duty_day = duty_day
 
-    def delete_invalid_flights(self):
+    def discard_invalid_flights(self):
+        """Forget the invalid flights built unsaved. Stored ones are left in the DB, to be
+        corrected once the trip is built again without postponing"""
         found_one_after_dh = False
         for flight in self.duty_day.events:
             if not flight.name.isnumeric() or found_one_after_dh:
-                # TODO : Instead of deleting flight, try erasing only the inconsistent data
-                print("Dropping from DataBase flight: {} ".format(flight))
-                flight.delete()
+                if not flight.event_id:
+                    print("Dropping flight: {} ".format(flight))
+                    flight_index.discard(flight)
                 found_one_after_dh = True
 
-    def correct_invalid_events(self):
+    def correct_invalid_events(self, session: Session = None):
         for flight in self.duty_day.events:
             print(flight)
             r = input("Is flight properly built? y/n").capitalize()
@@ -91,7 +148,7 @@ class DutyDayBlockError(Exception):
                 itinerary_string = input("Enter itinerary as string (date, begin, blk) 31052018 2206 0122 ")
                 itinerary = Itinerary.from_string(itinerary_string)
                 flight.scheduled_itinerary = itinerary
-                flight.update_to_db()
+                flight.update_to_db(session)
 
 
 class TripBlockError(Exception):
@@ -111,25 +168,26 @@ class UnbuiltTripError(Exception):
 
 
 def get_flight(dt_tracker: DateTimeTracker, flight_dict: dict,
-               postpone: bool, suggested_blk: str) -> Flight:
+               postpone: bool, suggested_blk: str, session: Session = None) -> Flight:
     # 1. Get the route
     # take into consideration the last 4 digits Because some flights start with 'DH'
     # origin = get_airport(flight_dict['origin'])
     # destination = get_airport(flight_dict['destination'])
     origin = Airport(flight_dict['origin'])
     destination = Airport(flight_dict['destination'])
-    route = get_route(flight_dict['name'][-4:], origin, destination)
+    route = get_route(flight_dict['name'][-4:], origin, destination, session, postpone)
 
     # 2. We need the airline code
     carrier_code = get_carrier(flight_dict)
 
-    # 3. Find the flight in the DB
+    # 3. Find the flight among those stored for its month
     begin = copy(dt_tracker.dt)
-    flight = Flight.load_from_db_by_fields(airline_iata_code=carrier_code,
-                                           scheduled_begin=begin,
-                                           route=route)
+    flight = flight_index.get(airline_iata_code=carrier_code,
+                              scheduled_begin=begin,
+                              route=route,
+                              session=session)
 
-    # 4. Create and store flight if not found in the DB
+    # 4. Create flight if not found in the DB, it is only stored right away if not postponing
     if not flight:
         try:
             if flight_dict['blk'] != '0000':
@@ -165,7 +223,10 @@ def get_flight(dt_tracker: DateTimeTracker, flight_dict: dict,
         equipment = Equipment(flight_dict['equipment'])
         flight = Flight(route=route, scheduled_itinerary=itinerary,
                         equipment=equipment, carrier=carrier_code)
-        flight.save_to_db()
+        if not postpone:
+            flight.save_to_db(session)
+        # Unsaved, it is shared by the next trips built here and stored along with them by save_trips
+        flight_index.add(flight)
     else:
         dt_tracker.forward(str(flight.duration))
 
@@ -186,12 +247,12 @@ def get_carrier(flight_dict):
     return carrier_code
 
 
-def get_duty_day(dt_tracker, duty_day_dict, postpone):
+def get_duty_day(dt_tracker, duty_day_dict, postpone, session: Session = None):
     dt_tracker.start()
     duty_day = DutyDay()
 
     for flight_dict in duty_day_dict['flights']:
-        flight = get_flight(dt_tracker, flight_dict, postpone, suggested_blk=duty_day_dict['crd'])
+        flight = get_flight(dt_tracker, flight_dict, postpone, suggested_blk=duty_day_dict['crd'], session=session)
         if flight:
             duty_day.append(flight)
             dt_tracker.forward(flight_dict['turn'])
@@ -205,13 +266,13 @@ def get_duty_day(dt_tracker, duty_day_dict, postpone):
     return duty_day
 
 
-def get_trip(trip_dict: dict, postpone: bool) -> Trip:
+def get_trip(trip_dict: dict, postpone: bool, session: Session = None) -> Trip:
     dt_tracker = DateTimeTracker(trip_dict['date_and_time'])
     trip = Trip(number=trip_dict['number'], dated=dt_tracker.date)
 
     for json_dd in trip_dict['duty_days']:
         try:
-            duty_day = get_duty_day(dt_tracker, json_dd, postpone)
+            duty_day = get_duty_day(dt_tracker, json_dd, postpone, session)
             trip.append(duty_day)
 
         except DutyDayBlockError as e:
@@ -219,11 +280,12 @@ def get_trip(trip_dict: dict, postpone: bool) -> Trip:
             print("found inconsistent duty day : ")
             print("       ", e.duty_day)
             if postpone:
-                e.delete_invalid_flights()
+                # Postponed trips may be built by worker processes, which neither prompt nor write
+                e.discard_invalid_flights()
                 raise UnbuiltTripError
             else:
                 print("... Correcting for inconsistent duty day: ")
-                e.correct_invalid_events()
+                e.correct_invalid_events(session)
                 print("Corrected duty day")
                 print(e.duty_day)
                 trip.append(e.duty_day)
@@ -231,39 +293,71 @@ def get_trip(trip_dict: dict, postpone: bool) -> Trip:
     return trip
 
 
-def get_json_duty_day(duty_day_dict: dict) -> dict:
+def build_trip(json_trip: dict, position: str, postpone: bool = True, session: Session = None) -> tuple:
     """
-    Given a dictionary containing random duty_day data, turn it into a dictionary
-    that can be stored as a json format
+    Turn a json_trip into a Trip, returns (json_trip, trip) where trip is None
+    whenever it could not be built
     """
-    duty_day_dict['layover_duration'] = duty_day_dict['layover_duration'] if duty_day_dict[
-        'layover_duration'] else '0000'
+    if 'position' not in json_trip:
+        json_trip['position'] = position
+    try:
+        # Within a session, a failing statement only undoes this trip, the next ones are built all the same
+        with savepoint(session):
+            try:
+                trip = get_trip(json_trip, postpone, session)
+            except UnbuiltTripError:
+                trip = None
+        if trip is None:
+            return json_trip, None
+        if trip.duration.no_trailing_zero() != json_trip['tafb']:
+            print(json_trip)
+            raise TripBlockError(json_trip['tafb'], trip)
 
-    # The last flight in a duty_day must be re-arranged
-    dictionary_flights = [f.groupdict() for f in flights_RE.finditer(duty_day_dict['flights'])]
-    duty_day_dict['rls'] = dictionary_flights[-1]['blk']
-    dictionary_flights[-1]['blk'] = dictionary_flights[-1]['turn']
-    dictionary_flights[-1]['turn'] = '0000'
+    except TripBlockError as e:
+        # TODO : Granted, there's a trip block error, what actions should be taken to correct it? (missing)
+        print("trip {0.number} dated {0.dated} {0.duration}"
+              " does not match expected TAFB {1}".format(e.trip, e.expected_block_time))
+        return json_trip, None
 
-    duty_day_dict['flights'] = dictionary_flights
+    except psycopg2.DatabaseError as e:
+        # Some airport or equipment of the trip is not stored, the trip will be built again later
+        print("trip {0} dated {1} not built: {2}".format(json_trip['number'], json_trip['dated'], e))
+        return json_trip, None
 
-    return duty_day_dict
+    trip.position = position
+    return json_trip, trip
 
 
-def get_json_trip(trip_dict: dict) -> dict:
-    """
-    Given a dictionary containing random trip data, turn it into a dictionary
-    that can be stored as a json format
-    """
-    trip_dict['date_and_time'] = trip_dict['dated'] + trip_dict['check_in']
-    dds = list()
+def parse_and_build_trip(trip_dict: dict, position: str) -> tuple:
+    """Same as build_trip, but for a trip_dict as read from the PBS file"""
+    return build_trip(get_json_trip(trip_dict), position)
+
+
+def warm_up_registries():
+    """Load all equipments, airports and routes with one query each and keep a snapshot of them"""
+    load_registries_from_db()
+    if registry_snapshot_file:
+        save_registries(registry_snapshot_file)
+
+
+def initialise_worker(connection_parameters: dict, snapshot_file: str = None):
+    """Every worker process restores the registries' snapshot and opens its own connection pool,
+    only ever used to load flight_index's months. Built trips are stored by the main process"""
+    Database.initialise(**connection_parameters)
+    if snapshot_file and os.path.exists(snapshot_file):
+        load_registries(snapshot_file)
 
-    for duty_day_match in dutyday_RE.finditer(trip_dict['duty_days']):
-        duty_day = get_json_duty_day(duty_day_match.groupdict())
-        dds.append(duty_day)
-    trip_dict['duty_days'] = dds
 
-    return trip_dict
+def ordered_map(executor, fn, iterable, window: int):
+    """Like executor.map, but only window tasks are submitted at a time so that
+    iterable is consumed lazily. Results are yielded in the same order as iterable"""
+    pending = deque()
+    for args in iterable:
+        pending.append(executor.submit(fn, *args))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
 
 
 class DutyInsideTripError(object):
@@ -279,6 +373,7 @@ class Menu:
             "2": self.figure_out_unsaved_trips,
             "3": self.search_for_trip,
             "4": self.read_reserve_file,
+            "5": self.import_airports,
             "10": self.quit}
 
     @staticmethod
@@ -290,6 +385,7 @@ class Menu:
         2. Trabajar con los trips que no pudieron ser creados.
         3. Buscar un trip en especìfico.
         4. Leer los archivos con las reservas.
+        5. Importar los aeropuertos y sus zonas horarias.
         10. Quit
         ''')
 
@@ -300,72 +396,189 @@ class Menu:
             choice = input("¿Qué deseas realizar?: ")
             action = self.choices.get(choice)
             if action:
-                action()
+                with QueryStats.operation(action.__name__):
+                    action()
             else:
                 print("{0} is not a valid choice".format(choice))
 
     def read_trips_file(self):
         unstored_trips = list()
+        positions = dict()
         for file_name in file_names:
-            # 1. Read in and clean the txt.file
-            with open(pbs_path + file_name, 'r') as fp:
-                print("\n file name : ", file_name)
-                position = input("Is this a PBS file for EJE or SOB? ").upper()
-                json_trips = self.create_json_trips(fp.read())
-                pending_trips = self.create_trips(json_trips, position, postpone=True)
+            print("\n file name : ", file_name)
+            positions[pbs_path + file_name] = input("Is this a PBS file for EJE or SOB? ").upper()
+
+        # 1. Stream each file's trips, the next file is read while the current one is being built
+        #    The tokenizer reads json_trips right away, trip_RE's dicts are still to be parsed
+        #    Cached trips are json_trips already, only new or edited ones get parsed
+        parse = trip_parser == 'regex'
+        cache = None
+        if trip_cache_file:
+            cache = TripCache(trip_cache_file, trip_cache_size)
+            reader = partial(read_cached_json_trips, cache=cache,
+                             parse_block=match_trip_block if parse else parse_trip_block)
+            parse = False
+        else:
+            reader = read_trips if parse else read_json_trips
+        trip_files = read_trip_files(list(positions), reader=reader)
+        try:
+            for path, file_trips in groupby(trip_files, key=itemgetter(0)):
+                print("\n reading trips from : ", path)
+                trip_dicts = (trip_dict for _, trip_dict in file_trips)
+                # Each file is stored within a single transaction, unless each trip is saved on its own
+                with Session() if not trip_saves_in_flight else nullcontext() as session:
+                    pending_trips = self.create_trips(trip_dicts, positions[path], postpone=True,
+                                                      workers=trip_workers, parse=parse, session=session,
+                                                      threads=trip_threads)
                 unstored_trips.extend(pending_trips)
+        finally:
+            # The reading thread is done with the cache once trip_files is closed
+            trip_files.close()
+            if cache:
+                print("{} trip blocks read from cache, {} parsed".format(cache.hits, cache.misses))
+                cache.close()
         outfile = open(pbs_path + pickled_unsaved_trips_file, 'wb')
         pickle.dump(unstored_trips, outfile)
         outfile.close()
 
-    def create_json_trips(self, content: str) -> dict:
-        """Given a string content return each json_trip within"""
+    def create_json_trips(self, trip_dicts) -> dict:
+        """Given the trip dicts read from a PBS file return each json_trip within"""
         # 1. Turn each read trip into a clearer dictionary format
-        for trip_match in trip_RE.finditer(content):
-            json_trip = get_json_trip(trip_match.groupdict())
+        for trip_dict in trip_dicts:
+            json_trip = get_json_trip(trip_dict)
             yield json_trip
 
-    def create_trips(self, json_trips, position, postpone=True):
+    def create_trips(self, json_trips, position, postpone=True, workers=None, parse=False, session=None,
+                     threads=None):
+        """Turn each json_trip into a Trip object and store it.
+        If parse is True, json_trips are trip dicts as read from the PBS file.
+        When postponing, trips may be parsed and built by a pool of threads, or else of workers
+        processes, while this one remains the only writer, storing trip_batch_size trips at a time.
+        Given a session, trips are stored within its transaction, as well as built if done one by one"""
         # 2. Turn each trip_dict into a Trip object
         json_trip_count = 0
         unstored_trips = list()
-        for json_trip in json_trips:
-            if 'position' not in json_trip:
-                json_trip['position'] = position
+        built_batch = list()
+        if threads and postpone:
+            # Each thread waits on its own queries while the others keep parsing and building
+            worker = parse_and_build_trip if parse else build_trip
+            built_trips = self.build_trips_in_threads(worker, json_trips, position, threads)
+        elif workers and postpone:
+            worker = parse_and_build_trip if parse else build_trip
+            built_trips = self.build_trips_in_parallel(worker, json_trips, position, workers)
+        else:
+            if parse:
+                json_trips = self.create_json_trips(json_trips)
+            built_trips = (build_trip(json_trip, position, postpone, session) for json_trip in json_trips)
+
+        if trip_saves_in_flight and postpone:
+            if session:
+                raise ValueError("Trips saved concurrently are each committed on their own, "
+                                 "they can't be stored within a session")
+            return self.save_trips_concurrently(built_trips, trip_saves_in_flight)
+
+        for json_trip, trip in built_trips:
             json_trip_count += 1
-            try:
-                # if json_trip['number'] == '3760':
-                #     input("Enter para continuar")
-                trip = get_trip(json_trip, postpone)
-                if trip.duration.no_trailing_zero() != json_trip['tafb']:
-                    print(json_trip)
-                    raise TripBlockError(json_trip['tafb'], trip)
-
-            except TripBlockError as e:
-                # TODO : Granted, there's a trip block error, what actions should be taken to correct it? (missing)
-                print("trip {0.number} dated {0.dated} {0.duration}"
-                      " does not match expected TAFB {1}".format(e.trip, e.expected_block_time))
+            if trip is None:
                 print("Trip {0} dated {1} unsaved!".format(json_trip['number'], json_trip['dated']))
                 unstored_trips.append(json_trip)
+            else:
+                built_batch.append((json_trip, trip))
+                if len(built_batch) >= trip_batch_size:
+                    self.save_trips(built_batch, unstored_trips, session)
+        self.save_trips(built_batch, unstored_trips, session)
 
-            except UnbuiltTripError:
-                print("Trip {0} dated {1} unsaved!".format(json_trip['number'], json_trip['dated']))
-                unstored_trips.append(json_trip)
+        print("{} json trips found ".format(json_trip_count))
+        return unstored_trips
 
-            else:
+    @staticmethod
+    def save_trips(built_batch: list, unstored_trips: list, session: Session = None):
+        """Store all (json_trip, trip) at once and empty the list.
+        Should that fail, each trip is stored on its own and those failing are left unstored"""
+        try:
+            with savepoint(session):
+                save_trips([trip for _, trip in built_batch], session)
+        except psycopg2.DatabaseError:
+            for json_trip, trip in built_batch:
+                try:
+                    trip.save_to_db(session)
+                except psycopg2.DatabaseError as e:
+                    print("Trip {0.number} dated {0.dated} unsaved! {1}".format(trip, e))
+                    unstored_trips.append(json_trip)
+                else:
+                    print("Trip {0.number} dated {0.dated} saved".format(trip))
+        else:
+            for _, trip in built_batch:
                 print("Trip {0.number} dated {0.dated} saved".format(trip))
-                trip.position = position
-                trip.save_to_db()
+                # Flights built unsaved are indexed again with their event_id
+                for duty_day in trip.duty_days:
+                    for flight in duty_day.events:
+                        flight_index.add(flight)
+        built_batch.clear()
 
-        print("{} json trips found ".format(json_trip_count))
+    @staticmethod
+    def save_trips_concurrently(built_trips, in_flight: int) -> list:
+        """Store every (json_trip, trip) with up to in_flight trips being saved at once, while
+        the next ones are still being built. Return the json_trips that could not be built or stored"""
+        unstored_trips = list()
+        json_trips = dict()
+
+        def trips_to_save():
+            for json_trip, trip in built_trips:
+                if trip is None:
+                    print("Trip {0} dated {1} unsaved!".format(json_trip['number'], json_trip['dated']))
+                    unstored_trips.append(json_trip)
+                else:
+                    json_trips[trip] = json_trip
+                    yield trip
+
+        async def save_all():
+            await AsyncDatabase.initialise(min_size=1, max_size=in_flight, **Database.connection_parameters())
+            try:
+                return await async_persistence.save_trips(trips_to_save(), in_flight)
+            finally:
+                await AsyncDatabase.close_all_connections()
+
+        failed = asyncio.run(save_all())
+        for trip, e in failed:
+            print("Trip {0.number} dated {0.dated} unsaved! {1}".format(trip, e))
+            unstored_trips.append(json_trips[trip])
+        print("{} json trips found ".format(len(json_trips) + len(unstored_trips) - len(failed)))
         return unstored_trips
 
+    @staticmethod
+    def build_trips_in_parallel(worker, json_trips, position, workers):
+        """Yield worker's (json_trip, trip) in the same order as json_trips, trips being
+        built by workers processes"""
+        # Workers are spawned instead of forked, so that no pooled connection is shared with them
+        # They start from a fresh snapshot, holding whatever routes were stored so far, and hand
+        # back their trips with new routes and flights unsaved
+        if registry_snapshot_file:
+            save_registries(registry_snapshot_file)
+        with ProcessPoolExecutor(max_workers=workers,
+                                 mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=initialise_worker,
+                                 initargs=(Database.connection_parameters(), registry_snapshot_file)) as executor:
+            yield from ordered_map(executor, worker,
+                                   ((json_trip, position) for json_trip in json_trips),
+                                   window=4 * workers)
+
+    @staticmethod
+    def build_trips_in_threads(worker, json_trips, position, threads):
+        """Yield worker's (json_trip, trip) in the same order as json_trips, trips being
+        built by threads threads, each one with its own pooled connections"""
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            yield from ordered_map(executor, worker,
+                                   ((json_trip, position) for json_trip in json_trips),
+                                   window=4 * threads)
+
     def figure_out_unsaved_trips(self):
         infile = open(pbs_path + pickled_unsaved_trips_file, 'rb')
         unstored_trips = pickle.load(infile)
         print("Building {} unsaved_trips :".format(len(unstored_trips)))
         # 1. Let us go over all trips again, some might now be discarded
-        irreparable_trips = self.create_trips(unstored_trips, None, postpone=False)
+        with Session() as session:
+            irreparable_trips = self.create_trips(unstored_trips, None, postpone=False, session=session)
         print(" {} unsaved_trips".format(len(irreparable_trips)))
         outfile = open(pbs_path + pickled_unsaved_trips_file, 'wb')
         pickle.dump(irreparable_trips, outfile)
@@ -384,30 +597,43 @@ class Menu:
                 print("\n file name : ", file_name)
                 position = input("Is this a PBS file for EJE or SOB? ").capitalize()
                 year = "2018"
-                for reserve_match in reserve_RE.finditer(fp.read()):
-                    reserve_dict = reserve_match.groupdict()
-                    reserve_dict['year'] = year
-                    reserve = self.create_reserve(reserve_dict)
-                    reserve.position = position
-                    reserve.save_to_db()
-
-    def create_reserve(self, rd):
-        formatting = '%d%b%Y%H%M'
-        begin = datetime.strptime(rd['date'] + rd['year'] + rd['begin'], formatting)
-        end = datetime.strptime(rd['date'] + rd['year'] + rd['end'], formatting)
+                with Session() as session:
+                    for reserve_match in reserve_RE.finditer(fp.read()):
+                        reserve_dict = reserve_match.groupdict()
+                        reserve_dict['year'] = year
+                        reserve = self.create_reserve(reserve_dict, session)
+                        reserve.position = position
+                        reserve.save_to_db(session)
+
+    def create_reserve(self, rd, session: Session = None):
+        begin = parse_datetime(rd['date'] + rd['year'] + rd['begin'])
+        end = parse_datetime(rd['date'] + rd['year'] + rd['end'])
         if end < begin:
             end = end - timedelta(days=1)
         itinerary = Itinerary(begin, end)
         origin = Airport('MEX')
         destination = Airport('MEX')
-        route = get_route('0000', origin, destination)
-        route.flight_number = rd['name']
+        route = get_route('0000', origin, destination, session)
         return GroundDuty(route=route, scheduled_itinerary=itinerary)
 
+    @staticmethod
+    def import_airports():
+        started = datetime.now()
+        added, changed, unchanged = Airport.import_time_zones(source, imported_viaticum)
+        print("{} airports added, {} changed and {} unchanged in {}".format(added, changed, unchanged,
+                                                                            datetime.now() - started))
+        Airport.load_all_from_db()
+
     def quit(self):
         print("adiós")
         sys.exit(0)
 
 
 if __name__ == '__main__':
+    if query_stats:
+        QueryStats.enable(query_n_plus_one)
+    migrate()
+    create_partitions(pbs_month)
+    create_partitions(next_month(pbs_month))
+    warm_up_registries()
     Menu().run()
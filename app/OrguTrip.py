@@ -4,6 +4,7 @@ from datetime import datetime, timedelta
 
 import psycopg2
 
+from data.database import QueryStats
 from model import creditator
 # from model.elements import DateTracker
 # from model.payment import compensation_dict, PayCheck
@@ -19,6 +20,8 @@ from model.txtRoster import RosterReader, Liner
 # rolFile = "C:\\Users\\demxi\\Google Drive\\Sobrecargo\\roles\\201802.txt"
 rolFile = "C:\\Users\\Xico\\Google Drive\\Sobrecargo\\Roles\\2018-Roles\\201809.txt"
 summaryFile = "C:\\Users\\Xico\\Google Drive\\Sobrecargo\\Resumen de horas\\2018\\201808-resumen de horas.txt"
+# Print how many times each statement ran and how long it took after each menu action
+query_stats = False
 
 
 class Menu:
@@ -60,7 +63,8 @@ class Menu:
             choice = input("¿Qué deseas realizar?: ")
             action = self.choices.get(choice)
             if action:
-                action()
+                with QueryStats.operation(action.__name__):
+                    action()
             else:
                 print("{0} is not a valid choice".format(choice))
 
@@ -192,4 +196,6 @@ class Menu:
 
 
 if __name__ == '__main__':
+    if query_stats:
+        QueryStats.enable()
     Menu().run()
\ No newline at end of file
@@ -0,0 +1,82 @@
+"""
+Trip.save_to_db one trip after another against async_persistence.save_trips with many saves in flight.
+
+    python -m benchmarks.bench_async [trips] [in_flight]
+
+Needs the orgutrip database used by AdminApp. Synthetic trips are dated in 2099 and,
+together with their flights, removed once done.
+"""
+import asyncio
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+from data.async_database import AsyncDatabase
+from data.database import Database, CursorFromConnectionPool
+from model import async_persistence
+from model.scheduleClasses import Airport, Equipment, Route, Itinerary, Flight, DutyDay, Trip
+
+CONNECTION = dict(database="orgutrip", user="postgres", password="0933", host="localhost")
+FIRST_DAY = date(2099, 1, 1)
+
+
+def synthetic_trips(count: int, first_number: int) -> list:
+    trips = []
+    for i in range(count):
+        dated = FIRST_DAY + timedelta(days=i % 28)
+        trip = Trip(number='{:04d}'.format(first_number + i), dated=dated)
+        trip.position = 'SOB'
+        duty_day = DutyDay()
+        begin = datetime.combine(dated, datetime.min.time()) + timedelta(hours=6, minutes=5 * (i % 144))
+        for name, origin, destination in (('0403', 'MEX', 'GDL'), ('0404', 'GDL', 'MEX')):
+            route = Route(name, Airport(origin), Airport(destination))
+            duty_day.append(Flight(route=route, scheduled_itinerary=Itinerary(begin, begin + timedelta(hours=1)),
+                                   equipment=Equipment('7S8')))
+            begin += timedelta(hours=2)
+        trip.append(duty_day)
+        trips.append(trip)
+    return trips
+
+
+def clean_up():
+    with CursorFromConnectionPool() as cursor:
+        cursor.execute('DELETE FROM public.duty_days WHERE trip_date >= %s', (FIRST_DAY,))
+        cursor.execute('DELETE FROM public.trips WHERE dated >= %s', (FIRST_DAY,))
+        cursor.execute('DELETE FROM public.flights WHERE scheduled_begin >= %s', (FIRST_DAY,))
+
+
+def save_one_by_one(trips):
+    for trip in trips:
+        trip.save_to_db()
+
+
+async def save_concurrently(trips, in_flight):
+    await AsyncDatabase.initialise(min_size=in_flight, max_size=in_flight, **CONNECTION)
+    try:
+        begin = time.perf_counter()
+        failed = await async_persistence.save_trips(trips, in_flight)
+        return time.perf_counter() - begin, failed
+    finally:
+        await AsyncDatabase.close_all_connections()
+
+
+def main(count=500, in_flight=16):
+    Database.initialise(**CONNECTION)
+    clean_up()
+    try:
+        begin = time.perf_counter()
+        save_one_by_one(synthetic_trips(count, 5000))
+        sync_time = time.perf_counter() - begin
+        clean_up()
+        async_time, failed = asyncio.run(save_concurrently(synthetic_trips(count, 5000), in_flight))
+        print("{} trips, {} failed to be saved concurrently".format(count, len(failed)))
+        print("one by one   : {:8.3f} s  {:8.0f} trips/s".format(sync_time, count / sync_time))
+        print("{:3d} in flight : {:8.3f} s  {:8.0f} trips/s".format(in_flight, async_time, count / async_time))
+        print("speedup      : {:8.2f} x".format(sync_time / async_time))
+    finally:
+        clean_up()
+        Database.close_all_connections()
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,61 @@
+"""
+Local times of a month of flights, zoneinfo one flight at a time against the offsets
+compiled by data.tz_table, looked up for every flight at once.
+
+    python -m benchmarks.bench_local_times [flights]
+
+Flights leave from and arrive at airports taken at random from iata_tzmap.txt, at any
+minute of August 2018, their itineraries kept in UTC minutes from epoch.
+"""
+import sys
+import time
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from data import tz_table
+from model.timeClasses import to_epoch_minutes
+
+
+def synthetic_flights(table, count: int) -> tuple:
+    rng = np.random.default_rng(0)
+    begin = to_epoch_minutes(datetime(2018, 8, 1)) + rng.integers(0, 31 * 24 * 60, count)
+    end = begin + rng.integers(30, 16 * 60, count)
+    origins = table.airport_codes[rng.integers(0, len(table.airport_codes), count)]
+    destinations = table.airport_codes[rng.integers(0, len(table.airport_codes), count)]
+    return begin, end, origins.tolist(), destinations.tolist()
+
+
+def zoneinfo_path(table, begin, end, origins, destinations) -> list:
+    zones = [table.zone_names[table.zone_of(iata_code)] for iata_code in origins + destinations]
+    local = []
+    for minutes, zone_name in zip(begin.tolist() + end.tolist(), zones):
+        moment = datetime.fromtimestamp(minutes * 60, timezone.utc).astimezone(ZoneInfo(zone_name))
+        local.append(minutes + int(moment.utcoffset().total_seconds()) // 60)
+    return local
+
+
+def table_path(table, begin, end, origins, destinations) -> np.ndarray:
+    return table.to_local(table.zones_of(origins + destinations), np.concatenate([begin, end]))
+
+
+def main(count: int):
+    table = tz_table.current()
+    flights = synthetic_flights(table, count)
+
+    started = time.perf_counter()
+    expected = zoneinfo_path(table, *flights)
+    zoneinfo_time = time.perf_counter() - started
+    started = time.perf_counter()
+    local = table_path(table, *flights)
+    table_time = time.perf_counter() - started
+
+    print("{} flights, both paths give the same local times: {}".format(count, np.array_equal(expected, local)))
+    print("zoneinfo : {:8.3f} s".format(zoneinfo_time))
+    print("table    : {:8.3f} s".format(table_time))
+    print("speedup  : {:8.1f} x".format(zoneinfo_time / table_time))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 30000)
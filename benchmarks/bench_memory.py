@@ -0,0 +1,72 @@
+"""
+Memory held by the model objects a PBS month is built of.
+
+    python -m benchmarks.bench_memory [flights]
+
+Flights are built the way trips are, four to a duty day, each with its scheduled
+itinerary, over routes and equipments taken from their registries. Bytes are those
+allocated while building, as traced by tracemalloc, divided by how many were built.
+"""
+import sys
+import tracemalloc
+from datetime import datetime, timedelta
+
+from model.scheduleClasses import Airport, Equipment, Route, Itinerary, Flight, DutyDay
+from model.timeClasses import Duration
+
+FIRST_BEGIN = datetime(2018, 8, 1, 6)
+AIRPORTS = ['MEX', 'GDL', 'MTY', 'CUN', 'TIJ', 'JFK', 'LAX', 'MAD']
+
+
+def routes(count: int) -> list:
+    return [Route('{:04d}'.format(i), Airport(AIRPORTS[i % 8]), Airport(AIRPORTS[(i + 1) % 8]))
+            for i in range(count)]
+
+
+def itineraries(count: int) -> list:
+    return [Itinerary.from_timedelta(FIRST_BEGIN + timedelta(minutes=5 * i), timedelta(hours=1, minutes=i % 60))
+            for i in range(count)]
+
+
+def durations(count: int) -> list:
+    return [Duration(i) for i in range(count)]
+
+
+def duty_days(count: int, flights_per_duty_day: int = 4) -> list:
+    """count flights, within duty days of their own"""
+    route_list = list(Route._routes.values())
+    equipment = Equipment('7S8')
+    built = []
+    duty_day = None
+    for i in range(count):
+        if i % flights_per_duty_day == 0:
+            duty_day = DutyDay()
+            built.append(duty_day)
+        begin = FIRST_BEGIN + timedelta(minutes=5 * i)
+        duty_day.append(Flight(route=route_list[i % len(route_list)],
+                               scheduled_itinerary=Itinerary(begin, begin + timedelta(hours=1, minutes=i % 60)),
+                               equipment=equipment))
+    return built
+
+
+def bytes_each(build, count: int) -> float:
+    """Bytes allocated by build(count), for each of the count objects built"""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        built = build(count)
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del built
+    return (after - before) / count
+
+
+def main(count: int):
+    for build, description in [(routes, 'Route'), (durations, 'Duration'), (itineraries, 'Itinerary'),
+                               (duty_days, 'Flight, within a DutyDay')]:
+        print("{:28s} {:8.1f} bytes each".format(description, bytes_each(build, count)))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -0,0 +1,57 @@
+"""
+Creditator.calculate_night_time and has_early_morning_time one event at a time, against
+flight_table.night_minutes and early_morning over arrays of every event at once.
+
+    python -m benchmarks.bench_night_time [legs]
+
+Legs begin at any minute of a month and last up to 30 hours, so that some of them
+cross two midnights.
+"""
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+from model.creditator import Creditator
+from model.flight_table import night_minutes, early_morning
+from model.scheduleClasses import Itinerary
+from model.timeClasses import to_epoch_minutes, from_epoch_minutes
+
+
+def synthetic_legs(count: int) -> tuple:
+    rng = np.random.default_rng(0)
+    begin = to_epoch_minutes(datetime(2018, 8, 1)) + rng.integers(0, 31 * 24 * 60, count)
+    end = begin + rng.integers(0, 30 * 60, count)
+    return begin, end
+
+
+def scalar_path(itineraries) -> tuple:
+    return ([Creditator.calculate_night_time(itinerary).minutes for itinerary in itineraries],
+            [Creditator.has_early_morning_time(itinerary) for itinerary in itineraries])
+
+
+def batch_path(begin, end) -> tuple:
+    return night_minutes(begin, end), early_morning(begin, end)
+
+
+def main(count: int):
+    begin, end = synthetic_legs(count)
+    itineraries = [Itinerary(from_epoch_minutes(int(b)), from_epoch_minutes(int(e))) for b, e in zip(begin, end)]
+
+    started = time.perf_counter()
+    scalar_night, scalar_early = scalar_path(itineraries)
+    scalar_time = time.perf_counter() - started
+    started = time.perf_counter()
+    batch_night, batch_early = batch_path(begin, end)
+    batch_time = time.perf_counter() - started
+
+    same = np.array_equal(scalar_night, batch_night) and np.array_equal(scalar_early, batch_early)
+    print("{} legs, both paths give the same night minutes and early morning flags: {}".format(count, same))
+    print("scalar  : {:8.3f} s  {:12.0f} legs/s".format(scalar_time, count / scalar_time))
+    print("batch   : {:8.3f} s  {:12.0f} legs/s".format(batch_time, count / batch_time))
+    print("speedup : {:8.1f} x".format(scalar_time / batch_time))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,59 @@
+"""
+Regex cascade (trip_RE -> dutyday_RE -> flights_RE) against the one pass tokenizer.
+
+    python -m benchmarks.bench_parsers [PBS files...]
+
+Without files, a synthetic PBS month is written to a temporary file.
+"""
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.pbs_month import pbs_month
+from data.pbs_reader import read_trips, get_json_trip
+from data.tokenizer import read_json_trips
+
+
+def regex_path(file_name):
+    return [get_json_trip(trip_dict) for trip_dict in read_trips(file_name)]
+
+
+def tokenizer_path(file_name):
+    return list(read_json_trips(file_name))
+
+
+def best_of(function, file_names, repeat=5):
+    best = None
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        for file_name in file_names:
+            function(file_name)
+        elapsed = time.perf_counter() - begin
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(file_names):
+    temporary = None
+    if not file_names:
+        fd, temporary = tempfile.mkstemp(suffix='.txt')
+        with os.fdopen(fd, 'w') as fp:
+            fp.write(pbs_month(trips=3000))
+        file_names = [temporary]
+    try:
+        trips = sum(len(tokenizer_path(file_name)) for file_name in file_names)
+        same = all(regex_path(file_name) == tokenizer_path(file_name) for file_name in file_names)
+        regex_time = best_of(regex_path, file_names)
+        tokenizer_time = best_of(tokenizer_path, file_names)
+        print("{} trips, both paths build the same json_trips: {}".format(trips, same))
+        print("regex     : {:8.3f} s  {:8.0f} trips/s".format(regex_time, trips / regex_time))
+        print("tokenizer : {:8.3f} s  {:8.0f} trips/s".format(tokenizer_time, trips / tokenizer_time))
+        print("speedup   : {:8.2f} x".format(regex_time / tokenizer_time))
+    finally:
+        if temporary:
+            os.remove(temporary)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,66 @@
+"""
+datetime.strptime against model.time_parser, over the text a PBS month gives them.
+
+    python -m benchmarks.bench_time_parsing [flights]
+
+Each flight has a DDMMMYYYYHH:MM check in, as DateTimeTracker takes it, and HHMM begin,
+end and block times, as Itinerary.from_date_and_strings and Duration.from_string do.
+Dates fall within August 2018, times at any minute of the day.
+"""
+import random
+import sys
+import time
+from datetime import datetime, date, timedelta
+
+from model.time_parser import parse_datetime, parse_time_of_day, parse_minutes
+
+
+def synthetic_texts(count: int) -> tuple:
+    rnd = random.Random(0)
+    check_ins = [(datetime(2018, 8, 1) + timedelta(minutes=rnd.randrange(31 * 24 * 60))).strftime('%d%b%Y%H:%M')
+                 for _ in range(count)]
+    times = ['{:02d}{:02d}'.format(rnd.randrange(24), rnd.randrange(60)) for _ in range(3 * count)]
+    return check_ins, times
+
+
+def strptime_path(check_ins, times) -> list:
+    day = date(2018, 8, 1)
+    parsed = [datetime.strptime(text, '%d%b%Y%H:%M') for text in check_ins]
+    parsed.extend(datetime.combine(day, datetime.strptime(text, '%H%M').time()) for text in times[0::3])
+    parsed.extend(datetime.combine(day, datetime.strptime(text, '%H%M').time()) for text in times[1::3])
+    parsed.extend(int(text[0:-2]) * 60 + int(text[-2:]) for text in times[2::3])
+    return parsed
+
+
+def parser_path(check_ins, times) -> list:
+    midnight = datetime(2018, 8, 1)
+    parsed = [parse_datetime(text) for text in check_ins]
+    parsed.extend(midnight + parse_time_of_day(text) for text in times[0::3])
+    parsed.extend(midnight + parse_time_of_day(text) for text in times[1::3])
+    parsed.extend(parse_minutes(text) for text in times[2::3])
+    return parsed
+
+
+def best_of(function, texts, repeat=5) -> float:
+    best = None
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        function(*texts)
+        elapsed = time.perf_counter() - begin
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(count: int):
+    texts = synthetic_texts(count)
+    same = strptime_path(*texts) == parser_path(*texts)
+    strptime_time = best_of(strptime_path, texts)
+    parser_time = best_of(parser_path, texts)
+    print("{} flights, {} texts, both paths give the same values: {}".format(count, 4 * count, same))
+    print("strptime : {:8.3f} s  {:12.0f} texts/s".format(strptime_time, 4 * count / strptime_time))
+    print("parser   : {:8.3f} s  {:12.0f} texts/s".format(parser_time, 4 * count / parser_time))
+    print("speedup  : {:8.1f} x".format(strptime_time / parser_time))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
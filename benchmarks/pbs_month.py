@@ -0,0 +1,88 @@
+"""
+Builds a synthetic PBS trips file, laid out as the ones published in jepphost,
+so that benchmarks can run without a real PBS month at hand.
+"""
+import random
+from datetime import datetime, timedelta
+
+AIRPORTS = ['MEX', 'GDL', 'MTY', 'CUN', 'TIJ', 'JFK', 'LAX', 'MAD', 'CDG', 'BOG', 'SCL', 'ORD']
+EQUIPMENTS = ['7S8', '738', '788', '789', 'E90']
+PAGE_BREAK = "{0:%m/%d/%Y} http://crew.am.jepphost.com/amx/portal/\n" \
+             "crew.am.jepphost.com/amx/portal/ {1}/{2}\n"
+
+
+def hhmm(minutes: int) -> str:
+    return "{0:0>2d}{1:0>2d}".format(*divmod(minutes, 60))
+
+
+def hh_mm(minutes: int) -> str:
+    return "{0}:{1:0>2d}".format(*divmod(minutes, 60))
+
+
+def trip_text(number: int, dated: datetime, rnd: random.Random) -> str:
+    check_in = dated + timedelta(minutes=rnd.randrange(5 * 60, 22 * 60, 5))
+    lines = ["# {0:0>4d}{1}CHECK IN AT {2:%H:%M}".format(number, 50 * ' ', check_in),
+             "{0:%d%b%Y}".format(check_in).upper(),
+             "DATE  RPT  FLIGHT DEPARTS  ARRIVES  RLS  BLK        TURN        EQ"]
+    report = check_in
+    total_block = 0
+    origin = 'MEX'
+    duty_days = rnd.randint(1, 4)
+    for duty_day in range(duty_days):
+        begin = report + timedelta(hours=1)
+        legs = rnd.randint(1, 4)
+        block_time = 0
+        for leg in range(legs):
+            destination = rnd.choice([a for a in AIRPORTS if a != origin])
+            blk = rnd.randrange(45, 5 * 60, 5)
+            end = begin + timedelta(minutes=blk)
+            name = "{0:0>4d}".format(rnd.randrange(1, 9999))
+            equipment = rnd.choice(EQUIPMENTS)
+            row = "{rpt} {name:<6s} {origin} {begin:%H%M} {destination} {end:%H%M} ".format(
+                rpt="{0:%d%b} {1:%H%M}".format(report, report).upper() if leg == 0 else 10 * ' ',
+                name=name, origin=origin, begin=begin, destination=destination, end=end)
+            if leg == legs - 1:
+                release = end + timedelta(minutes=30)
+                row += "{0:%H%M} {1}                   {2}".format(release, hhmm(blk), equipment)
+            else:
+                turn = rnd.randrange(40, 120, 5)
+                row += "     {0}       {1}        {2}".format(hhmm(blk), hhmm(turn), equipment)
+                end += timedelta(minutes=turn)
+            lines.append(row)
+            block_time += blk
+            begin = end
+            origin = destination
+        release = begin + timedelta(minutes=30)
+        daily = int((release - report).total_seconds() // 60)
+        if duty_day < duty_days - 1:
+            layover = rnd.randrange(10 * 60, 30 * 60, 5)
+            layover_string = "{0} {1:0>2d}:{2:0>2d}".format(origin, *divmod(layover, 60))
+        else:
+            layover = 0
+            layover_string = 9 * ' '
+        lines.append("{0}{1}           {2}BL 0000CRD {2}TL {3}DY".format(
+            21 * ' ', layover_string, hhmm(block_time), hhmm(daily)))
+        total_block += block_time
+        report = release + timedelta(minutes=layover)
+    tafb = int((report - check_in).total_seconds() // 60)
+    lines.append("")
+    lines.append("          TOTALS     {0}TL     {0}BL     0:00CR           {1}TAFB".format(
+        hh_mm(total_block), hh_mm(tafb)))
+    return "\n".join(lines) + "\n"
+
+
+def pbs_month(trips: int = 3000, year: int = 2018, month: int = 8, lines_per_page: int = 60,
+              seed: int = 0) -> str:
+    """Returns a PBS month with the given number of trips"""
+    rnd = random.Random(seed)
+    first_day = datetime(year, month, 1)
+    text = "".join(trip_text(1000 + number, first_day + timedelta(days=rnd.randrange(28)), rnd)
+                   for number in range(trips))
+    lines = text.splitlines(keepends=True)
+    pages = range(0, len(lines), lines_per_page)
+    return "".join(PAGE_BREAK.format(first_day, page + 1, len(pages)) + "".join(lines[start:start + lines_per_page])
+                   for page, start in enumerate(pages))
+
+
+if __name__ == '__main__':
+    print(pbs_month(3))
@@ -0,0 +1,51 @@
+"""
+asyncio counterpart of data.database, on top of asyncpg.
+
+Takes the very same connection parameters given to Database.initialise.
+"""
+import asyncpg
+
+
+class AsyncDatabase:
+
+    __connection_pool = None
+
+    @staticmethod
+    async def initialise(min_size: int = 1, max_size: int = 10, **kwargs):
+        """At most max_size connections are open at once, further requests wait for one to be released"""
+        AsyncDatabase.__connection_pool = await asyncpg.create_pool(min_size=min_size, max_size=max_size, **kwargs)
+
+    @staticmethod
+    async def get_connection():
+        return await AsyncDatabase.__connection_pool.acquire()
+
+    @staticmethod
+    async def return_connection(connection):
+        await AsyncDatabase.__connection_pool.release(connection)
+
+    @staticmethod
+    async def close_all_connections():
+        await AsyncDatabase.__connection_pool.close()
+
+
+class ConnectionFromPool:
+    """async with ConnectionFromPool() as connection, everything done within is a single transaction"""
+
+    def __init__(self):
+        self.conn = None
+        self.transaction = None
+
+    async def __aenter__(self):
+        self.conn = await AsyncDatabase.get_connection()
+        self.transaction = self.conn.transaction()
+        await self.transaction.start()
+        return self.conn
+
+    async def __aexit__(self, exception_type, exception_value, exception_traceback):
+        try:
+            if exception_value:
+                await self.transaction.rollback()
+            else:
+                await self.transaction.commit()
+        finally:
+            await AsyncDatabase.return_connection(self.conn)
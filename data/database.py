@@ -1,17 +1,38 @@
-from psycopg2 import pool
+import re
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+from psycopg2 import errors, extensions, pool
 
 
 class Database:
 
     __connection_pool = None
+    __connection_parameters = None
+
+    @staticmethod
+    def initialise(minconn: int = 1, maxconn: int = 10, **kwargs):
+        """The pool is thread-safe, each thread borrows its own connection.
+        It holds up to maxconn connections, asking for one more raises a PoolError"""
+        Database.__connection_parameters = kwargs
+        pool_parameters = dict(connection_factory=PreparingConnection)
+        pool_parameters.update(kwargs)
+        Database.__connection_pool = pool.ThreadedConnectionPool(minconn, maxconn, **pool_parameters)
 
     @staticmethod
-    def initialise(**kwargs):
-        Database.__connection_pool = pool.SimpleConnectionPool(1, 10, **kwargs)
+    def connection_parameters() -> dict:
+        """Parameters given to initialise, used by worker processes to open their own pool"""
+        return Database.__connection_parameters
 
     @staticmethod
     def get_connection():
-        return Database.__connection_pool.getconn()
+        if not QueryStats.enabled:
+            return Database.__connection_pool.getconn()
+        begin = time.perf_counter()
+        connection = Database.__connection_pool.getconn()
+        QueryStats.record_pool_wait(time.perf_counter() - begin)
+        return connection
 
     @staticmethod
     def return_connection(connection):
@@ -22,17 +43,280 @@ class Database:
         Database.__connection_pool.closeall()
 
 
-class CursorFromConnectionPool:
+def statement_shape(sql) -> str:
+    """The statement with every literal and placeholder as ?, and any list of rows as a single one"""
+    if isinstance(sql, bytes):
+        sql = sql.decode(errors='replace')
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'%s|\b\d+(?:\.\d+)?\b', '?', sql)
+    sql = re.sub(r'(\([^()]*\))(?:\s*,\s*\([^()]*\))+', r'\1, ...', sql)
+    return ' '.join(sql.split())
+
+
+def percentile(ordered: list, fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class QueryStats:
+    """
+    Opt-in instrumentation of every statement run through a CursorFromConnectionPool:
+    how many times each statement shape runs, how long it takes and how many rows it
+    returns or changes, and how long getting a pooled connection takes.
+    Gathered within an operation and printed when it is over, shapes repeated more than
+    n_plus_one times within it are flagged as likely N+1 queries
+    """
+    enabled = False
+    n_plus_one = 50
+    _lock = threading.Lock()
+    _statements = dict()
+    _pool_waits = list()
+
+    @staticmethod
+    def enable(n_plus_one: int = 50):
+        QueryStats.n_plus_one = n_plus_one
+        QueryStats.enabled = True
+
+    @staticmethod
+    def disable():
+        QueryStats.enabled = False
+
+    @staticmethod
+    def reset():
+        with QueryStats._lock:
+            QueryStats._statements = dict()
+            QueryStats._pool_waits = list()
+
+    @staticmethod
+    def record_statement(sql, seconds: float, rows: int):
+        shape = statement_shape(sql)
+        with QueryStats._lock:
+            latencies, row_counts = QueryStats._statements.setdefault(shape, ([], []))
+            latencies.append(seconds)
+            row_counts.append(max(rows, 0))
+
+    @staticmethod
+    def record_pool_wait(seconds: float):
+        with QueryStats._lock:
+            QueryStats._pool_waits.append(seconds)
+
+    @staticmethod
+    def summary() -> str:
+        with QueryStats._lock:
+            statements = sorted(QueryStats._statements.items(), key=lambda item: -sum(item[1][0]))
+            pool_waits = list(QueryStats._pool_waits)
+        lines = ["{:>7s} {:>9s} {:>8s} {:>8s} {:>8s} {:>8s}  statement".format(
+            'count', 'total ms', 'p50 ms', 'p95 ms', 'p99 ms', 'rows')]
+        for shape, (latencies, row_counts) in statements:
+            ordered = sorted(latencies)
+            flag = 'N+1? ' if len(latencies) > QueryStats.n_plus_one else ''
+            lines.append("{:7d} {:9.1f} {:8.2f} {:8.2f} {:8.2f} {:8d}  {}{}".format(
+                len(latencies), 1000 * sum(latencies), 1000 * percentile(ordered, 0.5),
+                1000 * percentile(ordered, 0.95), 1000 * percentile(ordered, 0.99), sum(row_counts),
+                flag, shape[:100]))
+        lines.append("{} statements, {} connections taken from the pool after waiting {:.1f} ms in all".format(
+            sum(len(latencies) for _, (latencies, _) in statements),
+            len(pool_waits), 1000 * sum(pool_waits)))
+        return '\n'.join(lines)
+
+    @staticmethod
+    @contextmanager
+    def operation(name: str):
+        """Gather statistics for everything done within, printing them once over.
+        Nothing at all unless enabled"""
+        if not QueryStats.enabled:
+            yield
+            return
+        QueryStats.reset()
+        try:
+            yield
+        finally:
+            print("\nQueries run by {}:".format(name))
+            print(QueryStats.summary())
+
+
+class InstrumentedCursor(extensions.cursor):
+    """A cursor recording each statement it runs into QueryStats"""
+
+    def execute(self, query, vars=None):
+        begin = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            QueryStats.record_statement(query, time.perf_counter() - begin, self.rowcount)
+
+    def executemany(self, query, vars_list):
+        begin = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            QueryStats.record_statement(query, time.perf_counter() - begin, self.rowcount)
+
+
+class PreparingConnection(extensions.connection):
+    """A connection remembering which PreparedStatements it has PREPAREd, and which ones
+    were run within the current transaction. A recycled connection is a new one, it starts
+    remembering none"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+        self.executed = set()
+
+    def commit(self):
+        super().commit()
+        self.executed.clear()
+
+    def rollback(self):
+        super().rollback()
+        self.executed.clear()
+
+
+class PreparedStatement(object):
+    """
+    A statement PREPAREd at most once for each pooled connection and then run with EXECUTE,
+    so that the server parses and plans it only once. Written with %s placeholders like any other.
+    Connections not opened by Database, which can't tell what they have prepared, run it as is
+    """
+    _statements = dict()
+
+    def __init__(self, name: str, sql: str):
+        if PreparedStatement._statements.setdefault(name, sql) != sql:
+            raise ValueError("Statement {} is already prepared as something else".format(name))
+        self.name = name
+        self.sql = sql
+        parts = sql.split('%s')
+        self.prepare_sql = 'PREPARE {} AS '.format(name) + parts[0] + ''.join(
+            '${}'.format(number) + part for number, part in enumerate(parts[1:], 1))
+        if len(parts) > 1:
+            self.execute_sql = 'EXECUTE {} ({})'.format(name, ', '.join((len(parts) - 1) * ['%s']))
+        else:
+            self.execute_sql = 'EXECUTE ' + name
+
+    def prepare(self, cursor) -> bool:
+        """PREPARE on the cursor's connection unless it is already. False if it can't be"""
+        prepared = getattr(cursor.connection, 'prepared', None)
+        if prepared is None:
+            return False
+        if self.name not in prepared:
+            cursor.execute(self.prepare_sql)
+            prepared.add(self.name)
+        return True
+
+    def run(self, cursor, method, values):
+        """EXECUTE with method, either cursor.execute or cursor.executemany. Should the server
+        have dropped its prepared statements, as a pooler handing out another backend does, they
+        are forgotten, prepared again and run once more. A transaction with nothing done yet is
+        started over, else the first run of a statement within it is kept within a savepoint"""
+        connection = cursor.connection
+        if self.name not in connection.prepared or self.name in connection.executed:
+            # Prepared or already run within this transaction, the server holds it
+            self.prepare(cursor)
+            method(self.execute_sql, values)
+        elif connection.get_transaction_status() == extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                method(self.execute_sql, values)
+            except errors.InvalidSqlStatementName:
+                connection.rollback()
+                connection.prepared.clear()
+                self.prepare(cursor)
+                method(self.execute_sql, values)
+        else:
+            with connection.cursor() as savepoint_cursor:
+                savepoint_cursor.execute('SAVEPOINT prepared_statement')
+                try:
+                    method(self.execute_sql, values)
+                except errors.InvalidSqlStatementName:
+                    savepoint_cursor.execute('ROLLBACK TO SAVEPOINT prepared_statement')
+                    connection.prepared.clear()
+                    self.prepare(cursor)
+                    method(self.execute_sql, values)
+                savepoint_cursor.execute('RELEASE SAVEPOINT prepared_statement')
+        connection.executed.add(self.name)
+
+    def execute(self, cursor, values: tuple = ()):
+        if getattr(cursor.connection, 'prepared', None) is None:
+            cursor.execute(self.sql, values)
+        else:
+            self.run(cursor, cursor.execute, values)
+
+    def executemany(self, cursor, rows):
+        if getattr(cursor.connection, 'prepared', None) is None:
+            cursor.executemany(self.sql, rows)
+        else:
+            self.run(cursor, cursor.executemany, rows)
+
+
+class Session:
+    """
+    Unit of work: one pooled connection and one transaction shared by every
+    CursorFromConnectionPool given this session. Everything is committed at once
+    when leaving the with block, or rolled back if an exception is raised
+    """
+
     def __init__(self):
         self.conn = None
-        self.cursor = None
+        self.savepoints = 0
 
     def __enter__(self):
         self.conn = Database.get_connection()
-        self.cursor = self.conn.cursor()
+        return self
+
+    def __exit__(self, exception_type, exception_value, exception_traceback):
+        if exception_value:
+            self.conn.rollback()
+        else:
+            self.conn.commit()
+        Database.return_connection(self.conn)
+
+    def commit(self):
+        """Make everything done so far durable, the session remains open"""
+        self.conn.commit()
+
+    @contextmanager
+    def savepoint(self):
+        """If an exception is raised within, only changes made since entering are undone"""
+        self.savepoints += 1
+        name = 'savepoint_{}'.format(self.savepoints)
+        with self.conn.cursor() as cursor:
+            cursor.execute('SAVEPOINT ' + name)
+        try:
+            yield self
+        except Exception:
+            with self.conn.cursor() as cursor:
+                cursor.execute('ROLLBACK TO SAVEPOINT ' + name)
+            raise
+        else:
+            with self.conn.cursor() as cursor:
+                cursor.execute('RELEASE SAVEPOINT ' + name)
+
+
+def savepoint(session: Session = None):
+    """A savepoint within session, nothing at all without one"""
+    return session.savepoint() if session else nullcontext()
+
+
+class CursorFromConnectionPool:
+    def __init__(self, name: str = None, session: Session = None):
+        """A name opens a server-side cursor, rows are then fetched as they are iterated.
+        Given a session, its connection is used and committing is left to the session"""
+        self.name = name
+        self.session = session
+        self.conn = None
+        self.cursor = None
+
+    def __enter__(self):
+        self.conn = self.session.conn if self.session else Database.get_connection()
+        self.cursor = self.conn.cursor(name=self.name,
+                                       cursor_factory=InstrumentedCursor if QueryStats.enabled else None)
         return self.cursor
 
     def __exit__(self, exception_type, exception_value, exception_traceback):
+        if self.session:
+            # A named cursor left open keeps its name declared until the session ends,
+            # it can only be closed while the transaction is not aborted
+            if self.conn.info.transaction_status != extensions.TRANSACTION_STATUS_INERROR:
+                self.cursor.close()
+            return
         if exception_value:  # This is equivalent to `if exception_value is not None`
             self.conn.rollback()
         else:
@@ -0,0 +1,185 @@
+"""
+Repository holding every table in dicts, nothing outlives the process.
+
+Meant for tests and benchmarks. Savepoints roll nothing back, a trip that fails
+to be saved may leave some of its rows behind.
+"""
+from itertools import count
+
+from data.repository import Repository
+
+
+class MemoryRepository(Repository):
+
+    def __init__(self):
+        self.equipments = dict()
+        self.airports = dict()
+        self.crew_members = dict()
+        self.routes = dict()
+        self.route_ids = dict()
+        self.markers = set()
+        self.reserves = dict()
+        # flight_id: (carrier, route_id, scheduled_begin, scheduled_block, equipment, actual_begin, actual_block)
+        self.flights = dict()
+        self.flight_ids = dict()
+        self.trips = dict()
+        # (trip_id, trip_date): {flight_id: (report, rel, dh)}
+        self.duty_days = dict()
+        self.next_route_id = count(1)
+        self.next_flight_id = count(1)
+
+    def save_equipment(self, airplane_code, cabin_members, session=None):
+        if airplane_code in self.equipments:
+            return False
+        self.equipments[airplane_code] = cabin_members
+        return True
+
+    def load_equipment(self, airplane_code, session=None):
+        if airplane_code in self.equipments:
+            return airplane_code, self.equipments[airplane_code]
+
+    def load_equipments(self, session=None):
+        return list(self.equipments.items())
+
+    def save_airport(self, iata_code, timezone, viaticum, session=None):
+        if iata_code in self.airports:
+            return False
+        self.airports[iata_code] = (timezone, viaticum)
+        return True
+
+    def update_airport(self, iata_code, timezone, viaticum, session=None):
+        if iata_code in self.airports:
+            self.airports[iata_code] = (timezone, viaticum)
+
+    def load_airport(self, iata_code, session=None):
+        if iata_code in self.airports:
+            return (iata_code,) + self.airports[iata_code]
+
+    def load_airports(self, session=None):
+        return [(iata_code,) + values for iata_code, values in self.airports.items()]
+
+    def import_airports(self, zones, viaticum, session=None):
+        added = changed = 0
+        for iata_code, timezone in zones.items():
+            if iata_code not in self.airports:
+                self.airports[iata_code] = (timezone, viaticum)
+                added += 1
+            elif self.airports[iata_code][0] != timezone:
+                self.airports[iata_code] = (timezone, self.airports[iata_code][1])
+                changed += 1
+        return added, changed, len(zones) - added - changed
+
+    def load_crew_member(self, crew_member_id, session=None):
+        return self.crew_members.get(crew_member_id)
+
+    def save_crew_member(self, crew_member_id, name, pos, group, base, seniority, session=None):
+        if crew_member_id in self.crew_members:
+            return False
+        self.crew_members[crew_member_id] = (name, pos, group, base, seniority)
+        return True
+
+    def update_crew_member(self, crew_member_id, name, pos, group, base, seniority, session=None):
+        self.crew_members[crew_member_id] = (name, pos, group, base, seniority)
+
+    def save_route(self, name, origin, destination, session=None):
+        key = (name, origin, destination)
+        route_id = self.route_ids.get(key)
+        if not route_id:
+            route_id = self.route_ids.setdefault(key, next(self.next_route_id))
+            self.routes[route_id] = key
+        return route_id
+
+    def load_route_id(self, name, origin, destination, session=None):
+        return self.route_ids.get((name, origin, destination))
+
+    def load_route(self, route_id, session=None):
+        return self.routes.get(route_id)
+
+    def load_routes(self, session=None):
+        return [(route_id,) + key for route_id, key in self.routes.items()]
+
+    def save_marker(self, route_id, begin, duration, session=None):
+        key = (route_id, begin, duration)
+        if key in self.markers:
+            return False
+        self.markers.add(key)
+        return True
+
+    def save_reserve(self, route_id, begin, duration, position, session=None):
+        key = (route_id, begin, duration)
+        if key in self.reserves:
+            return False
+        self.reserves[key] = position
+        return True
+
+    def save_flight(self, carrier, route_id, scheduled_begin, scheduled_block, equipment, session=None):
+        key = (carrier, route_id, scheduled_begin)
+        if key in self.flight_ids:
+            return self.flight_ids[key]
+        flight_id = next(self.next_flight_id)
+        self.flight_ids[key] = flight_id
+        self.flights[flight_id] = (carrier, route_id, scheduled_begin, scheduled_block, equipment, None, None)
+        return flight_id
+
+    def update_flight(self, flight_id, carrier, route_id, scheduled_begin, scheduled_block, equipment,
+                      session=None):
+        old_carrier, old_route_id, old_begin, _, _, actual_begin, actual_block = self.flights[flight_id]
+        del self.flight_ids[(old_carrier, old_route_id, old_begin)]
+        self.flight_ids[(carrier, route_id, scheduled_begin)] = flight_id
+        self.flights[flight_id] = (carrier, route_id, scheduled_begin, scheduled_block, equipment,
+                                   actual_begin, actual_block)
+
+    def delete_flight(self, flight_id, session=None):
+        if any(flight_id in flights for flights in self.duty_days.values()):
+            return False
+        flight = self.flights.pop(flight_id, None)
+        if flight:
+            del self.flight_ids[flight[:3]]
+        return True
+
+    def flight_row(self, flight_id) -> tuple:
+        flight = self.flights[flight_id]
+        return (flight_id,) + flight + self.routes[flight[1]]
+
+    def load_flight(self, flight_id, session=None):
+        if flight_id in self.flights:
+            return self.flight_row(flight_id)
+
+    def find_flight(self, carrier, route_id, scheduled_date, session=None):
+        for flight_id, (flight_carrier, flight_route_id, scheduled_begin, *_) in self.flights.items():
+            if (flight_carrier, flight_route_id, scheduled_begin.date()) == (carrier, route_id, scheduled_date):
+                return self.flight_row(flight_id)
+
+    def load_flights_between(self, begin, end, session=None):
+        return [self.flight_row(flight_id) for flight_id, flight in self.flights.items()
+                if begin <= flight[2] < end]
+
+    def save_trip(self, number, dated, position, session=None):
+        self.trips.setdefault((int(number), dated), position)
+
+    def save_duty_days(self, rows, session=None):
+        for flight_id, trip_id, trip_date, report, rel, dh in rows:
+            if flight_id not in self.flights:
+                raise KeyError("Flight {} is not stored".format(flight_id))
+            self.duty_days.setdefault((int(trip_id), trip_date), dict()).setdefault(flight_id, (report, rel, dh))
+
+    def load_trip_rows(self, number, dated, session=None):
+        key = (int(number), dated)
+        rows = []
+        for flight_id, (report, rel, dh) in self.duty_days.get(key, dict()).items():
+            carrier, route_id, scheduled_begin, scheduled_block, equipment, _, _ = self.flights[flight_id]
+            if equipment in self.equipments:
+                airplane_code, cabin_members = equipment, self.equipments[equipment]
+            else:
+                airplane_code, cabin_members = None, None
+            rows.append((flight_id, report, rel, dated, dh, carrier, scheduled_begin, scheduled_block, route_id) +
+                        self.routes[route_id] + (airplane_code, cabin_members, key[0], self.trips.get(key)))
+        rows.sort(key=lambda row: row[6])
+        return rows
+
+    def load_trip_rows_between(self, start, end, position=None, session=None):
+        rows = []
+        for trip_id, trip_date in sorted(self.duty_days, key=lambda key: (key[1], key[0])):
+            if start <= trip_date <= end and (position is None or self.trips.get((trip_id, trip_date)) == position):
+                rows.extend(self.load_trip_rows(trip_id, trip_date))
+        return rows
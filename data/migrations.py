@@ -0,0 +1,293 @@
+"""
+Versioned schema changes on top of data/definitions.sql.
+
+Each migration is applied once, within a single transaction, and recorded in
+schema_migrations. Run migrate() before using a database, or
+
+    python -m data.migrations
+
+which also prints whether each indexed query is planned with its index.
+
+A migration statement is either SQL or a function run with the migration's cursor.
+
+Flights, duty days and reserves are partitioned by month from version 4 on.
+create_partitions(month) should be run before storing a new month, and
+detach_partitions(month) takes an old month out of those tables, leaving it as
+tables of its own. From version 5 on, rows of a month without partitions are kept
+in a default partition, and moved into the month's own ones once created.
+"""
+import json
+from datetime import date
+
+from data.database import Database, CursorFromConnectionPool, Session
+from data.postgres_repository import find_flight_statement, trip_rows_sql
+
+# (table, column each of its partitions holds a month of)
+partitioned_tables = [
+    ('flights', 'scheduled_begin'),
+    ('reserves', 'begin'),
+    ('duty_days', 'trip_date'),
+]
+
+
+def next_month(day: date) -> date:
+    """First day of the month following day's"""
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return '{}_{:%Y_%m}'.format(table, month)
+
+
+def default_partition_name(table: str) -> str:
+    return '{}_default'.format(table)
+
+
+def stored_columns(cursor, table: str) -> list:
+    """(column_name, sequence) of every column of table that is not generated, in order"""
+    cursor.execute("SELECT column_name, pg_get_serial_sequence('public.' || table_name, column_name) "
+                   "    FROM information_schema.columns "
+                   "    WHERE table_schema = 'public' AND table_name = %s AND is_generated = 'NEVER' "
+                   "    ORDER BY ordinal_position", (table,))
+    return cursor.fetchall()
+
+
+def create_month_partitions(cursor, month: date):
+    """Create month's partitions unless already created. Rows of month kept in the default
+    partition so far are moved into them, a partition can't be created while they are there"""
+    first_day = month.replace(day=1)
+    bounds = (first_day.isoformat(), next_month(first_day).isoformat())
+    for table, column in partitioned_tables:
+        partition = partition_name(table, first_day)
+        default = default_partition_name(table)
+        cursor.execute('SELECT to_regclass(%s) IS NOT NULL, to_regclass(%s) IS NOT NULL',
+                       ('public.' + partition, 'public.' + default))
+        exists, has_default = cursor.fetchone()
+        if exists:
+            continue
+        move = False
+        if has_default:
+            cursor.execute('SELECT EXISTS (SELECT 1 FROM public.{0} WHERE {1} >= %s AND {1} < %s)'.format(
+                default, column), bounds)
+            move = cursor.fetchone()[0]
+        if move:
+            # Flights are referenced by duty days until moved back in
+            cursor.execute('SET CONSTRAINTS ALL DEFERRED')
+            column_names = ', '.join(column_name for column_name, _ in stored_columns(cursor, table))
+            cursor.execute('CREATE TEMP TABLE moved_rows AS '
+                           '    SELECT {2} FROM public.{0} WHERE {1} >= %s AND {1} < %s'.format(
+                               default, column, column_names), bounds)
+            cursor.execute('DELETE FROM public.{0} WHERE {1} >= %s AND {1} < %s'.format(default, column), bounds)
+        cursor.execute('CREATE TABLE public.{} PARTITION OF public.{} '
+                       '    FOR VALUES FROM (%s) TO (%s)'.format(partition, table), bounds)
+        if move:
+            cursor.execute('INSERT INTO public.{0} ({1}) SELECT {1} FROM moved_rows'.format(table, column_names))
+            cursor.execute('DROP TABLE moved_rows')
+
+
+def create_default_partitions(cursor):
+    for table, _ in partitioned_tables:
+        cursor.execute('CREATE TABLE IF NOT EXISTS public.{} PARTITION OF public.{} DEFAULT'.format(
+            default_partition_name(table), table))
+
+
+def partition_by_month(cursor):
+    """Move flights, reserves and duty_days into tables partitioned by month,
+    with a partition for every month already stored"""
+    months = set()
+    for table, column in partitioned_tables:
+        cursor.execute('ALTER TABLE public.{0} RENAME TO {0}_unpartitioned'.format(table))
+        cursor.execute('CREATE TABLE public.{0} '
+                       '    (LIKE public.{0}_unpartitioned INCLUDING DEFAULTS INCLUDING GENERATED '
+                       '                                   INCLUDING CONSTRAINTS) '
+                       '    PARTITION BY RANGE ({1})'.format(table, column))
+        cursor.execute("SELECT DISTINCT date_trunc('month', {})::date "
+                       "    FROM public.{}_unpartitioned".format(column, table))
+        months.update(month for month, in cursor.fetchall())
+    for month in sorted(months):
+        create_month_partitions(cursor, month)
+    for table, column in partitioned_tables:
+        columns = stored_columns(cursor, table + '_unpartitioned')
+        column_names = ', '.join(column_name for column_name, _ in columns)
+        cursor.execute('INSERT INTO public.{0} ({1}) '
+                       '    SELECT {1} FROM public.{0}_unpartitioned'.format(table, column_names))
+        # Ids keep being drawn from the same sequences, which would otherwise be dropped along with the old table
+        for column_name, sequence in columns:
+            if sequence:
+                cursor.execute('ALTER SEQUENCE {} OWNED BY public.{}.{}'.format(sequence, table, column_name))
+    cursor.execute('DROP TABLE ' + ', '.join('public.{}_unpartitioned'.format(table)
+                                             for table, _ in partitioned_tables))
+
+
+# (version, description, statements)
+migrations = [
+    (1, 'Sargable flight lookup by date',
+     ['ALTER TABLE public.flights '
+      '    ADD COLUMN scheduled_date date GENERATED ALWAYS AS (scheduled_begin::date) STORED',
+      'CREATE INDEX flights_scheduled_date_idx '
+      '    ON public.flights (airline_iata_code, route_id, scheduled_date)']),
+    # trip_date leads, so that trips within a date window are found as well as a single trip
+    (2, 'Duty days by trip',
+     ['CREATE INDEX duty_days_trip_idx ON public.duty_days (trip_date, trip_id)']),
+    (3, 'Markers and reserves by begin',
+     ['CREATE INDEX markers_begin_idx ON public.markers (begin)',
+      'CREATE INDEX reserves_begin_idx ON public.reserves (begin)']),
+    # Unique constraints must hold the partition key. A duty day can no longer reference its flight,
+    # flight_id alone not being unique throughout the partitions
+    (4, 'Flights, reserves and duty days partitioned by month',
+     [partition_by_month,
+      'ALTER TABLE public.flights '
+      '    ADD CONSTRAINT flights_pkey PRIMARY KEY (flight_id, scheduled_begin), '
+      '    ADD CONSTRAINT flights_airline_iata_code_route_id_scheduled_departure_date_key '
+      '        UNIQUE (airline_iata_code, route_id, scheduled_begin), '
+      '    ADD CONSTRAINT flights_airline_iata_code_fkey FOREIGN KEY (airline_iata_code) '
+      '        REFERENCES public.airlines (iata_code), '
+      '    ADD CONSTRAINT flights_route_id_fkey FOREIGN KEY (route_id) REFERENCES public.routes (route_id), '
+      '    ADD CONSTRAINT flights_equipment_fkey FOREIGN KEY (equipment) REFERENCES public.equipments (code)',
+      'CREATE INDEX flights_scheduled_date_idx ON public.flights (airline_iata_code, route_id, scheduled_date)',
+      'ALTER TABLE public.reserves '
+      '    ADD CONSTRAINT reserves_pkey PRIMARY KEY (reserve_id, begin), '
+      '    ADD CONSTRAINT reserves_route_id_begin_duration_key UNIQUE (route_id, begin, duration)',
+      'CREATE INDEX reserves_begin_idx ON public.reserves (begin)',
+      'ALTER TABLE public.duty_days '
+      '    ADD CONSTRAINT duty_day_pkey PRIMARY KEY (duty_day_id, trip_date), '
+      '    ADD CONSTRAINT flights_to_trip_in_duty_day UNIQUE (flight_id, trip_id, trip_date), '
+      '    ADD CONSTRAINT duty_days_trip_id_fkey FOREIGN KEY (trip_date, trip_id) '
+      '        REFERENCES public.trips (dated, number)',
+      'CREATE INDEX duty_days_trip_idx ON public.duty_days (trip_date, trip_id)']),
+    # Reserves of past months and trips reaching months no partition was created for are stored all the same
+    (5, 'Default partitions for flights, reserves and duty days',
+     [create_default_partitions]),
+    # flight_id alone being no longer unique, duty days reference their flight along with its scheduled_begin.
+    # Duty days left without their flight while there was no foreign key are dropped.
+    # Deferrable, so that flights can be moved out of the default partition along with their duty days
+    (6, 'Duty days referencing their flights again',
+     ['ALTER TABLE public.duty_days ADD COLUMN flight_begin timestamp without time zone',
+      'UPDATE public.duty_days SET flight_begin = flights.scheduled_begin '
+      '    FROM public.flights WHERE flights.flight_id = duty_days.flight_id',
+      'DELETE FROM public.duty_days WHERE flight_begin IS NULL',
+      'ALTER TABLE public.duty_days '
+      '    ALTER COLUMN flight_begin SET NOT NULL, '
+      '    ADD CONSTRAINT duty_days_flight_id_fkey FOREIGN KEY (flight_id, flight_begin) '
+      '        REFERENCES public.flights (flight_id, scheduled_begin) ON UPDATE CASCADE DEFERRABLE']),
+]
+
+# (description, statement, values, index it should be planned with)
+index_checks = [
+    ('Flight by carrier, route and date', find_flight_statement.sql, ('AM', 1, '2018-08-01', '2018-08-01',
+                                                                      '2018-08-01'),
+     'flights_scheduled_date_idx'),
+    ('Trip by number and date', trip_rows_sql + 'WHERE trip_id = %s AND trip_date = %s', (1, '2018-08-01'),
+     'duty_days_trip_idx'),
+    ('Trips within a date window', trip_rows_sql + 'WHERE trip_date BETWEEN %s AND %s',
+     ('2018-08-01', '2018-08-31'), 'duty_days_trip_idx'),
+    ('Markers within a date window', 'SELECT * FROM public.markers WHERE begin >= %s AND begin < %s',
+     ('2018-08-01', '2018-09-01'), 'markers_begin_idx'),
+    ('Reserves within a date window', 'SELECT * FROM public.reserves WHERE begin >= %s AND begin < %s',
+     ('2018-08-01', '2018-09-01'), 'reserves_begin_idx'),
+]
+
+
+def applied_version(cursor) -> int:
+    cursor.execute('SELECT max(version) FROM public.schema_migrations')
+    return cursor.fetchone()[0] or 0
+
+
+def migrate() -> int:
+    """Apply every migration not applied yet, returning the schema version"""
+    with CursorFromConnectionPool() as cursor:
+        cursor.execute('CREATE TABLE IF NOT EXISTS public.schema_migrations '
+                       '(version integer PRIMARY KEY, description text NOT NULL, '
+                       ' applied timestamp without time zone NOT NULL DEFAULT now())')
+    version = 0
+    for number, description, statements in migrations:
+        with Session() as session, CursorFromConnectionPool(session=session) as cursor:
+            # Processes starting at once wait for whichever one migrates first
+            cursor.execute('LOCK TABLE public.schema_migrations IN EXCLUSIVE MODE')
+            version = applied_version(cursor)
+            if version < number:
+                for statement in statements:
+                    if callable(statement):
+                        statement(cursor)
+                    else:
+                        cursor.execute(statement)
+                cursor.execute('INSERT INTO public.schema_migrations (version, description) '
+                               'VALUES (%s, %s)', (number, description))
+                print("Schema migrated to version {}: {}".format(number, description))
+                version = number
+    return version
+
+
+def create_partitions(month: date):
+    """Create the partitions holding month's flights, reserves and duty days, unless already created"""
+    with CursorFromConnectionPool() as cursor:
+        create_month_partitions(cursor, month)
+
+
+def create_next_month_partitions(today: date = None):
+    """Create this month's partitions and the next one's, so that trips reaching
+    into the next month can be stored as well"""
+    today = today or date.today()
+    create_partitions(today)
+    create_partitions(next_month(today))
+
+
+def detach_partitions(month: date):
+    """Take month's flights, reserves and duty days out of those tables, they are left in
+    tables of their own, named after the month, to be archived or dropped"""
+    with CursorFromConnectionPool() as cursor:
+        for table, _ in partitioned_tables:
+            cursor.execute('ALTER TABLE public.{} DETACH PARTITION public.{}'.format(
+                table, partition_name(table, month.replace(day=1))))
+
+
+def partitions(table: str) -> list:
+    """Name of every partition of table"""
+    with CursorFromConnectionPool() as cursor:
+        cursor.execute("SELECT inhrelid::regclass::text FROM pg_inherits "
+                       "    WHERE inhparent = ('public.' || %s)::regclass "
+                       "    ORDER BY 1", (table,))
+        return [name for name, in cursor.fetchall()]
+
+
+def plan_indexes(plan: dict):
+    """Every index within a plan as given by EXPLAIN (FORMAT JSON)"""
+    if 'Index Name' in plan:
+        yield plan['Index Name']
+    for sub_plan in plan.get('Plans', []):
+        yield from plan_indexes(sub_plan)
+
+
+def parent_index(cursor, index: str) -> str:
+    """The index of the partitioned table that index was created for, or index itself
+    if it belongs to a table that is not a partition"""
+    cursor.execute('SELECT inhparent::regclass::text FROM pg_inherits '
+                   '    WHERE inhrelid = to_regclass(%s)', (index,))
+    row = cursor.fetchone()
+    return parent_index(cursor, row[0]) if row else index
+
+
+def check_indexes() -> list:
+    """(description, index, used) for every index check. Sequential scans are disabled while
+    planning, tables being small a scan may be cheaper, what is checked is that the index can be used.
+    Partitions are scanned with indexes of their own, each one is taken as the partitioned table's"""
+    results = []
+    with Session() as session:
+        with CursorFromConnectionPool(session=session) as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            for description, sql, values, index in index_checks:
+                cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, values)
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                used = {parent_index(cursor, name) for name in plan_indexes(plan[0]['Plan'])}
+                results.append((description, index, index in used))
+    return results
+
+
+if __name__ == '__main__':
+    Database.initialise(database="orgutrip", user="postgres", password="0933", host="localhost")
+    print("Schema version {}".format(migrate()))
+    create_next_month_partitions()
+    for description, index, used in check_indexes():
+        print("{:32s} {:28s} {}".format(description, index, 'used' if used else 'NOT USED'))
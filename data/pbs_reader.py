@@ -0,0 +1,180 @@
+"""
+Streaming reader for PBS trips files.
+
+Each file is memory-mapped and cut into trip blocks at every '# NNNN' header,
+so only one trip at a time is turned into a string and matched against trip_RE.
+Page headers and footers are stripped from each block before it gets matched.
+"""
+import locale
+import mmap
+import threading
+from bisect import bisect_right
+from queue import Queue
+
+from data.regex import trip_RE, trip_header_RE, page_furniture_RE, dutyday_RE, flights_RE
+
+
+class OffsetMap(object):
+    """Maps positions within a stripped text back to byte offsets within the file it was read from"""
+
+    def __init__(self, text: str = '', base: int = 0, encoding: str = None):
+        """text is the original one, found at byte offset base of a file written in encoding"""
+        self.text = text
+        self.base = base
+        self.encoding = encoding or locale.getpreferredencoding(False)
+        self.clean_starts = [0]
+        self.original_starts = [0]
+
+    def add(self, clean_start: int, original_start: int):
+        """From clean_start onwards, text was found at original_start, both counted in characters"""
+        self.clean_starts.append(clean_start)
+        self.original_starts.append(original_start)
+
+    def original(self, position: int) -> int:
+        """Return the byte offset within the file for a position within the stripped text"""
+        index = bisect_right(self.clean_starts, position) - 1
+        character = self.original_starts[index] + position - self.clean_starts[index]
+        # Characters may take more than a byte, only those before position are encoded
+        return self.base + len(self.text[:character].encode(self.encoding))
+
+
+def strip_page_furniture(text: str, base: int = 0, encoding: str = None) -> tuple:
+    """Remove all page headers and footers from text in a single scan.
+    Each one is replaced by a blank so no two fields get glued together.
+    Returns the stripped text and its OffsetMap, base is text's byte offset within a file in encoding"""
+    offset_map = OffsetMap(text, base, encoding)
+    # Every header and footer holds a '/', which trips never do. Only the lines
+    # between the first and the last '/' need to be searched for furniture
+    first_slash = text.find('/')
+    if first_slash < 0:
+        return text, offset_map
+    search_begin = text.rfind('\n', 0, first_slash) + 1
+    search_end = text.find('\n', text.rfind('/')) + 1 or len(text)
+
+    pieces = []
+    clean_length = 0
+    last = 0
+    for furniture_match in page_furniture_RE.finditer(text, search_begin, search_end):
+        pieces.append(text[last:furniture_match.start()])
+        pieces.append(' ')
+        clean_length += furniture_match.start() - last + 1
+        last = furniture_match.end()
+        offset_map.add(clean_length, last)
+    pieces.append(text[last:])
+    return ''.join(pieces), offset_map
+
+
+def get_json_duty_day(duty_day_dict: dict) -> dict:
+    """
+    Given a dictionary containing random duty_day data, turn it into a dictionary
+    that can be stored as a json format
+    """
+    duty_day_dict['layover_duration'] = duty_day_dict['layover_duration'] if duty_day_dict[
+        'layover_duration'] else '0000'
+
+    # The last flight in a duty_day must be re-arranged
+    dictionary_flights = [f.groupdict() for f in flights_RE.finditer(duty_day_dict['flights'])]
+    duty_day_dict['rls'] = dictionary_flights[-1]['blk']
+    dictionary_flights[-1]['blk'] = dictionary_flights[-1]['turn']
+    dictionary_flights[-1]['turn'] = '0000'
+
+    duty_day_dict['flights'] = dictionary_flights
+
+    return duty_day_dict
+
+
+def get_json_trip(trip_dict: dict) -> dict:
+    """
+    Given a dictionary containing random trip data, turn it into a dictionary
+    that can be stored as a json format
+    """
+    trip_dict['date_and_time'] = trip_dict['dated'] + trip_dict['check_in']
+    dds = list()
+
+    for duty_day_match in dutyday_RE.finditer(trip_dict['duty_days']):
+        duty_day = get_json_duty_day(duty_day_match.groupdict())
+        dds.append(duty_day)
+    trip_dict['duty_days'] = dds
+
+    return trip_dict
+
+
+def iter_trip_blocks(file_name: str, encoding: str = None):
+    """Yield (offset, block) for every trip within file_name.
+    offset is the byte position where the block starts in the file"""
+    encoding = encoding or locale.getpreferredencoding(False)
+    with open(file_name, 'rb') as fp:
+        try:
+            content = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files can't be memory-mapped, there are no trips to read
+            return
+        with content:
+            start = None
+            for header_match in trip_header_RE.finditer(content):
+                if start is not None:
+                    yield start, content[start:header_match.start()].decode(encoding)
+                start = header_match.start()
+            if start is not None:
+                yield start, content[start:].decode(encoding)
+
+
+def read_trips(file_name: str, encoding: str = None):
+    """Yield one trip dict at a time, as expected by get_json_trip"""
+    for offset, block in iter_trip_blocks(file_name, encoding):
+        block, offset_map = strip_page_furniture(block, offset, encoding)
+        trip_match = trip_RE.match(block)
+        if trip_match:
+            yield trip_match.groupdict()
+        else:
+            print("Unable to read trip found at byte {} of {}".format(offset_map.original(0), file_name))
+
+
+def match_trip_block(block: str, offset_map: OffsetMap, file_name: str) -> list:
+    """Return the json_trips within an already stripped trip block, through trip_RE"""
+    trip_match = trip_RE.match(block)
+    if trip_match:
+        return [get_json_trip(trip_match.groupdict())]
+    print("Unable to read trip found at byte {} of {}".format(offset_map.original(0), file_name))
+    return []
+
+
+def read_trip_files(file_names: list, encoding: str = None, prefetch: int = 16, reader=read_trips):
+    """Yield (file_name, trip_dict) for every trip within file_names, as given by reader.
+    A background thread reads ahead up to prefetch trips, so the next file is
+    already being read while the current one is still being processed.
+    Once this generator is exhausted or closed the thread is done with reader"""
+    trips = Queue(maxsize=prefetch)
+    finished = object()
+    stop = threading.Event()
+    errors = []
+
+    def read_ahead():
+        try:
+            for file_name in file_names:
+                for trip_dict in reader(file_name, encoding):
+                    trips.put((file_name, trip_dict))
+                    if stop.is_set():
+                        return
+        except Exception as e:
+            errors.append(e)
+        finally:
+            trips.put(finished)
+
+    thread = threading.Thread(target=read_ahead, daemon=True)
+    thread.start()
+    item = None
+    try:
+        while True:
+            item = trips.get()
+            if item is finished:
+                break
+            yield item
+    finally:
+        # Whatever reader uses, v.gr. a TripCache, may be closed right after
+        stop.set()
+        while item is not finished:
+            item = trips.get()
+        thread.join()
+    if errors:
+        raise errors[0]
@@ -0,0 +1,316 @@
+"""
+Repository on the Postgres database set up by data.database.Database.initialise,
+with the schema in data/definitions.sql
+"""
+import io
+from itertools import count
+
+import psycopg2
+
+from data.database import CursorFromConnectionPool, PreparedStatement, savepoint
+from data.repository import Repository
+
+# Server-side cursors are numbered, so that many of them may be open within one session
+cursor_numbers = count()
+
+# Every flight along with its route, as a flight row
+flights_sql = ('SELECT flights.flight_id, airline_iata_code, flights.route_id, scheduled_begin, '
+               '       scheduled_block, equipment, actual_begin, actual_block, '
+               '       routes.name, routes.origin, routes.destination '
+               '    FROM public.flights '
+               '    INNER JOIN public.routes ON flights.route_id = routes.route_id ')
+
+# Every duty_days row of a trip, along with its flight, route, equipment and trip, as a trip row
+trip_rows_sql = ('SELECT duty_days.flight_id, report, rel, trip_date, dh, '
+                 '       airline_iata_code, scheduled_begin, scheduled_block, '
+                 '       routes.route_id, routes.name, routes.origin, routes.destination, '
+                 '       equipments.code, equipments.cabin_members, trip_id, trips.gposition '
+                 '    FROM public.duty_days '
+                 '    INNER JOIN public.flights ON duty_days.flight_id = flights.flight_id '
+                 '    INNER JOIN public.routes ON flights.route_id = routes.route_id '
+                 '    LEFT JOIN public.equipments ON flights.equipment = equipments.code '
+                 '    INNER JOIN public.trips ON duty_days.trip_id = trips.number '
+                 '                           AND duty_days.trip_date = trips.dated ')
+
+# Statements run for every route, flight and trip of an ingest, the server plans them only once.
+# Flights are looked up by scheduled_date, added by data.migrations along with its index,
+# the range on scheduled_begin lets the planner skip every other month's partition
+route_id_statement = PreparedStatement('route_id', 'SELECT route_id FROM public.routes '
+                                                   '    WHERE name=%s AND origin=%s AND destination=%s')
+# Missing rows are inserted and existing ones selected, either way a single statement gives the id back
+save_route_statement = PreparedStatement('save_route',
+                                         'WITH given (name, origin, destination) AS '
+                                         '         (VALUES (%s::varchar, %s::char(3), %s::char(3))), '
+                                         '     inserted AS (INSERT INTO public.routes (name, origin, destination) '
+                                         '                      SELECT name, origin, destination FROM given '
+                                         '                      ON CONFLICT DO NOTHING '
+                                         '                      RETURNING route_id) '
+                                         'SELECT route_id FROM inserted '
+                                         'UNION ALL '
+                                         'SELECT route_id FROM public.routes '
+                                         '    INNER JOIN given USING (name, origin, destination)')
+find_flight_statement = PreparedStatement('find_flight', flights_sql +
+                                          '    WHERE airline_iata_code = %s '
+                                          '      AND flights.route_id=%s'
+                                          '      AND scheduled_date=%s'
+                                          '      AND scheduled_begin >= %s::date AND scheduled_begin < %s::date + 1')
+save_flight_statement = PreparedStatement('save_flight',
+                                          'WITH given (airline_iata_code, route_id, scheduled_begin, '
+                                          '            scheduled_block, equipment) AS '
+                                          '         (VALUES (%s::char(2), %s::integer, %s::timestamp, '
+                                          '                  %s::interval, %s::char(3))), '
+                                          '     inserted AS (INSERT INTO public.flights (airline_iata_code, route_id, '
+                                          '                                              scheduled_begin, '
+                                          '                                              scheduled_block, equipment) '
+                                          '                      SELECT * FROM given '
+                                          '                      ON CONFLICT DO NOTHING '
+                                          '                      RETURNING flight_id) '
+                                          'SELECT flight_id FROM inserted '
+                                          'UNION ALL '
+                                          'SELECT flight_id FROM public.flights '
+                                          '    INNER JOIN given USING (airline_iata_code, route_id, scheduled_begin)')
+save_trip_statement = PreparedStatement('save_trip', 'INSERT INTO public.trips (number, dated, gposition) '
+                                                     'VALUES (%s, %s, %s) '
+                                                     'ON CONFLICT DO NOTHING')
+# flight_begin is taken from the flight, a missing one leaves it NULL and the duty day is refused
+insert_duty_day_statement = PreparedStatement('insert_duty_day',
+                                              'INSERT INTO public.duty_days('
+                                              '            flight_id, flight_begin, trip_id, trip_date, '
+                                              '            report, rel, dh) '
+                                              'SELECT flight_id, flights.scheduled_begin, trip_id, trip_date, '
+                                              '       report, rel, dh '
+                                              '    FROM (VALUES (%s::bigint, %s::smallint, %s::date, '
+                                              '                  %s::time, %s::time, %s::boolean)) '
+                                              '        AS given (flight_id, trip_id, trip_date, report, rel, dh) '
+                                              '    LEFT JOIN public.flights USING (flight_id) '
+                                              'ON CONFLICT (flight_id, trip_id, trip_date) DO NOTHING')
+
+
+# Airports copied into airports_import are merged at once, those already stored keep their viaticum_zone
+import_airports_sql = ('WITH changed AS (UPDATE public.airports '
+                       '                     SET continent = airports_import.continent, '
+                       '                         tz_city = airports_import.tz_city '
+                       '                     FROM airports_import '
+                       '                     WHERE airports.iata_code = airports_import.iata_code '
+                       '                       AND (airports.continent, airports.tz_city) '
+                       '                           IS DISTINCT FROM (airports_import.continent, airports_import.tz_city) '
+                       '                     RETURNING 1), '
+                       '     added AS (INSERT INTO public.airports (iata_code, continent, tz_city, viaticum_zone) '
+                       '                   SELECT iata_code, continent, tz_city, %s FROM airports_import '
+                       '                   ON CONFLICT DO NOTHING '
+                       '                   RETURNING 1) '
+                       'SELECT (SELECT count(*) FROM added), (SELECT count(*) FROM changed)')
+
+
+class PostgresRepository(Repository):
+
+    def savepoint(self, session=None):
+        return savepoint(session)
+
+    @staticmethod
+    def insert(sql: str, values: tuple, session=None) -> bool:
+        """Run an INSERT ... ON CONFLICT DO NOTHING RETURNING, False if nothing was inserted"""
+        with CursorFromConnectionPool(session=session) as cursor:
+            cursor.execute(sql, values)
+            return cursor.fetchone() is not None
+
+    def save_equipment(self, airplane_code, cabin_members, session=None):
+        return self.insert('INSERT INTO equipments (code, cabin_members) '
+                           'VALUES (%s, %s) '
+                           'ON CONFLICT DO NOTHING '
+                           'RETURNING code',
+                           (airplane_code, cabin_members), session)
+
+    def load_equipment(self, airplane_code, session=None):
+        with CursorFromConnectionPool(session=session) as cursor:
+            cursor.execute('SELECT code, cabin_members FROM equipments WHERE code=%s', (airplane_code,))
+            return cursor.fetchone()
+
+    def load_equipments(self, session=None):
+        with CursorFromConnectionPool(session=session) as cursor:
+            cursor.execute('SELECT code, cabin_members FROM equipments')
+            return cursor.fetchall()
+
+    def save_airport(self, iata_code, timezone, viaticum, session=None):
+        continent, tz_city = timezone.split('/', 1)
+        return self.insert('INSERT INTO airports (iata_code, continent, tz_city, viaticum_zone) '
+                           'VALUES (%s, %s, %s, %s) '
+                           'ON CONFLICT DO NOTHING '
+                           'RETURNING iata_code',
+                           (iata_code, continent, tz_city, viaticum), session)
+
+    def update_airport(self, iata_code, timezone, viaticum, session=None):
+        # America/Argentina/Buenos_Aires keeps Argentina/Buenos_Aires as its tz_city
+        continent, tz_city = timezone.split('/', 1)
+        with CursorFromConnectionPool(session=session) as cursor:
+            cursor.execute('UPDATE airports '
+                           '    set continent = %s, tz_city = %s, viaticum_zone = %s '
+                           'WHERE iata_code = %s', (continent, tz_city, viaticum, iata_code))
+
+    def load_airport(self, iata_code, session=None):
+        with CursorFromConnectionPool(session=session) as cursor:
+            cursor.execute("SELECT iata_code, continent || '/' || tz_city, viaticum_zone "
+                           "    FROM airports WHERE iata_code=%s;", (iata_code,))
+            return cursor.fetchone()
+
+    def load_airports(self, session=None):
+        with CursorFromConnectionPool(session=session) as cursor:
+            cursor.execute("SELECT iata_code, continent || '/' || tz_city, viaticum_zone FROM airports")
+            return cursor.fetchall()
+
+    def import_airports(self, zones, viaticum, session=None):
+        # Each timezone is split as save_airport does, America/Argentina/Buenos_Aires into America and the rest
+        rows = io.StringIO(''.join('{}\t{}\t{}\n'.format(iata_code, *timezone.split('/', 1))
+                                   for iata_code, timezone in zones.items()))
+        with CursorFromConnectionPool(session=session) as cursor:
+            cursor.execute('CREATE TEMP TABLE airports_import '
+                           '    (iata_code char(3), continent varchar, tz_city varchar)')
+            cursor.copy_expert('COPY airports_import (iata_code, continent, tz_city) FROM STDIN', rows)
+            cursor.execute(import_airports_sql, (viaticum,))
+            added, changed = cursor.fetchone()
+            cursor.execute('DROP TABLE airports_import')
+        return added, changed, len(zones) - added - changed
+
+    def load_crew_member(self, crew_member_id, session=None):
+        with CursorFromConnectionPool(session=session) as cursor:
+            cursor.execute('SELECT name, pos, "group", base, seniority '
+                           '    FROM public.crew_members '
+                           '    WHERE crew_member_id=%s',
+                           (crew_member_id,))
+            return cursor.fetchone()
+
+    def save_crew_member(self, crew_member_id, name, pos, group, base, seniority, session=None):
+        return self.insert('INSERT INTO public.crew_members (crew_member_id, name, pos, "group", base, seniority) '
+                           'VALUES (%s, %s, %s, %s, %s, %s) '
+                           'ON CONFLICT DO NOTHING '
+                           'RETURNING crew_member_id',
+                           (crew_member_id, name, pos, group, base, seniority), session)
+
+    def update_crew_member(self, crew_member_id, name, pos, group, base, seniority, session=None):
+        with CursorFromConnectionPool(session=session) as cursor:
+            cursor.execute('INSERT INTO public.crew_members (crew_member_id, name, pos, "group", base, seniority) '
+                           'VALUES (%s, %s, %s, %s, %s, %s) '
+                           'ON CONFLICT (crew_member_id) DO UPDATE '
+                           'SET name = EXCLUDED.name, pos = EXCLUDED.pos, "group" = EXCLUDED."group", '
+                           'base = EXCLUDED.base, seniority = EXCLUDED.seniority',
+                           (crew_member_id, name, pos, group, base, seniority))
+
+    def save_route(self, name, origin, destination, session=None):
+        with CursorFromConnectionPool(session=session) as cursor:
+            save_route_statement.execute(cursor, (name, origin, destination))
+            route_id = cursor.fetchone()
+        if route_id:
+            return route_id[0]
+        # Stored by another transaction while this one waited on it, a new statement sees it
+        return self.load_route_id(name, origin, destination, session)
+
+    def load_route_id(self, name, origin, destination, session=None):
+        with CursorFromConnectionPool(session=session) as cursor:
+            route_id_statement.execute(cursor, (name, origin, destination))
+            route_id = cursor.fetchone()
+            if route_id:
+                return route_id[0]
+
+    def load_route(self, route_id, session=None):
+        with CursorFromConnectionPool(session=session) as cursor:
+            cursor.execute('SELECT name, origin, destination '
+                           '    FROM public.routes '
+                           '    WHERE route_id=%s',
+                           (route_id,))
+            return cursor.fetchone()
+
+    def load_routes(self, session=None):
+        with CursorFromConnectionPool(session=session) as cursor:
+            cursor.execute('SELECT route_id, name, origin, destination FROM public.routes')
+            return cursor.fetchall()
+
+    def save_marker(self, route_id, begin, duration, session=None):
+        return self.insert('INSERT INTO public.markers('
+                           '            route_id, begin, duration) '
+                           'VALUES (%s, %s, %s) '
+                           'ON CONFLICT DO NOTHING '
+                           'RETURNING marker_id',
+                           (route_id, begin, duration), session)
+
+    def save_reserve(self, route_id, begin, duration, position, session=None):
+        return self.insert('INSERT INTO public.reserves('
+                           '            route_id, begin, duration, gposition) '
+                           'VALUES (%s, %s, %s, %s) '
+                           'ON CONFLICT DO NOTHING '
+                           'RETURNING reserve_id',
+                           (route_id, begin, duration, position), session)
+
+    def save_flight(self, carrier, route_id, scheduled_begin, scheduled_block, equipment, session=None):
+        with CursorFromConnectionPool(session=session) as cursor:
+            save_flight_statement.execute(cursor, (carrier, route_id, scheduled_begin, scheduled_block, equipment))
+            flight_id = cursor.fetchone()
+            if not flight_id:
+                # Stored by another transaction while this one waited on it, a new statement sees it
+                cursor.execute('SELECT flight_id FROM public.flights '
+                               '    WHERE airline_iata_code=%s AND route_id=%s AND scheduled_begin=%s',
+                               (carrier, route_id, scheduled_begin))
+                flight_id = cursor.fetchone()
+            return flight_id[0]
+
+    def update_flight(self, flight_id, carrier, route_id, scheduled_begin, scheduled_block, equipment,
+                      session=None):
+        with CursorFromConnectionPool(session=session) as cursor:
+            cursor.execute('UPDATE public.flights '
+                           'SET airline_iata_code = %s, route_id = %s, scheduled_begin = %s, '
+                           'scheduled_block = %s, equipment = %s '
+                           'WHERE flight_id = %s;',
+                           (carrier, route_id, scheduled_begin, scheduled_block, equipment, flight_id))
+
+    def delete_flight(self, flight_id, session=None):
+        try:
+            with savepoint(session), CursorFromConnectionPool(session=session) as cursor:
+                cursor.execute('DELETE FROM public.flights '
+                               '    WHERE flight_id = %s',
+                               (flight_id,))
+        except psycopg2.IntegrityError:
+            return False
+        return True
+
+    def load_flight(self, flight_id, session=None):
+        with CursorFromConnectionPool(session=session) as cursor:
+            cursor.execute(flights_sql + 'WHERE flights.flight_id=%s', (flight_id,))
+            return cursor.fetchone()
+
+    def find_flight(self, carrier, route_id, scheduled_date, session=None):
+        with CursorFromConnectionPool(session=session) as cursor:
+            find_flight_statement.execute(cursor, (carrier, route_id, scheduled_date, scheduled_date, scheduled_date))
+            return cursor.fetchone()
+
+    def load_flights_between(self, begin, end, session=None):
+        with CursorFromConnectionPool(session=session) as cursor:
+            cursor.execute(flights_sql + '    WHERE scheduled_begin >= %s AND scheduled_begin < %s',
+                           (begin, end))
+            return cursor.fetchall()
+
+    def save_trip(self, number, dated, position, session=None):
+        with CursorFromConnectionPool(session=session) as cursor:
+            save_trip_statement.execute(cursor, (number, dated, position))
+
+    def save_duty_days(self, rows, session=None):
+        with CursorFromConnectionPool(session=session) as cursor:
+            insert_duty_day_statement.executemany(cursor, rows)
+
+    def load_trip_rows(self, number, dated, session=None):
+        with CursorFromConnectionPool(session=session) as cursor:
+            cursor.execute(trip_rows_sql +
+                           'WHERE trip_id = %s AND trip_date = %s '
+                           'ORDER BY scheduled_begin ASC;',
+                           (int(number), dated))
+            return cursor.fetchall()
+
+    def load_trip_rows_between(self, start, end, position=None, session=None):
+        """Rows are streamed through a server-side cursor,
+        a pooled connection is held until the last one is yielded"""
+        name = 'trips_between_{}'.format(next(cursor_numbers))
+        with CursorFromConnectionPool(name=name, session=session) as cursor:
+            cursor.execute(trip_rows_sql +
+                           'WHERE trip_date BETWEEN %s AND %s '
+                           '  AND (%s IS NULL OR trips.gposition = %s) '
+                           'ORDER BY trip_date, trip_id, scheduled_begin ASC;',
+                           (start, end, position, position))
+            yield from cursor
@@ -165,6 +165,12 @@ trip_RE = re.compile(r"""
     (?P<tafb>\d{1,3}:\d{2})TAFB
     """, re.VERBOSE | re.DOTALL)
 
+# Bytes pattern used to cut a memory-mapped trips file into trip blocks
+trip_header_RE = re.compile(rb"""
+    \#\s*                           #Every trip starts with a hashtag and whitespace
+    \d{4}                           #followed by the Trip number                        v.gr. # 3760
+    """, re.VERBOSE)
+
 # Following re help to elimante footer and headers in the trips file
 header_date_RE = re.compile(r"""
     (?P<header_date>\d{1,2}/\d{1,2}/\d{4})\s                                  #header date                                  
@@ -182,6 +188,12 @@ footer_paging_RE = re.compile(r"""
     (?P<footer_paging>\d{1,3}/\d{1,3})\s                                #Paging       v.gr.   4/430
 """, re.VERBOSE | re.DOTALL)
 
+# All of the above page furniture, so that it can be removed within a single scan
+page_furniture_RE = re.compile('|'.join('(?:{})'.format(furniture_RE.pattern)
+                                        for furniture_RE in (header_link_RE, header_date_RE,
+                                                             footer_link_RE, footer_paging_RE)),
+                               re.VERBOSE | re.DOTALL)
+
 simple_trip_RE = re.compile(r"""
     \#\s
     (?P<number>\d{4})\s*    
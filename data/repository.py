@@ -0,0 +1,157 @@
+"""
+Storage behind the persistence methods of the model classes.
+
+Model classes build and take apart their objects, a Repository only stores plain
+values and gives back plain rows. Three backends are provided:
+
+    PostgresRepository  in data.postgres_repository, through the pool in data.database
+    SQLiteRepository    in data.sqlite_repository, on a local file, or ':memory:'
+    MemoryRepository    in data.memory_repository, everything held in dicts
+
+Postgres is used unless another one is chosen with use(). Every method takes an
+optional session, only the Postgres backend makes use of it.
+
+A flight row is
+    (flight_id, carrier, route_id, scheduled_begin, scheduled_block, equipment,
+     actual_begin, actual_block, name, origin, destination)
+a trip row, one for each duty_days row of the trip, is
+    (flight_id, report, rel, trip_date, dh, carrier, scheduled_begin, scheduled_block,
+     route_id, name, origin, destination, airplane_code, cabin_members, trip_id, position)
+"""
+from contextlib import nullcontext
+
+
+class Repository(object):
+
+    def savepoint(self, session=None):
+        """Everything stored within is either all stored, or leaves nothing of itself behind"""
+        return nullcontext()
+
+    def save_equipment(self, airplane_code: str, cabin_members: int, session=None) -> bool:
+        """False if already stored"""
+        raise NotImplementedError
+
+    def load_equipment(self, airplane_code: str, session=None) -> tuple:
+        """(airplane_code, cabin_members) or None"""
+        raise NotImplementedError
+
+    def load_equipments(self, session=None):
+        """Every stored (airplane_code, cabin_members)"""
+        raise NotImplementedError
+
+    def save_airport(self, iata_code: str, timezone: str, viaticum: str, session=None) -> bool:
+        """False if already stored"""
+        raise NotImplementedError
+
+    def update_airport(self, iata_code: str, timezone: str, viaticum: str, session=None):
+        raise NotImplementedError
+
+    def load_airport(self, iata_code: str, session=None) -> tuple:
+        """(iata_code, timezone, viaticum) or None"""
+        raise NotImplementedError
+
+    def load_airports(self, session=None):
+        """Every stored (iata_code, timezone, viaticum)"""
+        raise NotImplementedError
+
+    def import_airports(self, zones: dict, viaticum: str, session=None) -> tuple:
+        """Store every {iata_code: timezone} at once, new airports with viaticum, stored ones
+        keeping theirs. Gives back how many were (added, changed, unchanged)"""
+        raise NotImplementedError
+
+    def load_crew_member(self, crew_member_id, session=None) -> tuple:
+        """(name, pos, group, base, seniority) or None"""
+        raise NotImplementedError
+
+    def save_crew_member(self, crew_member_id, name: str, pos: str, group: str, base: str, seniority,
+                         session=None) -> bool:
+        """False if already stored"""
+        raise NotImplementedError
+
+    def update_crew_member(self, crew_member_id, name: str, pos: str, group: str, base: str, seniority,
+                           session=None):
+        """Store the crew member, replacing the stored one if any"""
+        raise NotImplementedError
+
+    def save_route(self, name: str, origin: str, destination: str, session=None) -> int:
+        """Store the route unless already stored, returning its route_id either way"""
+        raise NotImplementedError
+
+    def load_route_id(self, name: str, origin: str, destination: str, session=None) -> int:
+        """route_id or None"""
+        raise NotImplementedError
+
+    def load_route(self, route_id: int, session=None) -> tuple:
+        """(name, origin, destination) or None"""
+        raise NotImplementedError
+
+    def load_routes(self, session=None):
+        """Every stored (route_id, name, origin, destination)"""
+        raise NotImplementedError
+
+    def save_marker(self, route_id: int, begin, duration, session=None) -> bool:
+        """False if already stored"""
+        raise NotImplementedError
+
+    def save_reserve(self, route_id: int, begin, duration, position: str, session=None) -> bool:
+        """False if already stored"""
+        raise NotImplementedError
+
+    def save_flight(self, carrier: str, route_id: int, scheduled_begin, scheduled_block, equipment: str,
+                    session=None) -> int:
+        """Store the flight unless already stored, returning its flight_id either way"""
+        raise NotImplementedError
+
+    def update_flight(self, flight_id: int, carrier: str, route_id: int, scheduled_begin, scheduled_block,
+                      equipment: str, session=None):
+        raise NotImplementedError
+
+    def delete_flight(self, flight_id: int, session=None) -> bool:
+        """False if the flight can't be deleted because a trip holds it"""
+        raise NotImplementedError
+
+    def load_flight(self, flight_id: int, session=None) -> tuple:
+        """The flight row or None"""
+        raise NotImplementedError
+
+    def find_flight(self, carrier: str, route_id: int, scheduled_date, session=None) -> tuple:
+        """The flight row of the route scheduled to begin on scheduled_date or None"""
+        raise NotImplementedError
+
+    def load_flights_between(self, begin, end, session=None):
+        """Every flight row scheduled to begin within [begin, end)"""
+        raise NotImplementedError
+
+    def save_trip(self, number: str, dated, position: str, session=None):
+        """Store the trip unless already stored"""
+        raise NotImplementedError
+
+    def save_duty_days(self, rows: list, session=None):
+        """Store every (flight_id, trip_id, trip_date, report, rel, dh) unless already stored"""
+        raise NotImplementedError
+
+    def load_trip_rows(self, number: str, dated, session=None) -> list:
+        """The trip rows of a trip, ordered by scheduled_begin"""
+        raise NotImplementedError
+
+    def load_trip_rows_between(self, start, end, position: str = None, session=None):
+        """Every trip row dated within [start, end], optionally only those for position,
+        ordered by trip_date, trip_id and scheduled_begin"""
+        raise NotImplementedError
+
+
+_repository = None
+
+
+def use(repository: Repository):
+    """Have the model classes store into repository from now on"""
+    global _repository
+    _repository = repository
+
+
+def current() -> Repository:
+    global _repository
+    if _repository is None:
+        from data.postgres_repository import PostgresRepository
+        _repository = PostgresRepository()
+    return _repository
@@ -0,0 +1,379 @@
+"""
+Repository on a local SQLite file, for single user runs and tests that should not
+need a Postgres server.
+
+The schema is that of data/definitions.sql. SQLite has no interval, time or enum
+types: durations are stored as minutes, timestamps, dates and times as ISO
+strings, and enums as text checked against their values.
+"""
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, date, time, timedelta
+from itertools import count
+
+from data.repository import Repository
+
+schema = """
+    CREATE TABLE IF NOT EXISTS airports
+    (
+        iata_code TEXT NOT NULL PRIMARY KEY,
+        time_zone TEXT NOT NULL,
+        viaticum_zone TEXT NOT NULL CHECK (viaticum_zone IN ('high_cost', 'low_cost', 'superior_cost', 'border',
+                                                             'usa', 'new_york', 'madrid', 'paris'))
+    );
+
+    CREATE TABLE IF NOT EXISTS routes
+    (
+        route_id INTEGER NOT NULL PRIMARY KEY,
+        name TEXT NOT NULL,
+        origin TEXT NOT NULL REFERENCES airports (iata_code),
+        destination TEXT NOT NULL REFERENCES airports (iata_code),
+        UNIQUE (name, origin, destination)
+    );
+
+    CREATE TABLE IF NOT EXISTS equipments
+    (
+        code TEXT NOT NULL PRIMARY KEY,
+        cabin_members INTEGER
+    );
+
+    CREATE TABLE IF NOT EXISTS markers
+    (
+        marker_id INTEGER NOT NULL PRIMARY KEY,
+        route_id INTEGER NOT NULL,
+        begin TEXT NOT NULL,
+        duration INTEGER NOT NULL,
+        UNIQUE (route_id, begin, duration)
+    );
+
+    CREATE TABLE IF NOT EXISTS reserves
+    (
+        reserve_id INTEGER NOT NULL PRIMARY KEY,
+        route_id INTEGER NOT NULL,
+        begin TEXT NOT NULL,
+        duration INTEGER NOT NULL,
+        gposition TEXT NOT NULL CHECK (gposition IN ('EJE', 'SOB')),
+        UNIQUE (route_id, begin, duration)
+    );
+
+    -- There is no airlines table in definitions.sql, airline_iata_code references nothing
+    CREATE TABLE IF NOT EXISTS flights
+    (
+        flight_id INTEGER NOT NULL PRIMARY KEY,
+        airline_iata_code TEXT NOT NULL DEFAULT 'AM',
+        route_id INTEGER NOT NULL REFERENCES routes (route_id),
+        scheduled_begin TEXT NOT NULL,
+        scheduled_block INTEGER NOT NULL,
+        equipment TEXT REFERENCES equipments (code),
+        actual_begin TEXT,
+        actual_block INTEGER,
+        UNIQUE (airline_iata_code, route_id, scheduled_begin)
+    );
+
+    CREATE TABLE IF NOT EXISTS trips
+    (
+        number INTEGER NOT NULL CHECK (number < 10000),
+        dated TEXT NOT NULL,
+        mxn NUMERIC,
+        usd NUMERIC,
+        red_eye NUMERIC,
+        understaffed NUMERIC,
+        gposition TEXT CHECK (gposition IN ('EJE', 'SOB')),
+        PRIMARY KEY (number, dated)
+    );
+
+    CREATE TABLE IF NOT EXISTS duty_days
+    (
+        duty_day_id INTEGER NOT NULL PRIMARY KEY,
+        flight_id INTEGER NOT NULL REFERENCES flights (flight_id),
+        trip_id INTEGER NOT NULL CHECK (trip_id < 10000),
+        trip_date TEXT NOT NULL,
+        report TEXT,
+        rel TEXT,
+        dh INTEGER NOT NULL,
+        UNIQUE (flight_id, trip_id, trip_date),
+        FOREIGN KEY (trip_id, trip_date) REFERENCES trips (number, dated)
+    );
+
+    -- Indexes added to Postgres by data.migrations, flights are found by a range on their unique index
+    CREATE INDEX IF NOT EXISTS duty_days_trip_idx ON duty_days (trip_date, trip_id);
+    CREATE INDEX IF NOT EXISTS markers_begin_idx ON markers (begin);
+    CREATE INDEX IF NOT EXISTS reserves_begin_idx ON reserves (begin);
+
+    -- Not in definitions.sql, columns as read and written by CrewMember
+    CREATE TABLE IF NOT EXISTS crew_members
+    (
+        crew_member_id TEXT NOT NULL PRIMARY KEY,
+        name TEXT,
+        pos TEXT,
+        "group" TEXT,
+        base TEXT,
+        seniority INTEGER
+    );
+"""
+
+flights_sql = ('SELECT flights.flight_id, airline_iata_code, flights.route_id, scheduled_begin, '
+               '       scheduled_block, equipment, actual_begin, actual_block, '
+               '       routes.name, routes.origin, routes.destination '
+               '    FROM flights '
+               '    INNER JOIN routes ON flights.route_id = routes.route_id ')
+
+trip_rows_sql = ('SELECT duty_days.flight_id, report, rel, trip_date, dh, '
+                 '       airline_iata_code, scheduled_begin, scheduled_block, '
+                 '       routes.route_id, routes.name, routes.origin, routes.destination, '
+                 '       equipments.code, equipments.cabin_members, trip_id, trips.gposition '
+                 '    FROM duty_days '
+                 '    INNER JOIN flights ON duty_days.flight_id = flights.flight_id '
+                 '    INNER JOIN routes ON flights.route_id = routes.route_id '
+                 '    LEFT JOIN equipments ON flights.equipment = equipments.code '
+                 '    INNER JOIN trips ON duty_days.trip_id = trips.number '
+                 '                    AND duty_days.trip_date = trips.dated ')
+
+
+def minutes(a_timedelta: timedelta) -> int:
+    if a_timedelta is not None:
+        return a_timedelta // timedelta(minutes=1)
+
+
+def iso(value) -> str:
+    if value is not None:
+        return value.isoformat()
+
+
+def to_timedelta(value: int) -> timedelta:
+    if value is not None:
+        return timedelta(minutes=value)
+
+
+def to_datetime(value: str) -> datetime:
+    if value is not None:
+        return datetime.fromisoformat(value)
+
+
+def to_time(value: str) -> time:
+    if value is not None:
+        return time.fromisoformat(value)
+
+
+def flight_row(row) -> tuple:
+    (flight_id, carrier, route_id, scheduled_begin, scheduled_block, equipment, actual_begin, actual_block,
+     name, origin, destination) = row
+    return (flight_id, carrier, route_id, to_datetime(scheduled_begin), to_timedelta(scheduled_block), equipment,
+            to_datetime(actual_begin), to_timedelta(actual_block), name, origin, destination)
+
+
+def trip_row(row) -> tuple:
+    (flight_id, report, rel, trip_date, dh, carrier, scheduled_begin, scheduled_block,
+     route_id, name, origin, destination, airplane_code, cabin_members, trip_id, position) = row
+    return (flight_id, to_time(report), to_time(rel), date.fromisoformat(trip_date), bool(dh), carrier,
+            to_datetime(scheduled_begin), to_timedelta(scheduled_block), route_id, name, origin, destination,
+            airplane_code, cabin_members, trip_id, position)
+
+
+class SQLiteRepository(Repository):
+
+    def __init__(self, file_name: str = ':memory:'):
+        # Statements outside of a savepoint are committed right away
+        self.connection = sqlite3.connect(file_name, isolation_level=None, check_same_thread=False)
+        self.connection.execute('PRAGMA foreign_keys = ON')
+        self.connection.executescript(schema)
+        # Threads take turns, a savepoint is held by a single thread until released
+        self.lock = threading.RLock()
+        self.savepoint_names = count()
+
+    def close(self):
+        self.connection.close()
+
+    @contextmanager
+    def savepoint(self, session=None):
+        with self.lock:
+            name = 'savepoint_{}'.format(next(self.savepoint_names))
+            self.connection.execute('SAVEPOINT ' + name)
+            try:
+                yield
+            except BaseException:
+                self.connection.execute('ROLLBACK TO ' + name)
+                self.connection.execute('RELEASE ' + name)
+                raise
+            else:
+                self.connection.execute('RELEASE ' + name)
+
+    def execute(self, sql: str, values: tuple = ()) -> sqlite3.Cursor:
+        with self.lock:
+            return self.connection.execute(sql, values)
+
+    def fetchone(self, sql: str, values: tuple = ()) -> tuple:
+        with self.lock:
+            return self.connection.execute(sql, values).fetchone()
+
+    def fetchall(self, sql: str, values: tuple = ()) -> list:
+        with self.lock:
+            return self.connection.execute(sql, values).fetchall()
+
+    def insert(self, sql: str, values: tuple) -> bool:
+        """Run an INSERT ... ON CONFLICT DO NOTHING, False if nothing was inserted"""
+        return self.execute(sql, values).rowcount == 1
+
+    def save_equipment(self, airplane_code, cabin_members, session=None):
+        return self.insert('INSERT INTO equipments (code, cabin_members) VALUES (?, ?) '
+                           'ON CONFLICT DO NOTHING',
+                           (airplane_code, cabin_members))
+
+    def load_equipment(self, airplane_code, session=None):
+        return self.fetchone('SELECT code, cabin_members FROM equipments WHERE code=?', (airplane_code,))
+
+    def load_equipments(self, session=None):
+        return self.fetchall('SELECT code, cabin_members FROM equipments')
+
+    def save_airport(self, iata_code, timezone, viaticum, session=None):
+        return self.insert('INSERT INTO airports (iata_code, time_zone, viaticum_zone) VALUES (?, ?, ?) '
+                           'ON CONFLICT DO NOTHING',
+                           (iata_code, timezone, viaticum))
+
+    def update_airport(self, iata_code, timezone, viaticum, session=None):
+        self.execute('UPDATE airports SET time_zone = ?, viaticum_zone = ? WHERE iata_code = ?',
+                     (timezone, viaticum, iata_code))
+
+    def load_airport(self, iata_code, session=None):
+        return self.fetchone('SELECT iata_code, time_zone, viaticum_zone FROM airports WHERE iata_code=?',
+                            (iata_code,))
+
+    def load_airports(self, session=None):
+        return self.fetchall('SELECT iata_code, time_zone, viaticum_zone FROM airports')
+
+    def import_airports(self, zones, viaticum, session=None):
+        with self.savepoint():
+            self.connection.execute('CREATE TEMP TABLE IF NOT EXISTS airports_import '
+                                    '    (iata_code TEXT NOT NULL PRIMARY KEY, time_zone TEXT NOT NULL)')
+            self.connection.execute('DELETE FROM airports_import')
+            self.connection.executemany('INSERT INTO airports_import VALUES (?, ?)', zones.items())
+            changed = self.connection.execute('UPDATE airports SET time_zone = airports_import.time_zone '
+                                              '    FROM airports_import '
+                                              '    WHERE airports.iata_code = airports_import.iata_code '
+                                              '      AND airports.time_zone <> airports_import.time_zone').rowcount
+            # WHERE true keeps ON CONFLICT from being taken as part of the SELECT
+            added = self.connection.execute('INSERT INTO airports (iata_code, time_zone, viaticum_zone) '
+                                            '    SELECT iata_code, time_zone, ? FROM airports_import WHERE true '
+                                            'ON CONFLICT DO NOTHING', (viaticum,)).rowcount
+        return added, changed, len(zones) - added - changed
+
+    def load_crew_member(self, crew_member_id, session=None):
+        return self.fetchone('SELECT name, pos, "group", base, seniority FROM crew_members '
+                            'WHERE crew_member_id=?', (crew_member_id,))
+
+    def save_crew_member(self, crew_member_id, name, pos, group, base, seniority, session=None):
+        return self.insert('INSERT INTO crew_members (crew_member_id, name, pos, "group", base, seniority) '
+                           'VALUES (?, ?, ?, ?, ?, ?) '
+                           'ON CONFLICT DO NOTHING',
+                           (crew_member_id, name, pos, group, base, seniority))
+
+    def update_crew_member(self, crew_member_id, name, pos, group, base, seniority, session=None):
+        self.execute('INSERT INTO crew_members (crew_member_id, name, pos, "group", base, seniority) '
+                     'VALUES (?, ?, ?, ?, ?, ?) '
+                     'ON CONFLICT (crew_member_id) DO UPDATE '
+                     'SET name = excluded.name, pos = excluded.pos, "group" = excluded."group", '
+                     'base = excluded.base, seniority = excluded.seniority',
+                     (crew_member_id, name, pos, group, base, seniority))
+
+    def save_route(self, name, origin, destination, session=None):
+        with self.lock:
+            self.execute('INSERT INTO routes (name, origin, destination) VALUES (?, ?, ?) '
+                         'ON CONFLICT DO NOTHING',
+                         (name, origin, destination))
+            return self.load_route_id(name, origin, destination)
+
+    def load_route_id(self, name, origin, destination, session=None):
+        route_id = self.fetchone('SELECT route_id FROM routes WHERE name=? AND origin=? AND destination=?',
+                                (name, origin, destination))
+        if route_id:
+            return route_id[0]
+
+    def load_route(self, route_id, session=None):
+        return self.fetchone('SELECT name, origin, destination FROM routes WHERE route_id=?',
+                            (route_id,))
+
+    def load_routes(self, session=None):
+        return self.fetchall('SELECT route_id, name, origin, destination FROM routes')
+
+    def save_marker(self, route_id, begin, duration, session=None):
+        return self.insert('INSERT INTO markers (route_id, begin, duration) VALUES (?, ?, ?) '
+                           'ON CONFLICT DO NOTHING',
+                           (route_id, iso(begin), minutes(duration)))
+
+    def save_reserve(self, route_id, begin, duration, position, session=None):
+        return self.insert('INSERT INTO reserves (route_id, begin, duration, gposition) VALUES (?, ?, ?, ?) '
+                           'ON CONFLICT DO NOTHING',
+                           (route_id, iso(begin), minutes(duration), position))
+
+    def save_flight(self, carrier, route_id, scheduled_begin, scheduled_block, equipment, session=None):
+        with self.lock:
+            self.execute('INSERT INTO flights (airline_iata_code, route_id, scheduled_begin, '
+                         '                     scheduled_block, equipment) '
+                         'VALUES (?, ?, ?, ?, ?) '
+                         'ON CONFLICT DO NOTHING',
+                         (carrier, route_id, iso(scheduled_begin), minutes(scheduled_block), equipment))
+            return self.fetchone('SELECT flight_id FROM flights '
+                                 'WHERE airline_iata_code=? AND route_id=? AND scheduled_begin=?',
+                                 (carrier, route_id, iso(scheduled_begin)))[0]
+
+    def update_flight(self, flight_id, carrier, route_id, scheduled_begin, scheduled_block, equipment,
+                      session=None):
+        self.execute('UPDATE flights SET airline_iata_code = ?, route_id = ?, scheduled_begin = ?, '
+                     '                   scheduled_block = ?, equipment = ? '
+                     'WHERE flight_id = ?',
+                     (carrier, route_id, iso(scheduled_begin), minutes(scheduled_block), equipment, flight_id))
+
+    def delete_flight(self, flight_id, session=None):
+        try:
+            self.execute('DELETE FROM flights WHERE flight_id = ?', (flight_id,))
+        except sqlite3.IntegrityError:
+            return False
+        return True
+
+    def load_flight(self, flight_id, session=None):
+        row = self.fetchone(flights_sql + 'WHERE flights.flight_id=?', (flight_id,))
+        if row:
+            return flight_row(row)
+
+    def find_flight(self, carrier, route_id, scheduled_date, session=None):
+        next_date = scheduled_date + timedelta(days=1)
+        row = self.fetchone(flights_sql +
+                           'WHERE airline_iata_code=? AND flights.route_id=? '
+                           '  AND scheduled_begin >= ? AND scheduled_begin < ?',
+                           (carrier, route_id, iso(scheduled_date), iso(next_date)))
+        if row:
+            return flight_row(row)
+
+    def load_flights_between(self, begin, end, session=None):
+        rows = self.fetchall(flights_sql + 'WHERE scheduled_begin >= ? AND scheduled_begin < ?',
+                            (iso(begin), iso(end)))
+        return [flight_row(row) for row in rows]
+
+    def save_trip(self, number, dated, position, session=None):
+        self.execute('INSERT INTO trips (number, dated, gposition) VALUES (?, ?, ?) '
+                     'ON CONFLICT DO NOTHING',
+                     (int(number), iso(dated), position))
+
+    def save_duty_days(self, rows, session=None):
+        with self.lock:
+            self.connection.executemany('INSERT INTO duty_days (flight_id, trip_id, trip_date, report, rel, dh) '
+                                        'VALUES (?, ?, ?, ?, ?, ?) '
+                                        'ON CONFLICT DO NOTHING',
+                                        [(flight_id, int(trip_id), iso(trip_date), iso(report), iso(rel), dh)
+                                         for flight_id, trip_id, trip_date, report, rel, dh in rows])
+
+    def load_trip_rows(self, number, dated, session=None):
+        rows = self.fetchall(trip_rows_sql +
+                            'WHERE trip_id = ? AND trip_date = ? '
+                            'ORDER BY scheduled_begin ASC',
+                            (int(number), iso(dated)))
+        return [trip_row(row) for row in rows]
+
+    def load_trip_rows_between(self, start, end, position=None, session=None):
+        rows = self.fetchall(trip_rows_sql +
+                            'WHERE trip_date BETWEEN ? AND ? '
+                            '  AND (? IS NULL OR trips.gposition = ?) '
+                            'ORDER BY trip_date, trip_id, scheduled_begin ASC',
+                            (iso(start), iso(end), position, position))
+        return [trip_row(row) for row in rows]
@@ -0,0 +1,229 @@
+"""
+One pass tokenizer for PBS trips.
+
+Instead of matching trip_RE, then dutyday_RE over every trip and flights_RE over
+every duty day, the text is split once into words which are turned into typed
+tokens, and a small state machine builds the very same json_trip dicts that
+get_json_trip returns.
+"""
+import re
+
+from data.pbs_reader import OffsetMap, iter_trip_blocks, strip_page_furniture
+
+TRIP = 'TRIP'
+CHECK_IN = 'CHECK_IN'
+DUTY_DAY = 'DUTY_DAY'
+FLIGHT = 'FLIGHT'
+LAYOVER = 'LAYOVER'
+DUTY_DAY_TOTALS = 'DUTY_DAY_TOTALS'
+TRIP_TOTALS = 'TRIP_TOTALS'
+
+FLIGHT_FIELDS = ('name', 'origin', 'begin', 'destination', 'end', 'blk', 'turn', 'equipment')
+
+word_RE = re.compile(r'\S+')
+
+
+class TripSyntaxError(Exception):
+
+    def __init__(self, message: str, word_index: int) -> None:
+        super().__init__(message)
+        self.word_index = word_index
+
+
+def is_hhmm(word: str) -> bool:
+    """v.gr. 0600"""
+    return len(word) == 4 and word.isdigit()
+
+
+def is_hh_mm(word: str, hour_digits: int = 2) -> bool:
+    """v.gr. 23:54 or 123:54 for hour_digits up to 3"""
+    hours, colon, minutes = word.partition(':')
+    return bool(colon) and 1 <= len(hours) <= hour_digits and hours.isdigit() and \
+        len(minutes) == 2 and minutes.isdigit()
+
+
+def is_airport(word: str) -> bool:
+    """v.gr. MEX"""
+    return len(word) == 3 and word.isalpha() and word.isupper()
+
+
+def is_dated(word: str) -> bool:
+    """v.gr. 15FEB2018"""
+    return len(word) == 9 and word[:2].isdigit() and is_airport(word[2:5]) and word[5:].isdigit()
+
+
+def is_flight(words: list) -> bool:
+    """words being NAME ORG BEGIN DES END BLK TURN EQ"""
+    name, origin, begin, destination, end, blk, turn, equipment = words
+    return 4 <= len(name) <= 6 and name.isalnum() and \
+        is_airport(origin) and is_airport(destination) and \
+        (begin + end + blk + turn).isdigit() and len(begin + end + blk + turn) == 16 and \
+        len(equipment) == 3 and equipment.isalnum()
+
+
+def tokenize(text: str):
+    """Yield (kind, word_index, fields) for every token within text"""
+    words = text.split()
+    count = len(words)
+    i = 0
+    while i < count:
+        word = words[i]
+        first = word[0]
+
+        if first == '#':
+            # Trip header                         v.gr. # 3760
+            number, step = (word[1:], 1) if len(word) > 1 else (words[i + 1] if i + 1 < count else '', 2)
+            if is_hhmm(number):
+                yield TRIP, i, (number,)
+                i += step
+                continue
+
+        elif first.isdigit():
+            following = words[i + 1] if i + 1 < count else ''
+            if len(word) == 5 and word[2] == ':':
+                # Check in time and trip's date   v.gr. 06:00 15FEB2018
+                if is_hh_mm(word) and is_dated(following):
+                    yield CHECK_IN, i, (word, following)
+                    i += 2
+                    continue
+            elif len(word) == 5:
+                # Duty day header                 v.gr. 15FEB 0600
+                if word[:2].isdigit() and is_airport(word[2:]) and is_hhmm(following):
+                    yield DUTY_DAY, i, (word[:2], word[2:], following)
+                    i += 2
+                    continue
+            elif len(word) == 6 and word.endswith('BL'):
+                # Duty day totals                 v.gr. 1100BL 0000CRD 1100TL 1330DY
+                totals = words[i:i + 4]
+                if len(totals) == 4 and is_hhmm(word[:4]) and totals[1].endswith('CRD') and \
+                        4 <= len(totals[1]) - 3 <= 5 and totals[1][:-3].lstrip('-').isdigit() and \
+                        totals[2].endswith('TL') and is_hhmm(totals[2][:-2]) and \
+                        totals[3].endswith('DY') and is_hhmm(totals[3][:-2]):
+                    yield DUTY_DAY_TOTALS, i, (word[:4], totals[1][:-3], totals[2][:-2], totals[3][:-2])
+                    i += 4
+                    continue
+
+        elif word == 'TOTALS':
+            # Trip totals                         v.gr. TOTALS 11:00TL 11:00BL 0:00CR 13:30TAFB
+            totals = words[i + 1:i + 5]
+            if len(totals) == 4 and totals[0].endswith('TL') and is_hh_mm(totals[0][:-2]) and \
+                    totals[1].endswith('BL') and is_hh_mm(totals[1][:-2]) and \
+                    totals[2].endswith('CR') and is_hh_mm(totals[2][:-2]) and \
+                    totals[3].endswith('TAFB') and is_hh_mm(totals[3][:-4], 3):
+                yield TRIP_TOTALS, i, (totals[0][:-2], totals[1][:-2], totals[2][:-2], totals[3][:-4])
+                i += 5
+                continue
+
+        elif len(word) == 3 and i + 1 < count and len(words[i + 1]) == 5 and is_airport(word) and \
+                is_hh_mm(words[i + 1]):
+            # Layover                             v.gr. JFK 23:54
+            yield LAYOVER, i, (word, words[i + 1])
+            i += 2
+            continue
+
+        # Flight row                              v.gr. 0403 MEX 0700 JFK 1300 0600 0100 7S8
+        # Word lengths are checked first, most words are quickly discarded that way
+        if i + 7 < count and len(words[i + 1]) == 3 and len(words[i + 2]) == 4:
+            row = words[i:i + 8]
+            if is_flight(row):
+                yield FLIGHT, i, tuple(row)
+                i += 8
+                continue
+
+        i += 1
+
+
+def close_duty_day(duty_day: dict, word_index: int) -> dict:
+    """Same re-arrangement as get_json_duty_day"""
+    flights = duty_day['flights']
+    if not flights:
+        raise TripSyntaxError("Duty day {day}{month} has no flights".format(**duty_day), word_index)
+    duty_day['layover_duration'] = duty_day['layover_duration'] if duty_day['layover_duration'] else '0000'
+    duty_day['rls'] = flights[-1]['blk']
+    flights[-1]['blk'] = flights[-1]['turn']
+    flights[-1]['turn'] = '0000'
+    return duty_day
+
+
+def parse_trips(text: str):
+    """Yield every json_trip within text, the same as get_json_trip would"""
+    trip = None
+    duty_day = None
+    for kind, word_index, fields in tokenize(text):
+        if kind == TRIP:
+            if trip:
+                raise TripSyntaxError("Trip {number} has no TOTALS".format(**trip), word_index)
+            trip = {'number': fields[0]}
+            duty_day = None
+
+        elif trip is None:
+            # Nothing outside a trip matters
+            continue
+
+        elif kind == CHECK_IN:
+            if 'check_in' not in trip:
+                trip['check_in'], trip['dated'] = fields
+                trip['duty_days'] = []
+
+        elif 'check_in' not in trip:
+            # Nothing between the trip's number and its check in matters
+            continue
+
+        elif kind == TRIP_TOTALS:
+            # A duty day left without totals is dropped, as dutyday_RE would do
+            duty_day = None
+            trip['tl'], trip['bl'], trip['cr'], trip['tafb'] = fields
+            trip['date_and_time'] = trip['dated'] + trip['check_in']
+            yield trip
+            trip = None
+
+        elif kind == DUTY_DAY:
+            # A dated row within an open duty day is just one more flight row
+            if duty_day is None:
+                duty_day = {'day': fields[0], 'month': fields[1], 'report': fields[2], 'flights': [],
+                            'layover_city': None, 'layover_duration': None}
+
+        elif duty_day is None:
+            # Flights, layovers and totals only count within a duty day
+            continue
+
+        elif kind == FLIGHT:
+            duty_day['flights'].append(dict(zip(FLIGHT_FIELDS, fields)))
+
+        elif kind == LAYOVER:
+            duty_day['layover_city'], duty_day['layover_duration'] = fields
+
+        elif kind == DUTY_DAY_TOTALS:
+            duty_day['bl'], duty_day['crd'], duty_day['tl'], duty_day['dy'] = fields
+            trip['duty_days'].append(close_duty_day(duty_day, word_index))
+            duty_day = None
+
+    if trip:
+        raise TripSyntaxError("Trip {number} has no TOTALS".format(**trip), -1)
+
+
+def word_position(text: str, word_index: int) -> int:
+    """Position within text where its word_index word starts, -1 stands for text's end"""
+    if word_index < 0:
+        return len(text)
+    for index, word_match in enumerate(word_RE.finditer(text)):
+        if index == word_index:
+            return word_match.start()
+    return len(text)
+
+
+def parse_trip_block(block: str, offset_map: OffsetMap, file_name: str) -> list:
+    """Return the json_trips within an already stripped trip block"""
+    try:
+        return list(parse_trips(block))
+    except TripSyntaxError as e:
+        position = offset_map.original(word_position(block, e.word_index))
+        print("Unable to read trip, {} at position {} of {}".format(e, position, file_name))
+        return []
+
+
+def read_json_trips(file_name: str, encoding: str = None):
+    """Yield one json_trip at a time, the tokenizer counterpart of read_trips + get_json_trip"""
+    for offset, block in iter_trip_blocks(file_name, encoding):
+        block, offset_map = strip_page_furniture(block, offset, encoding)
+        yield from parse_trip_block(block, offset_map, file_name)
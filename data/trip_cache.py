@@ -0,0 +1,118 @@
+"""
+Content-addressed on-disk cache of parsed PBS trips.
+
+Each trip block, once its page headers and footers are stripped, is hashed along
+with the name of the parser it went through, and its json_trips are stored under
+that hash. Re-reading a PBS file, or a revision of it, only parses those blocks
+that were never seen before. The cache is shared by all months and kept under a
+size cap by evicting the least recently used blocks.
+"""
+import hashlib
+import json
+import sqlite3
+
+from data.pbs_reader import iter_trip_blocks, strip_page_furniture
+from data.tokenizer import parse_trip_block
+
+# Bump whenever the json_trips given by a parser change, so that blocks get parsed again
+CACHE_VERSION = 1
+
+
+class TripCache(object):
+    """json_trips stored by the hash of the trip block they were parsed from"""
+
+    def __init__(self, file_name: str, max_size: int = 256 * 2 ** 20):
+        """max_size is the number of bytes allowed for all stored json_trips"""
+        self.file_name = file_name
+        self.max_size = max_size
+        # Trip files are read by read_trip_files' thread, which is joined before the cache is closed
+        self.connection = sqlite3.connect(file_name, check_same_thread=False)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS trip_blocks (
+                block_hash TEXT PRIMARY KEY,
+                source     TEXT NOT NULL,
+                json_trips TEXT NOT NULL,
+                size       INTEGER NOT NULL,
+                last_used  INTEGER NOT NULL)""")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS trip_blocks_last_used ON trip_blocks (last_used)")
+        self.connection.commit()
+        # Blocks are stamped with an ever increasing use count rather than a timestamp
+        self.clock = self.connection.execute("SELECT COALESCE(MAX(last_used), 0) FROM trip_blocks").fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def block_hash(block: str, parser: str = '') -> str:
+        """Hash of block as parsed by parser, each one giving its own json_trips"""
+        key = '{}:{}\n{}'.format(CACHE_VERSION, parser, block)
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def get(self, block_hash: str) -> list:
+        """Return the json_trips stored for block_hash, None if there are none"""
+        row = self.connection.execute("SELECT json_trips FROM trip_blocks WHERE block_hash = ?",
+                                      (block_hash,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.clock += 1
+        self.connection.execute("UPDATE trip_blocks SET last_used = ? WHERE block_hash = ?",
+                                (self.clock, block_hash))
+        return json.loads(row[0])
+
+    def put(self, block_hash: str, source: str, json_trips: list):
+        """Store the json_trips parsed from a block found within source"""
+        payload = json.dumps(json_trips)
+        self.clock += 1
+        self.connection.execute("INSERT OR REPLACE INTO trip_blocks VALUES (?, ?, ?, ?, ?)",
+                                (block_hash, source, payload, len(payload), self.clock))
+
+    def size(self) -> int:
+        return self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM trip_blocks").fetchone()[0]
+
+    def evict(self) -> int:
+        """Drop least recently used blocks until the cache fits within max_size.
+        Returns the number of dropped blocks"""
+        excess = self.size() - self.max_size
+        dropped = []
+        if excess > 0:
+            for block_hash, size in self.connection.execute(
+                    "SELECT block_hash, size FROM trip_blocks ORDER BY last_used"):
+                if excess <= 0:
+                    break
+                dropped.append((block_hash,))
+                excess -= size
+            self.connection.executemany("DELETE FROM trip_blocks WHERE block_hash = ?", dropped)
+        return len(dropped)
+
+    def commit(self):
+        """Make all gets and puts durable and evict whatever exceeds max_size"""
+        self.evict()
+        self.connection.commit()
+
+    def close(self):
+        self.commit()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def read_cached_json_trips(file_name: str, encoding: str = None, cache: TripCache = None,
+                           parse_block=parse_trip_block):
+    """Yield one json_trip at a time, only blocks missing from cache are parsed through parse_block"""
+    parser = '{}.{}'.format(parse_block.__module__, parse_block.__qualname__)
+    for offset, block in iter_trip_blocks(file_name, encoding):
+        block, offset_map = strip_page_furniture(block, offset, encoding)
+        block_hash = cache.block_hash(block, parser)
+        json_trips = cache.get(block_hash)
+        if json_trips is None:
+            json_trips = parse_block(block, offset_map, file_name)
+            if json_trips:
+                # Unreadable blocks are not stored, so they keep being reported
+                cache.put(block_hash, file_name, json_trips)
+        yield from json_trips
+    cache.commit()
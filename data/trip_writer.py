@@ -0,0 +1,110 @@
+"""
+Set-based persistence for batches of trips.
+
+Trip.save_to_db walks every duty day, flight and route issuing a SELECT and an
+INSERT for each one of them. save_trips stores a whole list of trips within a
+single transaction and at most four statements, one for each of the routes,
+flights, trips and duty_days tables, no matter how many trips there are.
+"""
+from psycopg2.extras import execute_values
+
+from data.database import CursorFromConnectionPool, Session
+
+# Missing rows are inserted and existing ones selected, so every given row gets its id back
+routes_sql = """
+    WITH given (name, origin, destination) AS (VALUES %s),
+         inserted AS (INSERT INTO public.routes (name, origin, destination)
+                          SELECT name, origin, destination FROM given
+                          ON CONFLICT DO NOTHING
+                          RETURNING route_id, name, origin, destination)
+    SELECT route_id, name, origin, destination FROM inserted
+    UNION ALL
+    SELECT routes.route_id, routes.name, routes.origin, routes.destination
+        FROM public.routes INNER JOIN given USING (name, origin, destination)"""
+
+flights_sql = """
+    WITH given (airline_iata_code, route_id, scheduled_begin, scheduled_block, equipment) AS (VALUES %s),
+         inserted AS (INSERT INTO public.flights (airline_iata_code, route_id, scheduled_begin,
+                                                  scheduled_block, equipment)
+                          SELECT airline_iata_code, route_id, scheduled_begin, scheduled_block, equipment
+                              FROM given
+                          ON CONFLICT DO NOTHING
+                          RETURNING flight_id, airline_iata_code, route_id, scheduled_begin)
+    SELECT flight_id, airline_iata_code, route_id, scheduled_begin FROM inserted
+    UNION ALL
+    SELECT flights.flight_id, flights.airline_iata_code, flights.route_id, flights.scheduled_begin
+        FROM public.flights INNER JOIN given USING (airline_iata_code, route_id, scheduled_begin)"""
+
+trips_sql = """
+    INSERT INTO public.trips (number, dated, gposition) VALUES %s
+        ON CONFLICT DO NOTHING"""
+
+# flight_begin is taken from the flight, a missing one leaves it NULL and the duty days are refused
+duty_days_sql = """
+    WITH given (flight_id, trip_id, trip_date, report, rel, dh) AS (VALUES %s)
+    INSERT INTO public.duty_days (flight_id, flight_begin, trip_id, trip_date, report, rel, dh)
+        SELECT flight_id, flights.scheduled_begin, trip_id::smallint, trip_date::date,
+               report::time, rel::time, dh::boolean
+            FROM given LEFT JOIN public.flights USING (flight_id)
+        ON CONFLICT (flight_id, trip_id, trip_date) DO NOTHING"""
+
+
+def route_key(route) -> tuple:
+    return route.name, route.origin.iata_code, route.destination.iata_code
+
+
+def flight_key(flight) -> tuple:
+    return flight.carrier, flight.route.route_id, flight.begin
+
+
+def save_routes(cursor, routes):
+    """Give a route_id to every route, storing those that are missing"""
+    rows = {route_key(route): route for route in routes if not route.route_id}
+    if rows:
+        found = execute_values(cursor, routes_sql, list(rows), page_size=len(rows), fetch=True)
+        for route_id, name, origin, destination in found:
+            rows[(name, origin, destination)].route_id = route_id
+
+
+def save_flights(cursor, flights):
+    """Give an event_id to every flight, storing those that are missing"""
+    missing = dict()
+    for flight in flights:
+        if not flight.event_id:
+            missing.setdefault(flight_key(flight), []).append(flight)
+    if missing:
+        rows = [(carrier, route_id, begin, same_flights[0].duration.as_timedelta(),
+                 same_flights[0].equipment.airplane_code if same_flights[0].equipment else None)
+                for (carrier, route_id, begin), same_flights in missing.items()]
+        found = execute_values(cursor, flights_sql, rows, page_size=len(rows), fetch=True)
+        for flight_id, carrier, route_id, begin in found:
+            for flight in missing[(carrier, route_id, begin)]:
+                flight.event_id = flight_id
+
+
+def save_trips(trips: list, session: Session = None):
+    """Store trips with all their duty days, flights and routes, within session if given"""
+    trips = [trip for trip in trips if trip.duty_days]
+    if not trips:
+        return
+    flights = [flight for trip in trips for duty_day in trip.duty_days for flight in duty_day.events]
+
+    with CursorFromConnectionPool(session=session) as cursor:
+        save_routes(cursor, (flight.route for flight in flights))
+        save_flights(cursor, flights)
+
+        trip_rows = {(trip.number, trip.dated): trip.position for trip in trips}
+        execute_values(cursor, trips_sql, [key + (position,) for key, position in trip_rows.items()],
+                       page_size=len(trip_rows))
+
+        duty_day_rows = dict()
+        for trip in trips:
+            for duty_day in trip.duty_days:
+                last = len(duty_day.events) - 1
+                for index, flight in enumerate(duty_day.events):
+                    report = duty_day.report.time() if index == 0 else None
+                    release = duty_day.release.time() if index == last else None
+                    duty_day_rows.setdefault((flight.event_id, trip.number, trip.dated),
+                                             (report, release, flight.dh))
+        execute_values(cursor, duty_days_sql, [key + values for key, values in duty_day_rows.items()],
+                       page_size=len(duty_day_rows))
@@ -0,0 +1,178 @@
+"""
+UTC offsets of every airport in iata_tzmap.txt, compiled into a few arrays so that
+local times are found by a lookup instead of resolving each airport's zone every time.
+
+    python -m data.tz_table [first_year last_year]
+
+compiles data/iata_tzmap.txt into data/iata_tz.npz, the table current() loads,
+compiling it first if missing.
+
+Each zone's offsets are kept as the UTC minutes from epoch at which they take effect,
+from the first of January of first_year on. Times before it take first_year's offset.
+"""
+import os
+import sys
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import numpy as np
+
+tzmap_file = os.path.join(os.path.dirname(__file__), 'iata_tzmap.txt')
+table_file = os.path.join(os.path.dirname(__file__), 'iata_tz.npz')
+# Years operated, offsets are looked up one by one within each day of them
+first_year = 2000
+last_year = 2040
+MINUTES_PER_DAY = 24 * 60
+
+
+def read_tzmap(file_name: str = tzmap_file) -> dict:
+    """{iata_code: zone name} as listed in file_name, one 'MEX  America Mexico_City' per line"""
+    zones = dict()
+    with open(file_name) as fp:
+        for line in fp:
+            fields = line.split()
+            if len(fields) >= 3:
+                zones[fields[0]] = '/'.join(fields[1:])
+    return zones
+
+
+def utc_offset(zone: ZoneInfo, minutes: int) -> int:
+    """Offset of zone, in minutes, at minutes from epoch UTC"""
+    return int(datetime.fromtimestamp(minutes * 60, zone).utcoffset().total_seconds()) // 60
+
+
+def zone_transitions(zone: ZoneInfo, begin: int, end: int) -> list:
+    """(minutes from epoch UTC, offset) of every change of offset within [begin, end), the
+    one at begin included. Offsets are checked daily, each change found by bisection"""
+    offset = utc_offset(zone, begin)
+    transitions = [(begin, offset)]
+    for day in range(begin, end, MINUTES_PER_DAY):
+        next_offset = utc_offset(zone, day + MINUTES_PER_DAY)
+        if next_offset != offset:
+            low, high = day, day + MINUTES_PER_DAY
+            while high - low > 1:
+                middle = (low + high) // 2
+                if utc_offset(zone, middle) == offset:
+                    low = middle
+                else:
+                    high = middle
+            transitions.append((high, next_offset))
+            offset = next_offset
+    return transitions
+
+
+class TimeZoneTable(object):
+    """
+    airport_codes   IATA codes, sorted, each with its zone in airport_zones
+    zone_names      every zone, by index
+    keys            zone << 32 | minutes since begin, for every transition, sorted
+    offsets         offset in minutes taking effect at each key
+    """
+
+    def __init__(self, airport_codes, airport_zones, zone_names, keys, offsets, begin: int):
+        self.airport_codes = np.asarray(airport_codes)
+        self.airport_zones = np.asarray(airport_zones, dtype=np.int32)
+        self.zone_names = list(zone_names)
+        self.keys = np.asarray(keys, dtype=np.int64)
+        self.offsets = np.asarray(offsets, dtype=np.int16)
+        self.begin = int(begin)
+        self._zones = {name: index for index, name in enumerate(self.zone_names)}
+        self._airports = {code: int(zone) for code, zone in zip(self.airport_codes.tolist(), self.airport_zones)}
+
+    @classmethod
+    def compile(cls, zones: dict, first: int = first_year, last: int = last_year):
+        """Table for {iata_code: zone name}, as given by read_tzmap, over [first, last] years.
+        Airports whose zone is unknown are left out"""
+        begin = int(datetime(first, 1, 1, tzinfo=timezone.utc).timestamp()) // 60
+        end = int(datetime(last + 1, 1, 1, tzinfo=timezone.utc).timestamp()) // 60
+        zone_names, keys, offsets = [], [], []
+        airport_codes, airport_zones = [], []
+        for iata_code, zone_name in sorted(zones.items()):
+            if zone_name not in zone_names:
+                try:
+                    zone = ZoneInfo(zone_name)
+                except (ZoneInfoNotFoundError, ValueError):
+                    print("{} has an unknown time zone {}".format(iata_code, zone_name))
+                    continue
+                for minutes, offset in zone_transitions(zone, begin, end):
+                    keys.append(len(zone_names) << 32 | minutes - begin)
+                    offsets.append(offset)
+                zone_names.append(zone_name)
+            airport_codes.append(iata_code)
+            airport_zones.append(zone_names.index(zone_name))
+        return cls(np.array(airport_codes, dtype='U3'), airport_zones, zone_names, keys, offsets, begin)
+
+    @classmethod
+    def load(cls, file_name: str = table_file):
+        with np.load(file_name) as table:
+            return cls(table['airport_codes'], table['airport_zones'], table['zone_names'].tolist(),
+                       table['keys'], table['offsets'], table['begin'])
+
+    def save(self, file_name: str = table_file):
+        np.savez_compressed(file_name, airport_codes=self.airport_codes, airport_zones=self.airport_zones,
+                            zone_names=np.array(self.zone_names), keys=self.keys, offsets=self.offsets,
+                            begin=self.begin)
+
+    def zone_of(self, airport) -> int:
+        """Index of the zone of an Airport, or of an IATA code, by the map first, then by its own timezone"""
+        iata_code = getattr(airport, 'iata_code', airport)
+        if iata_code in self._airports:
+            return self._airports[iata_code]
+        zone_name = getattr(airport, 'timezone', None)
+        if zone_name in self._zones:
+            return self._zones[zone_name]
+        if zone_name is None:
+            raise ValueError("{} is not in the time zone table and has no time zone of its own".format(iata_code))
+        raise ValueError("{} is not in the time zone table, nor is its time zone {}".format(iata_code, zone_name))
+
+    def zones_of(self, airports) -> np.ndarray:
+        """Index of the zone of every Airport or IATA code"""
+        return np.fromiter((self.zone_of(airport) for airport in airports), dtype=np.int64)
+
+    def utc_offsets(self, zones: np.ndarray, utc_minutes: np.ndarray) -> np.ndarray:
+        """Offset in minutes of each zone at each UTC minutes from epoch"""
+        since_begin = np.clip(np.asarray(utc_minutes, dtype=np.int64) - self.begin, 0, 2 ** 32 - 1)
+        index = np.searchsorted(self.keys, np.asarray(zones, dtype=np.int64) << 32 | since_begin, side='right') - 1
+        return self.offsets[index].astype(np.int64)
+
+    def to_local(self, zones: np.ndarray, utc_minutes: np.ndarray) -> np.ndarray:
+        """Local minutes from epoch of each UTC minutes from epoch, at each zone"""
+        return np.asarray(utc_minutes, dtype=np.int64) + self.utc_offsets(zones, utc_minutes)
+
+    def to_utc(self, zones: np.ndarray, local_minutes: np.ndarray) -> np.ndarray:
+        """UTC minutes from epoch of each local minutes from epoch, at each zone.
+        Local times skipped or repeated as clocks change are taken with the offset found first"""
+        local_minutes = np.asarray(local_minutes, dtype=np.int64)
+        # Taken as UTC, local time is off by the offset at most, which is then checked at the estimate
+        estimate = local_minutes - self.utc_offsets(zones, local_minutes)
+        return local_minutes - self.utc_offsets(zones, estimate)
+
+    def local_offset(self, airport, utc_minutes: int) -> int:
+        """Offset in minutes at airport, an Airport or IATA code, at UTC minutes from epoch"""
+        key = self.zone_of(airport) << 32 | min(max(utc_minutes - self.begin, 0), 2 ** 32 - 1)
+        return int(self.offsets[np.searchsorted(self.keys, key, side='right') - 1])
+
+
+_table = None
+
+
+def use(table: TimeZoneTable):
+    """Have local times looked up in table from now on, the one in table_file if None"""
+    global _table
+    _table = table
+
+
+def current() -> TimeZoneTable:
+    """The table in table_file, compiled from tzmap_file first if there is none"""
+    global _table
+    if _table is None:
+        if not os.path.exists(table_file):
+            TimeZoneTable.compile(read_tzmap()).save()
+        _table = TimeZoneTable.load()
+    return _table
+
+
+if __name__ == '__main__':
+    years = [int(year) for year in sys.argv[1:3]] or [first_year, last_year]
+    TimeZoneTable.compile(read_tzmap(), *years).save()
+    print("{} compiled".format(table_file))
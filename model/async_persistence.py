@@ -0,0 +1,221 @@
+"""
+asyncio counterpart of the schedule model's persistence methods.
+
+Each coroutine takes an asyncpg connection as given by data.async_database.ConnectionFromPool
+and does the same as its synchronous save_to_db/load_from_db_by_* counterpart, so that many
+trips may be saved or loaded at once. Inserts rely on ON CONFLICT, concurrent saves of the
+same route or flight never fail.
+
+Given a new_ids dict, the ids a save gives to routes and flights are kept there rather than
+on them, to be copied onto them once its transaction is committed. Until then, those ids
+may still be rolled back and must not be seen by other saves sharing the same routes.
+"""
+import asyncio
+
+from data.async_database import ConnectionFromPool
+from data.postgres_repository import flights_sql, trip_rows_sql
+from model.scheduleClasses import Equipment, Airport, Route, Flight, Trip
+
+
+async def save_equipment(connection, equipment: Equipment):
+    await connection.execute('INSERT INTO equipments (code, cabin_members) '
+                             'VALUES ($1, $2) '
+                             'ON CONFLICT DO NOTHING',
+                             equipment.airplane_code, equipment.cabin_members)
+
+
+async def load_equipment_by_code(connection, airplane_code: str) -> Equipment:
+    equipment = Equipment._equipments.get(airplane_code)
+    if not equipment:
+        equipment_data = await connection.fetchrow('SELECT code, cabin_members FROM equipments WHERE code=$1',
+                                                   airplane_code)
+        if equipment_data:
+            equipment = Equipment(airplane_code=equipment_data[0], cabin_members=equipment_data[1])
+    return equipment
+
+
+async def save_airport(connection, airport: Airport):
+    continent, tz_city = airport.timezone.split('/', 1)
+    await connection.execute('INSERT INTO airports (iata_code, continent, tz_city, viaticum_zone) '
+                             'VALUES ($1, $2, $3, $4) '
+                             'ON CONFLICT DO NOTHING',
+                             airport.iata_code, continent, tz_city, airport.viaticum)
+
+
+async def load_airport_by_iata_code(connection, iata_code: str) -> Airport:
+    airport = Airport._airports.get(iata_code)
+    if not airport:
+        airport_data = await connection.fetchrow('SELECT iata_code, continent, tz_city, viaticum_zone '
+                                                 '    FROM airports WHERE iata_code=$1', iata_code)
+        if airport_data:
+            airport = Airport(iata_code=airport_data[0], timezone=airport_data[1] + '/' + airport_data[2],
+                              viaticum=airport_data[3])
+    return airport
+
+
+async def load_route_id(connection, route: Route) -> int:
+    return await connection.fetchval('SELECT route_id FROM public.routes '
+                                     '    WHERE name=$1 AND origin=$2 AND destination=$3',
+                                     route.name, route.origin.iata_code, route.destination.iata_code)
+
+
+def given_id(new_ids: dict, saved, attribute: str) -> int:
+    """saved's id, whether committed or kept in new_ids, None if it has none yet"""
+    if new_ids and saved in new_ids:
+        return new_ids[saved][1]
+    return getattr(saved, attribute)
+
+
+def give_id(new_ids: dict, saved, attribute: str, new_id: int):
+    """Set saved's id right away, or keep it in new_ids until committed"""
+    if new_ids is None:
+        setattr(saved, attribute, new_id)
+    else:
+        new_ids[saved] = (attribute, new_id)
+
+
+def commit_ids(new_ids: dict):
+    """Copy the ids kept in new_ids onto their routes and flights, their transaction being committed"""
+    for saved, (attribute, new_id) in new_ids.items():
+        setattr(saved, attribute, new_id)
+
+
+async def save_route(connection, route: Route, new_ids: dict = None) -> int:
+    route_id = given_id(new_ids, route, 'route_id')
+    if not route_id:
+        route_id = await connection.fetchval('INSERT INTO public.routes (name, origin, destination) '
+                                             'VALUES ($1, $2, $3) '
+                                             'ON CONFLICT DO NOTHING '
+                                             'RETURNING route_id',
+                                             route.name, route.origin.iata_code, route.destination.iata_code)
+        route_id = route_id or await load_route_id(connection, route)
+        give_id(new_ids, route, 'route_id', route_id)
+    return route_id
+
+
+async def load_route_by_id(connection, route_id: int) -> Route:
+    route_data = await connection.fetchrow('SELECT name, origin, destination FROM public.routes '
+                                           '    WHERE route_id=$1', route_id)
+    if route_data:
+        return Route(name=route_data[0], origin=Airport(route_data[1]), destination=Airport(route_data[2]),
+                     route_id=route_id)
+
+
+async def load_route_by_fields(connection, name: str, origin: Airport, destination: Airport) -> Route:
+    route = Route(name=name, origin=origin, destination=destination)
+    route_id = await load_route_id(connection, route)
+    if route_id:
+        route.route_id = route_id
+        return route
+
+
+async def save_flight(connection, flight: Flight, new_ids: dict = None) -> int:
+    route_id = await save_route(connection, flight.route, new_ids)
+    flight_id = given_id(new_ids, flight, 'event_id')
+    if not flight_id:
+        equipment = flight.equipment.airplane_code if flight.equipment else None
+        flight_id = await connection.fetchval('INSERT INTO public.flights('
+                                              '            airline_iata_code, route_id, scheduled_begin, '
+                                              '            scheduled_block, equipment) '
+                                              'VALUES ($1, $2, $3, $4, $5) '
+                                              'ON CONFLICT DO NOTHING '
+                                              'RETURNING flight_id',
+                                              flight.carrier, route_id, flight.begin,
+                                              flight.duration.as_timedelta(), equipment)
+        if not flight_id:
+            flight_id = await connection.fetchval('SELECT flight_id FROM public.flights '
+                                                  '    WHERE airline_iata_code=$1 AND route_id=$2 '
+                                                  '      AND scheduled_begin=$3',
+                                                  flight.carrier, route_id, flight.begin)
+        give_id(new_ids, flight, 'event_id', flight_id)
+    return flight_id
+
+
+async def load_flight_by_id(connection, flight_id: int) -> Flight:
+    flight_data = await connection.fetchrow(flights_sql + 'WHERE flights.flight_id=$1', flight_id)
+    if flight_data:
+        return Flight.from_row(tuple(flight_data))
+
+
+async def load_flight_by_fields(connection, airline_iata_code: str, scheduled_begin, route: Route) -> Flight:
+    flight_data = await connection.fetchrow(flights_sql +
+                                            'WHERE airline_iata_code=$1 AND flights.route_id=$2 '
+                                            '  AND scheduled_date=$3 '
+                                            '  AND scheduled_begin >= $3 AND scheduled_begin < $3 + 1',
+                                            airline_iata_code, route.route_id, scheduled_begin.date())
+    if flight_data:
+        return Flight.from_row(tuple(flight_data))
+
+
+async def save_duty_day(connection, duty_day, container_trip: Trip, new_ids: dict = None):
+    last = len(duty_day.events) - 1
+    rows = []
+    for index, flight in enumerate(duty_day.events):
+        flight_id = await save_flight(connection, flight, new_ids)
+        rows.append((flight_id, int(container_trip.number), container_trip.dated,
+                     duty_day.report.time() if index == 0 else None,
+                     duty_day.release.time() if index == last else None,
+                     flight.dh))
+    await connection.executemany('INSERT INTO public.duty_days('
+                                 '            flight_id, flight_begin, trip_id, trip_date, report, rel, dh) '
+                                 'VALUES ($1, (SELECT scheduled_begin FROM public.flights WHERE flight_id = $1), '
+                                 '        $2, $3, $4, $5, $6) '
+                                 'ON CONFLICT (flight_id, trip_id, trip_date) DO NOTHING',
+                                 rows)
+
+
+async def save_trip(connection, trip: Trip, new_ids: dict = None):
+    await connection.execute('INSERT INTO public.trips (number, dated, gposition) '
+                             'VALUES ($1, $2, $3) '
+                             'ON CONFLICT DO NOTHING',
+                             int(trip.number), trip.dated, trip.position)
+    for duty_day in trip.duty_days:
+        await save_duty_day(connection, duty_day, trip, new_ids)
+
+
+async def load_trip_by_id(connection, trip_number: str, dated) -> Trip:
+    trip_data = await connection.fetch(trip_rows_sql +
+                                       'WHERE trip_id = $1 AND trip_date = $2 '
+                                       'ORDER BY scheduled_begin ASC',
+                                       int(trip_number), dated)
+    if trip_data:
+        return Trip.from_rows(trip_number, [tuple(row) for row in trip_data])
+
+
+async def save_trips(trips, in_flight: int = 16) -> list:
+    """Save every trip, each one within its own transaction, with up to in_flight saves running at once.
+    trips may be a lazy iterable, it is consumed from another thread as saves complete so that
+    building trips never blocks the saves already running.
+    Returns (trip, exception) for every trip that could not be saved"""
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(in_flight)
+    failed = []
+    running = set()
+    finished = object()
+
+    async def save(trip):
+        # Routes are shared by the saves in flight, which only see the ids of those already committed
+        new_ids = dict()
+        try:
+            async with ConnectionFromPool() as connection:
+                await save_trip(connection, trip, new_ids)
+        except Exception as e:
+            failed.append((trip, e))
+        else:
+            commit_ids(new_ids)
+        finally:
+            slots.release()
+
+    iterator = iter(trips)
+    while True:
+        await slots.acquire()
+        trip = await loop.run_in_executor(None, next, iterator, finished)
+        if trip is finished:
+            slots.release()
+            break
+        task = loop.create_task(save(trip))
+        running.add(task)
+        task.add_done_callback(running.discard)
+    if running:
+        await asyncio.wait(running)
+    return failed
@@ -5,7 +5,7 @@ Created on 23/06/2016
 """
 from datetime import timedelta
 
-from model.timeClasses import Duration
+from model.timeClasses import Duration, to_epoch_minutes
 from model.scheduleClasses import Flight
 
 # TODO : Move all this constants into a configuration file, associated to method set_rules
@@ -52,6 +52,13 @@ RECESO_CONTINENTAL = Duration(12 * 60)
 RECESO_TRANS = Duration(48 * 60)
 MAX_TURN_TIME = Duration(3 * 60)
 
+# Minutes of the day, night time is flown from 22:00 until 05:00 and early morning lies within (00:59, 04:59)
+NIGHTTIME_BEGIN = 22 * 60
+NIGHTTIME_END = 5 * 60
+EARLY_MORNING_BEGIN = 59
+EARLY_MORNING_END = 4 * 60 + 59
+MINUTES_PER_DAY = 24 * 60
+
 # Templates
 string_part_template = "{day: >2} {routing!s:20s} {event_names!s:25s} {duty_type:18s} {report:%H:%M} " \
                        "{release:%H:%M}    "
@@ -302,28 +309,28 @@ class Creditator(object):
 
         return line_credits_list
 
+    @staticmethod
+    def night_time_until(minutes: int) -> int:
+        """Night time elapsed from epoch until minutes from epoch"""
+        days, minute = divmod(minutes, MINUTES_PER_DAY)
+        return (days * (MINUTES_PER_DAY - NIGHTTIME_BEGIN + NIGHTTIME_END) +
+                min(minute, NIGHTTIME_END) + max(0, minute - NIGHTTIME_BEGIN))
+
+    @staticmethod
+    def early_morning_until(minutes: int) -> int:
+        """Early morning time elapsed from epoch until minutes from epoch"""
+        days, minute = divmod(minutes, MINUTES_PER_DAY)
+        return (days * (EARLY_MORNING_END - EARLY_MORNING_BEGIN) +
+                min(max(0, minute - EARLY_MORNING_BEGIN), EARLY_MORNING_END - EARLY_MORNING_BEGIN))
+
     @staticmethod
     def calculate_night_time(event):
         """
-        Returns the nighttime flown in a given event, value is returned in seconds
+        Returns the nighttime flown in a given event, over every night it spans
         """
-
-        BEGIN = event.begin.hour * 60 + event.begin.minute
-        END = event.end.hour * 60 + event.end.minute
-        NIGHTTIME_BEGIN = 22 * 60
-        NIGHTTIME_END = 5 * 60
-        MIDNIGHT = 24 * 60
-        morninginter = [0, NIGHTTIME_END]
-        nightinter = [NIGHTTIME_BEGIN, MIDNIGHT]
-
-        if BEGIN > END:  # Event starts and ends in different days
-            total = Creditator.overlapping(nightinter, [BEGIN, MIDNIGHT]) + Creditator.overlapping(morninginter,
-                                                                                                   [0, END])
-        else:  # Event starts and ends in same day
-            total = Creditator.overlapping(morninginter, [BEGIN, END]) + Creditator.overlapping(nightinter,
-                                                                                                [BEGIN, END])
-
-        return Duration(total)
+        begin = to_epoch_minutes(event.begin)
+        end = to_epoch_minutes(event.end)
+        return Duration(max(0, Creditator.night_time_until(end) - Creditator.night_time_until(begin)))
 
     @staticmethod
     # TODO : Probably this should be integrated into all ScheduleClasses as ScheduledClass.overlapping(00:30, 05:00)
@@ -336,15 +343,12 @@ class Creditator(object):
     @staticmethod
     def has_early_morning_time(event):
         """
-        Returns true if event.overlaps(00:59, 04:59)
+        Returns true if event.overlaps(00:59, 04:59) on any of the days it spans
         """
-
-        BEGIN = event.begin.hour * 60 + event.begin.minute
-        END = event.end.hour * 60 + event.end.minute
-        EARLY_MORNING_BEGIN = 59
-        EARLY_MORNING_END = 4 * 60 + 59
-
-        return (EARLY_MORNING_BEGIN < BEGIN < EARLY_MORNING_END) or (EARLY_MORNING_BEGIN < END < EARLY_MORNING_END)
+        begin = to_epoch_minutes(event.begin)
+        end = to_epoch_minutes(event.end)
+        return (EARLY_MORNING_BEGIN < begin % MINUTES_PER_DAY < EARLY_MORNING_END or
+                Creditator.early_morning_until(end) > Creditator.early_morning_until(begin))
 
     @staticmethod
     def duty_day_classifier(duty_day):
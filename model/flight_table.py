@@ -0,0 +1,205 @@
+"""
+Flights of many trips held column by column, so that credits are computed for every
+duty day at once instead of walking the objects one event at a time.
+
+Times are minutes from epoch. Flights are laid out trip after trip, duty day after
+duty day, duty_day_starts and trip_starts giving where each one begins, and ends:
+
+    flights of duty day d   begin[duty_day_starts[d]:duty_day_starts[d + 1]]
+    duty days of trip t     duty_day_starts[trip_starts[t]:trip_starts[t + 1]]
+
+FlightTable.credits gives the same values Creditator.credits_from_duty_day does, in minutes.
+"""
+import numpy as np
+
+from model.creditator import TRANSOCEANIC, MAX_TURN_TIME, MINIMUM_BLOCK, MINIMUM_DUTY, NIGHTTIME_BEGIN, \
+    NIGHTTIME_END, EARLY_MORNING_BEGIN, EARLY_MORNING_END, MINUTES_PER_DAY, \
+    JORNADA_ORDINARIA_VUELO_REGULAR, JORNADA_ORDINARIA_SERVICIO_REGULAR, MAXIMA_IRREBASABLE_SERVICIO_REGULAR, \
+    JORNADA_ORDINARIA_VUELO_TRAN, JORNADA_ORDINARIA_SERVICIO_TRAN, MAXIMA_IRREBASABLE_SERVICIO_TRAN, \
+    JORNADA_ORDINARIA_VUELO_TRANSP, JORNADA_ORDINARIA_SERVICIO_TRANSP, MAXIMA_IRREBASABLE_SERVICIO_TRANSP, \
+    JORNADA_ORDINARIA_VUELO_LARGO_ALCANCE, JORNADA_ORDINARIA_SERVICIO_LARGO_ALCANCE, \
+    MAXIMA_ASIGNABLE_SERVICIO_LARGO_ALCANCE
+from model.timeClasses import to_epoch_minutes, one_minute
+
+# Indexed by the duty_type codes within FlightTable.credits
+DUTY_TYPES = ['regular', 'transoceanic', 'special trans', 'long haul']
+ORDINARY_BLOCK = np.array([JORNADA_ORDINARIA_VUELO_REGULAR.minutes, JORNADA_ORDINARIA_VUELO_TRAN.minutes,
+                           JORNADA_ORDINARIA_VUELO_TRANSP.minutes, JORNADA_ORDINARIA_VUELO_LARGO_ALCANCE.minutes])
+ORDINARY_DUTY = np.array([JORNADA_ORDINARIA_SERVICIO_REGULAR.minutes, JORNADA_ORDINARIA_SERVICIO_TRAN.minutes,
+                          JORNADA_ORDINARIA_SERVICIO_TRANSP.minutes,
+                          JORNADA_ORDINARIA_SERVICIO_LARGO_ALCANCE.minutes])
+MAXIMUM_DUTY = np.array([MAXIMA_IRREBASABLE_SERVICIO_REGULAR.minutes, MAXIMA_IRREBASABLE_SERVICIO_TRAN.minutes,
+                         MAXIMA_IRREBASABLE_SERVICIO_TRANSP.minutes, MAXIMA_ASIGNABLE_SERVICIO_LARGO_ALCANCE.minutes])
+# xduty once the maximum duty is exceeded
+XDUTY_BEYOND_MAXIMUM = 5 * 60
+REPORT_BEFORE = 60
+RELEASE_AFTER = 30
+
+
+def segment_reduce(ufunc, values: np.ndarray, bounds: np.ndarray) -> np.ndarray:
+    """ufunc.reduceat over each [bounds[i], bounds[i + 1]) of values. reduceat gives the element
+    at the start of an empty segment, or fails past the end, those give ufunc's identity instead"""
+    starts = bounds[:-1]
+    filled = bounds[1:] > starts
+    reduced = np.full(len(starts), ufunc.identity, dtype=values.dtype)
+    if filled.any():
+        # Empty segments have no length, each filled one ends where the next filled one begins
+        reduced[filled] = ufunc.reduceat(values, starts[filled])
+    return reduced
+
+
+def night_time_until(minutes: np.ndarray) -> np.ndarray:
+    """Creditator.night_time_until for every minutes from epoch"""
+    days, minute = np.divmod(minutes, MINUTES_PER_DAY)
+    return (days * (MINUTES_PER_DAY - NIGHTTIME_BEGIN + NIGHTTIME_END) +
+            np.minimum(minute, NIGHTTIME_END) + np.maximum(0, minute - NIGHTTIME_BEGIN))
+
+
+def early_morning_until(minutes: np.ndarray) -> np.ndarray:
+    """Creditator.early_morning_until for every minutes from epoch"""
+    days, minute = np.divmod(minutes, MINUTES_PER_DAY)
+    return (days * (EARLY_MORNING_END - EARLY_MORNING_BEGIN) +
+            np.clip(minute - EARLY_MORNING_BEGIN, 0, EARLY_MORNING_END - EARLY_MORNING_BEGIN))
+
+
+def night_minutes(begin: np.ndarray, end: np.ndarray) -> np.ndarray:
+    """Creditator.calculate_night_time for every (begin, end) in minutes from epoch,
+    however many midnights each one crosses"""
+    return np.maximum(0, night_time_until(end) - night_time_until(begin))
+
+
+def early_morning(begin: np.ndarray, end: np.ndarray) -> np.ndarray:
+    """Creditator.has_early_morning_time for every (begin, end) in minutes from epoch"""
+    begin_minute = begin % MINUTES_PER_DAY
+    return (((EARLY_MORNING_BEGIN < begin_minute) & (begin_minute < EARLY_MORNING_END)) |
+            (early_morning_until(end) > early_morning_until(begin)))
+
+
+class FlightTable(object):
+    """
+    Columns, one row for each flight:
+        begin, end          actual itinerary if known, else scheduled
+        scheduled_begin     report is taken from it, as DutyDay.report does
+        route_id, dh
+        transoceanic_origin, transoceanic_destination
+    """
+
+    def __init__(self, begin, end, scheduled_begin, route_id, dh, transoceanic_origin, transoceanic_destination,
+                 duty_day_starts, trip_starts, trip_keys: list = None):
+        self.begin = np.asarray(begin, dtype=np.int64)
+        self.end = np.asarray(end, dtype=np.int64)
+        self.scheduled_begin = np.asarray(scheduled_begin, dtype=np.int64)
+        self.route_id = np.asarray(route_id, dtype=np.int64)
+        self.dh = np.asarray(dh, dtype=bool)
+        self.transoceanic_origin = np.asarray(transoceanic_origin, dtype=bool)
+        self.transoceanic_destination = np.asarray(transoceanic_destination, dtype=bool)
+        self.duty_day_starts = np.asarray(duty_day_starts, dtype=np.int64)
+        self.trip_starts = np.asarray(trip_starts, dtype=np.int64)
+        # (number, dated) of each trip
+        self.trip_keys = trip_keys or []
+
+    @classmethod
+    def from_trips(cls, trips):
+        """Every flight of trips, as built by AdminApp or Trip.load_between"""
+        columns = [], [], [], [], [], [], []
+        duty_day_starts, trip_starts, trip_keys = [], [], []
+        for trip in trips:
+            trip_starts.append(len(duty_day_starts))
+            trip_keys.append((trip.number, trip.dated))
+            # A duty day without flights has nothing to be credited, as well as no report nor release
+            for duty_day in (duty_day for duty_day in trip.duty_days if duty_day.events):
+                duty_day_starts.append(len(columns[0]))
+                for flight in duty_day.events:
+                    itinerary = flight.actual_itinerary or flight.scheduled_itinerary
+                    for column, value in zip(columns, (itinerary._begin, itinerary._end,
+                                                       flight.scheduled_itinerary._begin, flight.route.route_id or 0,
+                                                       flight.dh, flight.route.origin.iata_code in TRANSOCEANIC,
+                                                       flight.route.destination.iata_code in TRANSOCEANIC)):
+                        column.append(value)
+        duty_day_starts.append(len(columns[0]))
+        trip_starts.append(len(duty_day_starts) - 1)
+        return cls(*columns, duty_day_starts, trip_starts, trip_keys)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Every flight of the trip rows given by the repository, as by load_trip_rows_between"""
+        columns = [], [], [], [], [], []
+        duty_day_starts, trip_starts, trip_keys = [], [], []
+        for row in rows:
+            (flight_id, report, rel, trip_date, dh, carrier, scheduled_begin, scheduled_block,
+             route_id, name, origin, destination, airplane_code, cabin_members, trip_id, position) = row
+            if not trip_keys or trip_keys[-1] != ('{:04d}'.format(trip_id), trip_date):
+                trip_starts.append(len(duty_day_starts))
+                trip_keys.append(('{:04d}'.format(trip_id), trip_date))
+            if report:
+                duty_day_starts.append(len(columns[0]))
+            begin = to_epoch_minutes(scheduled_begin)
+            for column, value in zip(columns, (begin, begin + scheduled_block // one_minute, route_id, dh,
+                                               origin in TRANSOCEANIC, destination in TRANSOCEANIC)):
+                column.append(value)
+        duty_day_starts.append(len(columns[0]))
+        trip_starts.append(len(duty_day_starts) - 1)
+        begin, end, route_id, dh, transoceanic_origin, transoceanic_destination = columns
+        return cls(begin, end, begin, route_id, dh, transoceanic_origin, transoceanic_destination,
+                   duty_day_starts, trip_starts, trip_keys)
+
+    def __len__(self):
+        return len(self.begin)
+
+    def credits(self) -> dict:
+        """Credits of every duty day, as arrays of minutes, along with the duty_type
+        of each one as an index into DUTY_TYPES"""
+        starts = self.duty_day_starts[:-1]
+        firsts = starts
+        lasts = self.duty_day_starts[1:] - 1
+        legs = self.duty_day_starts[1:] - starts
+
+        # 1. Each flight is either block or dh, DH flights don't account for night time
+        duration = np.maximum(0, self.end - self.begin)
+        block = segment_reduce(np.add, np.where(self.dh, 0, duration), self.duty_day_starts)
+        dh = segment_reduce(np.add, np.where(self.dh, duration, 0), self.duty_day_starts)
+        night = segment_reduce(np.add, np.where(self.dh, 0, night_minutes(self.begin, self.end)),
+                               self.duty_day_starts)
+        total = block + dh
+
+        # 2. Report is taken from the first flight as scheduled, release from the last one
+        report = self.scheduled_begin[firsts] - REPORT_BEFORE
+        release = self.end[lasts] + RELEASE_AFTER
+        daily = np.maximum(0, release - report)
+        delay = np.maximum(0, np.maximum(0, self.begin[firsts] - report) - REPORT_BEFORE)
+
+        # 3. Each turn is charged to the flight before it, the last flight of each duty day has none
+        xturn = np.zeros(len(self), dtype=np.int64)
+        xturn[:-1] = np.maximum(0, np.maximum(0, self.begin[1:] - self.end[:-1]) - MAX_TURN_TIME.minutes)
+        xturn[lasts] = 0
+        xturn = segment_reduce(np.add, xturn, self.duty_day_starts)
+
+        # 4. Classify duty, as Creditator.duty_day_classifier
+        transoceanic = (self.transoceanic_origin[firsts] |
+                        segment_reduce(np.logical_or, self.transoceanic_destination, self.duty_day_starts))
+        special = transoceanic & ((total > MINIMUM_BLOCK.minutes) | (daily > MINIMUM_DUTY.minutes))
+        long_leg = segment_reduce(np.logical_or, duration > 4 * 60 + 30, self.duty_day_starts)
+        long_haul = (~transoceanic & (legs <= 2) & long_leg &
+                     ((block > 10 * 60) | (daily > 12 * 60) |
+                      ((daily > 9 * 60 + 30) & early_morning(self.begin[firsts], self.end[lasts]))))
+        duty_type = np.select([special, transoceanic, long_haul], [2, 1, 3], default=0)
+
+        # 5. If there is a maxirre, normal xduty time ends where maxirre starts
+        xblock = np.maximum(0, block - ORDINARY_BLOCK[duty_type])
+        maxirre = np.maximum(0, daily - MAXIMUM_DUTY[duty_type])
+        xduty = np.where(maxirre > 0, XDUTY_BEYOND_MAXIMUM, np.maximum(0, daily - ORDINARY_DUTY[duty_type]))
+
+        return {'block': block, 'dh': dh, 'total': total, 'night': night, 'daily': daily, 'delay': delay,
+                'xturn': xturn, 'xblock': xblock, 'xduty': xduty, 'maxirre': maxirre, 'duty_type': duty_type}
+
+    def trip_credits(self, credits: dict, month_scope: int = None) -> dict:
+        """Sum of the duty day credits of each trip, only duty days beginning within
+        month_scope are added, as Creditator.credits_from_trip does, or every one if None"""
+        if month_scope is not None:
+            begin = self.begin[self.duty_day_starts[:-1]]
+            months = (begin * 60).astype('datetime64[s]').astype('datetime64[M]').astype(np.int64) % 12 + 1
+            in_scope = months == month_scope
+        else:
+            in_scope = np.ones(len(self.duty_day_starts) - 1, dtype=bool)
+        return {key: segment_reduce(np.add, np.where(in_scope, credits[key], 0), self.trip_starts)
+                for key in ('block', 'dh', 'daily', 'night', 'xblock', 'xduty', 'maxirre', 'delay', 'xturn')}
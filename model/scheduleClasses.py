@@ -1,7 +1,13 @@
 from datetime import datetime, timedelta, date
-from data.database import CursorFromConnectionPool
-from model.timeClasses import Duration, create_datetime, create_date
-import psycopg2
+from copy import copy
+from itertools import groupby
+from operator import itemgetter
+import pickle
+import threading
+from data import repository, tz_table
+from data.database import Session
+from model.timeClasses import Duration, create_datetime, create_date, to_epoch_minutes, from_epoch_minutes
+from model.time_parser import parse_time_of_day, parse_datetime, parse_delta
 
 
 class Equipment(object):
@@ -10,36 +16,40 @@ class Equipment(object):
     def __new__(cls, airplane_code, *args, **kwargs):
         equipment = cls._equipments.get(airplane_code)
         if not equipment:
-            equipment = super().__new__(cls)
-            cls._equipments[airplane_code] = equipment
+            # setdefault is atomic, racing threads all get whichever one was stored first
+            equipment = cls._equipments.setdefault(airplane_code, super().__new__(cls))
         return equipment
 
     def __init__(self, airplane_code, cabin_members: int = None):
+        """Taken from the registry, an equipment keeps its cabin_members unless given others"""
         self.airplane_code = airplane_code
-        self.cabin_members = cabin_members
+        if cabin_members is not None or not hasattr(self, 'cabin_members'):
+            self.cabin_members = cabin_members
 
-    def save_to_db(self):
-        with CursorFromConnectionPool() as cursor:
-            try:
-                cursor.execute('INSERT INTO equipments (code, cabin_members) '
-                               'VALUES (%s, %s)',
-                               (self.airplane_code, self.cabin_members))
-            except psycopg2.IntegrityError:
-                print("Already stored")
+    def __getnewargs__(self):
+        """Unpickled equipments are taken from the flyweight registry"""
+        return self.airplane_code,
+
+    def save_to_db(self, session: Session = None):
+        if not repository.current().save_equipment(self.airplane_code, self.cabin_members, session):
+            print("Already stored")
 
     @classmethod
-    def load_from_db_by_code(cls, airplane_code):
+    def load_from_db_by_code(cls, airplane_code, session: Session = None):
         equipment = cls._equipments.get(airplane_code)
         if not equipment:
-            with CursorFromConnectionPool() as cursor:
-                cursor.execute('SELECT * FROM equipments WHERE code=%s', (airplane_code,))
-                equipment_data = cursor.fetchone()
-                if equipment_data:
-                    equipment = cls(airplane_code=equipment_data[0], cabin_members=equipment_data[1])
-                    cls._equipments[airplane_code] = equipment
+            equipment_data = repository.current().load_equipment(airplane_code, session)
+            if equipment_data:
+                equipment = cls(airplane_code=equipment_data[0], cabin_members=equipment_data[1])
 
         return equipment
 
+    @classmethod
+    def load_all_from_db(cls, session: Session = None):
+        """Fill the registry with every stored equipment"""
+        for airplane_code, cabin_members in repository.current().load_equipments(session):
+            cls(airplane_code=airplane_code, cabin_members=cabin_members)
+
     def __str__(self):
         if not self.airplane_code:
             eq_string = 3 * ' '
@@ -61,61 +71,80 @@ class Airport(object):
     def __new__(cls, iata_code: str, *args, **kwargs):
         airport = cls._airports.get(iata_code)
         if not airport:
-            airport = super().__new__(cls)
-            cls._airports[iata_code] = airport
+            # setdefault is atomic, racing threads all get whichever one was stored first
+            airport = cls._airports.setdefault(iata_code, super().__new__(cls))
 
         return airport
 
     def __init__(self, iata_code: str, timezone: str = None, viaticum: str = None):
         """
         Represents an airport as a 3 letter code
+        Taken from the registry, an airport keeps its timezone and viaticum unless given others
         """
         self.iata_code = iata_code
-        self.timezone = timezone
-        self.viaticum = viaticum
+        if timezone is not None or not hasattr(self, 'timezone'):
+            self.timezone = timezone
+        if viaticum is not None or not hasattr(self, 'viaticum'):
+            self.viaticum = viaticum
 
-    def save_to_db(self):
-        with CursorFromConnectionPool() as cursor:
-            continent, tz_city = self.timezone.split('/')
-            try:
-                cursor.execute('INSERT INTO airports (iata_code, continent, tz_city, viaticum_zone) '
-                               'VALUES (%s, %s, %s, %s)',
-                               (self.iata_code, continent, tz_city, self.viaticum))
-            except psycopg2.IntegrityError:
-                print("Already stored")
-
-    def update_to_db(self):
-        split_timezone = self.timezone.split()
-        if len(split_timezone) == 2:
-            # Este es un caso normal
-            continent, tz_city = split_timezone
-        else:
-            # Este es el caso de America/Argentina/Buenos_Aires
-            continent = split_timezone[0]
-            tz_city = split_timezone[1] + '/' + split_timezone[2]
-        with CursorFromConnectionPool() as cursor:
-            cursor.execute('UPDATE airports '
-                           '    set continent = %s, tz_city = %s, viaticum_zone = %s '
-                           'WHERE iata_code = %s', (continent, tz_city,
-                                                    self.viaticum, self.iata_code))
+    def __getnewargs__(self):
+        """Unpickled airports are taken from the flyweight registry"""
+        return self.iata_code,
+
+    def save_to_db(self, session: Session = None):
+        if not repository.current().save_airport(self.iata_code, self.timezone, self.viaticum, session):
+            print("Already stored")
+
+    def update_to_db(self, session: Session = None):
+        repository.current().update_airport(self.iata_code, self.timezone, self.viaticum, session)
 
     @classmethod
-    def load_from_db_by_iata_code(cls, iata_code):
+    def load_from_db_by_iata_code(cls, iata_code, session: Session = None):
         airport = cls._airports.get(iata_code)
         if not airport:
-            with CursorFromConnectionPool() as cursor:
-                cursor.execute('SELECT * FROM airports WHERE iata_code=%s;', (iata_code,))
-                airport_data = cursor.fetchone()
-                if airport_data:
-                    timezone = airport_data[1] + '/' + airport_data[2]
-                    airport = cls(iata_code=airport_data[0], timezone=timezone, viaticum=airport_data[3])
-                    cls._airports[iata_code] = airport
+            airport_data = repository.current().load_airport(iata_code, session)
+            if airport_data:
+                airport = cls(iata_code=airport_data[0], timezone=airport_data[1], viaticum=airport_data[2])
         return airport
 
+    @classmethod
+    def load_all_from_db(cls, session: Session = None):
+        """Fill the registry with every stored airport"""
+        for iata_code, timezone, viaticum in repository.current().load_airports(session):
+            cls(iata_code=iata_code, timezone=timezone, viaticum=viaticum)
+
+    @classmethod
+    def import_time_zones(cls, file_name: str = tz_table.tzmap_file, viaticum: str = 'low_cost',
+                          session: Session = None) -> tuple:
+        """Store every airport in file_name, an iata_tzmap.txt, along with its time zone.
+        New ones get viaticum. Gives back how many were (added, changed, unchanged)"""
+        return repository.current().import_airports(tz_table.read_tzmap(file_name), viaticum, session)
+
     def __str__(self):
         return "{}".format(self.iata_code)
 
 
+def load_registries_from_db(session: Session = None):
+    """Fill the Equipment, Airport and Route registries with one query each"""
+    Equipment.load_all_from_db(session)
+    Airport.load_all_from_db(session)
+    Route.load_all_from_db(session)
+
+
+def save_registries(file_name: str):
+    """Store a snapshot of the Equipment, Airport and Route registries"""
+    with open(file_name, 'wb') as fp:
+        pickle.dump((list(Equipment._equipments.values()), list(Airport._airports.values()),
+                     list(Route._routes.values())), fp)
+
+
+def load_registries(file_name: str):
+    """Fill the registries from a snapshot taken by save_registries.
+    Unpickled objects register themselves through __getnewargs__"""
+    with open(file_name, 'rb') as fp:
+        pickle.load(fp)
+
+
 class CrewMember(object):
     """Defines a CrewMember"""
 
@@ -130,51 +159,27 @@ class CrewMember(object):
         self.line = None
 
     @classmethod
-    def load_from_db(cls, crew_member_id):
+    def load_from_db(cls, crew_member_id, session: Session = None):
         """This method only searches for crew data if stored in the DB"""
-        with CursorFromConnectionPool() as cursor:
-            cursor.execute('SELECT name, pos, "group", base, seniority '
-                           '    FROM public.crew_members '
-                           '    WHERE crew_member_id=%s',
-                           (crew_member_id,))
-            crew_member_data = cursor.fetchone()
+        crew_member_data = repository.current().load_crew_member(crew_member_id, session)
 
         if crew_member_data:
             return cls(crew_member_id=crew_member_id, name=crew_member_data[0], pos=crew_member_data[1],
                        group=crew_member_data[2], base=crew_member_data[3], seniority=crew_member_data[4])
 
-    def save_to_db(self) -> int:
+    def save_to_db(self, session: Session = None) -> int:
         """
         Used to save Crew Memeber data into the DB, returning crew_member_id if succed!
         """
-        saved_crew_member = self.load_from_db(crew_member_id=self.crew_member_id)
-        crew_member_id = None
-        if saved_crew_member:
-            print("Crew Memeber is already stored in DB")
-        else:
-            with CursorFromConnectionPool() as cursor:
-                cursor.execute('INSERT INTO public.crew_members (crew_member_id, name, pos, "group", base, seniority) '
-                               'VALUES (%s, %s, %s, %s, %s, %s) '
-                               'RETURNING crew_member_id;',
-                               (self.crew_member_id, self.name, self.pos, self.group, self.base.iata_code,
-                                self.seniority))
-                crew_member_id = cursor.fetchall()[0]
-
-        return crew_member_id
-
-    def update_to_db(self):
-        saved_crew_member = CrewMember.load_from_db(crew_member_id=self.crew_member_id)
-        if not saved_crew_member:
-            print("Crew Member is not stored in the DB, storing crew member...")
-            self.save_to_db()
-        else:
-            with CursorFromConnectionPool() as cursor:
-                cursor.execute('UPDATE public.crew_members '
-                               'SET name = %s, pos = %s, "group" = %s, '
-                               'base = %s, seniority = %s '
-                               'WHERE crew_member_id = %s '
-                               'RETURNING crew_member_id;',
-                               (self.name, self.pos, self.group, self.base.iata_code, self.seniority, self.crew_member_id))
+        if repository.current().save_crew_member(self.crew_member_id, self.name, self.pos, self.group,
+                                                 self.base.iata_code, self.seniority, session):
+            return self.crew_member_id
+        print("Crew Memeber is already stored in DB")
+
+    def update_to_db(self, session: Session = None):
+        """Store the crew member, replacing whatever was stored for its crew_member_id"""
+        repository.current().update_crew_member(self.crew_member_id, self.name, self.pos, self.group,
+                                                self.base.iata_code, self.seniority, session)
 
     def __eq__(self, other):
         """Two Crew_Members are consider to be equal if, and only if all of
@@ -192,23 +197,38 @@ class Route(object):
     """For a given airline, represents a flight number or ground duty name
         with its origin and destination airports
         Note: flights and ground duties are called Events"""
+    __slots__ = ('route_id', 'name', 'origin', 'destination')
     _routes = dict()
 
     def __new__(cls, name: str, origin: Airport, destination: Airport, *args, **kwargs):
         route_key = name + origin.iata_code + destination.iata_code
         route = cls._routes.get(route_key)
         if not route:
-            route = super().__new__(cls)
-            cls._routes[route_key] = route
+            # setdefault is atomic, racing threads all get whichever one was stored first
+            route = cls._routes.setdefault(route_key, super().__new__(cls))
         return route
 
     def __init__(self, name: str, origin: Airport, destination: Airport, route_id: int = None):
-        """Flight numbers have 4 digits only"""
-        self.route_id = route_id
+        """Flight numbers have 4 digits only
+        Taken from the registry, a route keeps its route_id unless given another"""
+        if route_id is not None or not hasattr(self, 'route_id'):
+            self.route_id = route_id
         self.name = name
         self.origin = origin
         self.destination = destination
 
+    def __getnewargs__(self):
+        """Unpickled routes are taken from the flyweight registry"""
+        return self.name, self.origin, self.destination
+
+    def __setstate__(self, state):
+        """A route_id already known here is kept, worker processes hand their new routes back unsaved"""
+        _, slots = state
+        if slots.get('route_id') is None and getattr(self, 'route_id', None) is not None:
+            slots = dict(slots, route_id=self.route_id)
+        for name, value in slots.items():
+            setattr(self, name, value)
+
     @classmethod
     def create_route(cls):
         """
@@ -240,68 +260,71 @@ class Route(object):
         else:
             return None
 
-    def save_to_db(self) -> int:
+    def save_to_db(self, session: Session = None) -> int:
         if not self.route_id:
-            route_id = self.load_route_id()
-            if not route_id:
-                with CursorFromConnectionPool() as cursor:
-                    cursor.execute('INSERT INTO public.routes (name, origin, destination) '
-                                   'VALUES (%s, %s, %s)'
-                                   'RETURNING route_id;',
-                                   (self.name, self.origin.iata_code, self.destination.iata_code))
-                    route_id = cursor.fetchone()[0]
-            self.route_id = route_id
+            self.route_id = repository.current().save_route(self.name, self.origin.iata_code,
+                                                            self.destination.iata_code, session)
         return self.route_id
 
-    def load_route_id(self):
-        with CursorFromConnectionPool() as cursor:
-            cursor.execute('SELECT route_id FROM public.routes '
-                           '    WHERE name=%s'
-                           '      AND origin=%s'
-                           '      AND destination=%s',
-                           (self.name, self.origin.iata_code, self.destination.iata_code))
-            route_id = cursor.fetchone()
-            if route_id:
-                return route_id[0]
+    def load_route_id(self, session: Session = None):
+        return repository.current().load_route_id(self.name, self.origin.iata_code, self.destination.iata_code,
+                                                  session)
 
     @classmethod
-    def load_from_db_by_id(cls, route_id):
-        with CursorFromConnectionPool() as cursor:
-            cursor.execute('SELECT name, origin, destination '
-                           '    FROM public.routes '
-                           '    WHERE route_id=%s',
-                           (route_id,))
-            route_data = cursor.fetchone()
-            origin = Airport(route_data[1])
-            destination = Airport(route_data[2])
-
-            return cls(name=route_data[0], origin=origin,
-                       destination=destination, route_id=route_id)
+    def load_from_db_by_id(cls, route_id, session: Session = None):
+        route_data = repository.current().load_route(route_id, session)
+        origin = Airport(route_data[1])
+        destination = Airport(route_data[2])
+
+        return cls(name=route_data[0], origin=origin,
+                   destination=destination, route_id=route_id)
+
+    @classmethod
+    def load_from_db_by_fields(cls, name: str, origin: Airport, destination: Airport, session: Session = None):
+        route_id = repository.current().load_route_id(name, origin.iata_code, destination.iata_code, session)
+        if route_id:
+            route = cls(route_id=route_id, name=name, origin=origin, destination=destination)
+            return route
 
     @classmethod
-    def load_from_db_by_fields(cls, name: str, origin: Airport, destination: Airport):
-        with CursorFromConnectionPool() as cursor:
-            cursor.execute('SELECT route_id FROM public.routes '
-                           '    WHERE name=%s'
-                           '      AND origin=%s'
-                           '      AND destination=%s',
-                           (name, origin.iata_code, destination.iata_code))
-            route_id = cursor.fetchone()
-            if route_id:
-                route = cls(route_id=route_id[0], name=name, origin=origin, destination=destination)
-                return route
+    def load_all_from_db(cls, session: Session = None):
+        """Fill the registry with every stored route, airports are taken from their own registry"""
+        for route_id, name, origin, destination in repository.current().load_routes(session):
+            cls(name=name, origin=Airport.load_from_db_by_iata_code(origin, session) or Airport(origin),
+                destination=Airport.load_from_db_by_iata_code(destination, session) or Airport(destination),
+                route_id=route_id)
 
     def __str__(self):
         return "{} {} {}".format(self.name, self.origin, self.destination)
 
 
 class Itinerary(object):
-    """ An Itinerary represents a Duration occurring between a 'begin' and an 'end' datetime. """
+    """ An Itinerary represents a Duration occurring between a 'begin' and an 'end' datetime.
+    Both are kept as minutes from epoch, a month of them takes a fraction of the memory datetimes would.
+    Those in UTC give local times at any airport, through the offsets in data.tz_table"""
+    __slots__ = ('_begin', '_end', 'utc')
+
+    def __init__(self, begin: datetime, end: datetime, utc: bool = False):
+        """Enter beginning and ending datetime, naive ones, either local or UTC"""
+        self._begin = to_epoch_minutes(begin)
+        self._end = to_epoch_minutes(end)
+        self.utc = utc
+
+    @property
+    def begin(self) -> datetime:
+        return from_epoch_minutes(self._begin)
+
+    @begin.setter
+    def begin(self, new_begin: datetime):
+        self._begin = to_epoch_minutes(new_begin)
 
-    def __init__(self, begin: datetime, end: datetime):
-        """Enter beginning and ending datetime"""
-        self.begin = begin
-        self.end = end
+    @property
+    def end(self) -> datetime:
+        return from_epoch_minutes(self._end)
+
+    @end.setter
+    def end(self, new_end: datetime):
+        self._end = to_epoch_minutes(new_end)
 
     @classmethod
     def from_timedelta(cls, begin: datetime, a_timedelta: timedelta):
@@ -324,11 +347,9 @@ class Itinerary(object):
         begin and end should have a %H%M (2345) format"""
         begin = '0000' if begin == '2400' else begin
         end = '0000' if end == '2400' else end
-        formatting = '%H%M'
-        begin_string = datetime.strptime(begin, formatting).time()
-        begin = datetime.combine(date, begin_string)
-        end_string = datetime.strptime(end, formatting).time()
-        end = datetime.combine(date, end_string)
+        midnight = datetime(date.year, date.month, date.day)
+        begin = midnight + parse_time_of_day(begin)
+        end = midnight + parse_time_of_day(end)
 
         if end < begin:
             end += timedelta(days=1)
@@ -342,13 +363,34 @@ class Itinerary(object):
                DATE     begin   blk
         """
         date, begin, blk = input_string.split()
-        formatting = '%d%m%Y%H%M'
-        begin = datetime.strptime(date + begin, formatting)
-        return cls.from_timedelta(begin=begin, a_timedelta=Duration.from_string(blk).as_timedelta())
+        return cls.from_timedelta(begin=parse_datetime(date + begin), a_timedelta=parse_delta(blk))
+
+    @classmethod
+    def from_local(cls, begin: datetime, origin: Airport, end: datetime, destination: Airport):
+        """An Itinerary in UTC, out of its begin local to origin and its end local to destination"""
+        table = tz_table.current()
+        itinerary = cls(begin, end, utc=True)
+        itinerary._begin, itinerary._end = table.to_utc(table.zones_of([origin, destination]),
+                                                        [itinerary._begin, itinerary._end]).tolist()
+        return itinerary
+
+    def begin_at(self, airport: Airport) -> datetime:
+        """Local begin at airport, the itinerary being in UTC"""
+        return self._local_at(airport, self._begin)
+
+    def end_at(self, airport: Airport) -> datetime:
+        """Local end at airport, the itinerary being in UTC"""
+        return self._local_at(airport, self._end)
+
+    def _local_at(self, airport: Airport, minutes: int) -> datetime:
+        if not self.utc:
+            # Itineraries built from PBS files and rosters are local already, at some unknown airport
+            raise ValueError("Itinerary {} is in local time, not UTC".format(self))
+        return from_epoch_minutes(minutes + tz_table.current().local_offset(airport, minutes))
 
     @property
     def duration(self) -> Duration:
-        return Duration.from_timedelta(self.end - self.begin)
+        return Duration(self._end - self._begin)
 
     def get_elapsed_dates(self):
         """Returns a list of dates in range [self.begin, self.end]"""
@@ -375,7 +417,7 @@ class Itinerary(object):
         return template.format(self)
 
     def __eq__(self, other):
-        return (self.begin == other.begin) and (self.end == other.end)
+        return (self._begin == other._begin) and (self._end == other._end)
 
 
 class Event(object):
@@ -383,6 +425,7 @@ class Event(object):
     Represents  Vacations, GDO's, time-off, etc.
     Markers don't account for duty or block time in a given month
     """
+    __slots__ = ('route', 'scheduled_itinerary', 'event_id', '_credits')
 
     def __init__(self, route: Route, scheduled_itinerary: Itinerary = None, event_id: int = None):
         self.route = route
@@ -435,20 +478,11 @@ class Event(object):
             template = "{0.route.name}"
         return template.format(self)
 
-    def save_to_db(self):
+    def save_to_db(self, session: Session = None):
         if not self.event_id:
-            with CursorFromConnectionPool() as cursor:
-                # cursor.execute('SELECT * FROM public.reserves '
-                #                'WHERE name=%s, dated=%s ')
-                # gd_data = cursor.fetchone()
-                # if not gd_data:
-                try:
-                    cursor.execute('INSERT INTO public.markers('
-                                   '            route_id, begin, duration) '
-                                   'VALUES (%s, %s, %s);',
-                                   (self.route.route_id, self.begin, self.duration.as_timedelta()))
-                except psycopg2.IntegrityError:
-                    print("{} has already been stored".format(str(self)))
+            if not repository.current().save_marker(self.route.route_id, self.begin, self.duration.as_timedelta(),
+                                                    session):
+                print("{} has already been stored".format(str(self)))
 
 
 class GroundDuty(Event):
@@ -456,6 +490,7 @@ class GroundDuty(Event):
     Represents  training, reserve or special assignments.
     Ground duties do account for some credits
     """
+    __slots__ = ('position', 'equipment')
 
     def __init__(self, route: Route, scheduled_itinerary: Itinerary = None, position: str = None,
                  equipment=None, event_id: int = None) -> None:
@@ -505,23 +540,13 @@ class GroundDuty(Event):
         block = self._credits['block']
         return template.format(self, rpt=rpt, rls=rls, turn=turn, block=block)
 
-    def save_to_db(self):
+    def save_to_db(self, session: Session = None):
         if not self.event_id:
             if not self.route.route_id:
-                self.route.load_route_id()
-            with CursorFromConnectionPool() as cursor:
-                # cursor.execute('SELECT * FROM public.reserves '
-                #                'WHERE name=%s, dated=%s ')
-                # gd_data = cursor.fetchone()
-                # if not gd_data:
-                try:
-                    cursor.execute('INSERT INTO public.reserves('
-                                   '            route_id, begin, duration, gposition) '
-                                   'VALUES (%s, %s, %s, %s);',
-                                   (self.route.route_id, self.begin, self.duration.as_timedelta(),
-                                    self.position))
-                except psycopg2.IntegrityError:
-                    print("{} has already been stored".format(str(self)))
+                self.route.load_route_id(session)
+            if not repository.current().save_reserve(self.route.route_id, self.begin, self.duration.as_timedelta(),
+                                                     self.position, session):
+                print("{} has already been stored".format(str(self)))
 
     # def update_to_db(self):
     #     """Will store GroundDuty into database without validating data"""
@@ -551,6 +576,7 @@ class GroundDuty(Event):
 
 
 class Flight(GroundDuty):
+    __slots__ = ('actual_itinerary', 'carrier', 'dh')
 
     def __init__(self, route: Route, scheduled_itinerary: Itinerary = None, actual_itinerary: Itinerary = None,
                  equipment: Equipment = None, carrier: str = 'AM', event_id: int = None, dh=False, position=None):
@@ -707,53 +733,41 @@ class Flight(GroundDuty):
 
     # TODO : Modify to save a flight with all its known values
     # TODO : ALL save_to_db() methods should be first check that event is not stored before creating it
-    def save_to_db(self) -> int:
+    def save_to_db(self, session: Session = None) -> int:
         # Is this a new route?
-        self.route.save_to_db()
+        self.route.save_to_db(session)
         if not self.event_id:
-            with CursorFromConnectionPool() as cursor:
-                cursor.execute('INSERT INTO public.flights('
-                               '            airline_iata_code, route_id, scheduled_begin, '
-                               '            scheduled_block, equipment)'
-                               'VALUES (%s, %s, %s, %s, %s)'
-                               'RETURNING flight_id;',
-                               (self.carrier, self.route.route_id, self.begin,
-                                self.duration.as_timedelta(), self.equipment.airplane_code))
-                self.event_id = cursor.fetchone()[0]
+            self.event_id = repository.current().save_flight(self.carrier, self.route.route_id, self.begin,
+                                                             self.duration.as_timedelta(),
+                                                             self.equipment.airplane_code, session)
         return self.event_id
 
-    def delete(self):
-        """Remove flight from DataBase"""
-        try:
-            with CursorFromConnectionPool() as cursor:
-                cursor.execute('DELETE FROM public.flights '
-                               '    WHERE flight_id = %s',
-                               (self.event_id,))
-        except psycopg2.IntegrityError:
-            # TODO : Better build methods directly into the class
-            print("flight {} ".format(self))
-            print("Can't be deleted because it belongs to another trip ")
+    def delete(self, session: Session = None, prompt: bool = True) -> bool:
+        """Remove flight from DataBase. One belonging to another trip is kept, and updated as
+        entered if prompting. False if it was kept"""
+        if repository.current().delete_flight(self.event_id, session):
+            return True
+        # TODO : Better build methods directly into the class
+        print("flight {} ".format(self))
+        print("Can't be deleted because it belongs to another trip ")
+        if prompt:
             print("Would you rather update it? ")
             begin = input("Enter begin time as HHMM :")
             duration = input("Enter duration as HHMM :")
             self.begin.replace(hour=int(begin[:2]), minute=int(begin[2:]))
             self.end = self.begin + Duration.from_string(duration).as_timedelta()
-            self.update_to_db()
-
-    def update_to_db(self):
-        with CursorFromConnectionPool() as cursor:
-            cursor.execute('UPDATE public.flights '
-                           'SET airline_iata_code = %s, route_id = %s, scheduled_begin = %s, '
-                           'scheduled_block = %s, equipment = %s '
-                           'WHERE flight_id = %s;',
-                           (self.carrier, self.route.route_id, self.begin,
-                            self.duration.as_timedelta(), self.equipment.airplane_code, self.event_id))
-
-    def update_from_database(self):
+            self.update_to_db(session)
+        return False
+
+    def update_to_db(self, session: Session = None):
+        repository.current().update_flight(self.event_id, self.carrier, self.route.route_id, self.begin,
+                                           self.duration.as_timedelta(), self.equipment.airplane_code, session)
+
+    def update_from_database(self, session: Session = None):
         """Load all fields for this event, compare each field to its corresponding parameter
            and update accordingly """
         loaded_flight = self.load_from_db_by_fields(airline_iata_code=self.carrier, scheduled_begin=self.begin,
-                                                    route=self.route)
+                                                    route=self.route, session=session)
         if not loaded_flight:
             # This is typical of a return to TARMAC, where flight will now be AM0025 MEX MEX before AM0025 MEX AMS
             # TODO : Create scheduled itinerary for returned flight automatically instead of prompting for fields
@@ -762,9 +776,9 @@ class Flight(GroundDuty):
             print("Create scheduled itinerary for event \n\n")
             flight_parameters = Flight.create_flight_parameters()
             created_flight = Flight(**flight_parameters)
-            created_flight.save_to_db()
+            created_flight.save_to_db(session)
             loaded_flight = self.load_from_db_by_fields(airline_iata_code=self.carrier, scheduled_begin=self.begin,
-                                                        route=self.route)
+                                                        route=self.route, session=session)
         self.event_id = loaded_flight.event_id
 
         # 1. Scheduled itineraries should be the same
@@ -812,45 +826,32 @@ class Flight(GroundDuty):
                 self.equipment = loaded_flight.equipment
 
     @classmethod
-    def load_from_db_by_id(cls, flight_id):
-        with CursorFromConnectionPool() as cursor:
-            cursor.execute('SELECT * FROM public.flights '
-                           'INNER JOIN public.routes ON flights.route_id = routes.route_id '
-                           'WHERE flights.flight_id=%s', (flight_id,))
-            flight_data = cursor.fetchone()
-            if flight_data:
-                route = Route.load_from_db_by_id(route_id=flight_data[2])
-                itinerary = Itinerary.from_timedelta(begin=flight_data[3],
-                                                     a_timedelta=flight_data[4])
-                equipment = flight_data[5]
-                carrier = flight_data[1]
-                return cls(route=route, scheduled_itinerary=itinerary, equipment=equipment,
-                           carrier=carrier, event_id=flight_id)
+    def from_row(cls, row):
+        """Build a flight out of a flight row, as given by the repository"""
+        (flight_id, carrier, route_id, scheduled_begin, scheduled_block, equipment,
+         actual_begin, actual_block, name, origin, destination) = row
+        route = Route(name=name, origin=Airport(origin), destination=Airport(destination), route_id=route_id)
+        scheduled_itinerary = Itinerary.from_timedelta(begin=scheduled_begin, a_timedelta=scheduled_block)
+        if actual_begin:
+            actual_itinerary = Itinerary.from_timedelta(begin=actual_begin, a_timedelta=actual_block)
+        else:
+            actual_itinerary = None
+        return cls(route=route, scheduled_itinerary=scheduled_itinerary, actual_itinerary=actual_itinerary,
+                   equipment=Equipment(equipment) if equipment else None, carrier=carrier, event_id=flight_id)
 
     @classmethod
-    def load_from_db_by_fields(cls, airline_iata_code: str, scheduled_begin: datetime, route: Route):
-        with CursorFromConnectionPool() as cursor:
-            cursor.execute('SELECT * FROM public.flights '
-                           '    WHERE airline_iata_code = %s '
-                           '      AND route_id=%s'
-                           '      AND scheduled_begin::date=%s',
-                           (airline_iata_code, route.route_id, scheduled_begin.date()))
-            flight_data = cursor.fetchone()
-            if flight_data:
-                flight_id = flight_data[0]
-                carrier_code = flight_data[1]
-                scheduled_begin = flight_data[3]
-                scheduled_block = flight_data[4]
-                equipment = Equipment(flight_data[5])
-                actual_begin = flight_data[6]
-                actual_block = flight_data[7]
-                scheduled_itinerary = Itinerary.from_timedelta(begin=scheduled_begin, a_timedelta=scheduled_block)
-                if actual_begin:
-                    actual_itinerary = Itinerary.from_timedelta(begin=actual_begin, a_timedelta=actual_block)
-                else:
-                    actual_itinerary = None
-                return cls(route=route, scheduled_itinerary=scheduled_itinerary, actual_itinerary=actual_itinerary,
-                           equipment=equipment, carrier=carrier_code, event_id=flight_id)
+    def load_from_db_by_id(cls, flight_id, session: Session = None):
+        flight_data = repository.current().load_flight(flight_id, session)
+        if flight_data:
+            return cls.from_row(flight_data)
+
+    @classmethod
+    def load_from_db_by_fields(cls, airline_iata_code: str, scheduled_begin: datetime, route: Route,
+                               session: Session = None):
+        flight_data = repository.current().find_flight(airline_iata_code, route.route_id, scheduled_begin.date(),
+                                                       session)
+        if flight_data:
+            return cls.from_row(flight_data)
 
     def __str__(self):
         template = """
@@ -860,11 +861,67 @@ class Flight(GroundDuty):
         return template.format(self)
 
 
+class FlightIndex(object):
+    """
+    In-memory index of flights keyed by (carrier, route key, date), answering
+    the same question as Flight.load_from_db_by_fields.
+    Flights are loaded a whole month at a time, with one range query, the first time
+    any date within that month is looked up. Flights built but not stored yet are
+    indexed as well, without an event_id, routes without a route_id among them
+    """
+
+    def __init__(self):
+        self._flights = dict()
+        self._months = set()
+        # Threads building trips for the same month wait for a single load
+        self._loading = threading.Lock()
+
+    def load_month(self, year: int, month: int, session: Session = None):
+        """Load all flights scheduled to begin within the given month"""
+        first_day = datetime(year, month, 1)
+        next_month = datetime(year + month // 12, month % 12 + 1, 1)
+        for row in repository.current().load_flights_between(first_day, next_month, session):
+            flight = Flight.from_row(row)
+            self._flights.setdefault(self.key(flight.carrier, flight.route, flight.begin), flight)
+        self._months.add((year, month))
+
+    @staticmethod
+    def key(airline_iata_code: str, route: Route, scheduled_begin: datetime) -> tuple:
+        return (airline_iata_code, route.name + route.origin.iata_code + route.destination.iata_code,
+                scheduled_begin.date())
+
+    def get(self, airline_iata_code: str, scheduled_begin: datetime, route: Route,
+            session: Session = None) -> Flight:
+        """Return a copy of the stored flight, or None if there is none"""
+        if (scheduled_begin.year, scheduled_begin.month) not in self._months:
+            with self._loading:
+                if (scheduled_begin.year, scheduled_begin.month) not in self._months:
+                    self.load_month(scheduled_begin.year, scheduled_begin.month, session)
+        flight = self._flights.get(self.key(airline_iata_code, route, scheduled_begin))
+        # Each trip marks its own flights as DH, so the indexed one is never handed out
+        return copy(flight) if flight else None
+
+    def add(self, flight: Flight):
+        """Index a flight that has just been built or stored, a stored one replaces the same flight unsaved"""
+        key = self.key(flight.carrier, flight.route, flight.scheduled_itinerary.begin)
+        indexed = self._flights.get(key)
+        if indexed is None or (indexed.event_id is None and flight.event_id is not None):
+            self._flights[key] = copy(flight)
+
+    def discard(self, flight: Flight):
+        """Forget a flight that has just been deleted"""
+        key = self.key(flight.carrier, flight.route, flight.scheduled_itinerary.begin)
+        indexed = self._flights.get(key)
+        if indexed and indexed.event_id == flight.event_id:
+            del self._flights[key]
+
+
 class DutyDay(object):
     """
     A DutyDay is a collection of Events, it is not a representation of a regular calendar day,
     but rather the collection of Events to be served within a given Duty.
     """
+    __slots__ = ('events', '_credits', '_report')
 
     def __init__(self):
         self.events = []
@@ -975,35 +1032,20 @@ class DutyDay(object):
             sundays.append(self.release.date())
         return len(sundays)
 
-    def save_to_db(self, container_trip):
-        with CursorFromConnectionPool() as cursor:
-            report = self.report.time()
-            for flight in self.events:
-                if not flight.event_id:
-                    # First store flight in DB
-                    # TODO : Before saving, check that flight does not already exist
-                    flight.save_to_db()
-                else:
-                    cursor.execute('SELECT duty_day_id FROM public.duty_days '
-                                   'WHERE flight_id=%s AND trip_id=%s AND trip_date=%s',
-                                   (flight.event_id, container_trip.number, container_trip.dated))
-                    flight_to_trip_id = cursor.fetchone()
-                    if not flight_to_trip_id:
-                        cursor.execute('INSERT INTO public.duty_days('
-                                       '            flight_id, trip_id, trip_date, '
-                                       '            report, dh)'
-                                       'VALUES (%s, %s, %s, %s, %s)'
-                                       'RETURNING duty_day_id;',
-                                       (flight.event_id, container_trip.number, container_trip.dated,
-                                        report, flight.dh))
-                        flight_to_trip_id = cursor.fetchone()[0]
-                report = None
-        with CursorFromConnectionPool() as cursor:
-            release = self.release.time()
-            cursor.execute('UPDATE public.duty_days '
-                           'SET rel = %s '
-                           'WHERE duty_day_id = %s;',
-                           (release, flight_to_trip_id))
+    def save_to_db(self, container_trip, session: Session = None):
+        """Report is stored along with the first flight and release along with the last one"""
+        last = len(self.events) - 1
+        rows = []
+        for index, flight in enumerate(self.events):
+            if not flight.event_id:
+                # First store flight in DB
+                # TODO : Before saving, check that flight does not already exist
+                flight.save_to_db(session)
+            rows.append((flight.event_id, container_trip.number, container_trip.dated,
+                         self.report.time() if index == 0 else None,
+                         self.release.time() if index == last else None,
+                         flight.dh))
+        repository.current().save_duty_days(rows, session)
 
     def update_with_actual_itineraries(self, duty_day):
         for flight, actual_flight in zip(self.events, duty_day.events):
@@ -1056,34 +1098,45 @@ class Trip(object):
         return trip
 
     @classmethod
-    def load_by_id(cls, trip_number: str, dated: date):
-        with CursorFromConnectionPool() as cursor:
-            cursor.execute('SELECT duty_days.flight_id, report, rel, trip_date, dh FROM public.duty_days '
-                           'INNER JOIN flights ON duty_days.flight_id = flights.flight_id '
-                           'WHERE trip_id = %s AND trip_date = %s '
-                           'ORDER BY scheduled_begin ASC;',
-                           (int(trip_number), dated))
-            trip_data = cursor.fetchall()
-            if trip_data:
-                trip = cls(number=trip_number, dated=trip_data[0][3])
-                for row in trip_data:
-                    if row[1]:
-                        # Beginning of a DutyDay
-                        duty_day = DutyDay()
-                    flight = Flight.load_from_db_by_id(flight_id=row[0])
-                    if not flight:
-                        print("Enter flight as DDMMYYYY AC#### ORG HHMM DES HHMM EQU")
-                        flight_data = input("v.gr. 23062018 0403 MEX 0700 JFK 1300 7S8")
-                        flight = Flight.from_string(flight_data)
-                        flight.save_to_db()
-                    if row[4]:
-                        # dh boolean indicates this flight is a DH flight
-                        flight.dh = True
-                    duty_day.append(flight)
-                    if row[2]:
-                        # Ending of a DutyDay
-                        trip.append(duty_day)
-                return trip
+    def from_rows(cls, trip_number: str, trip_data: list):
+        """Build a trip out of its trip rows, as given by the repository, ordered by scheduled_begin"""
+        trip = cls(number=trip_number, dated=trip_data[0][3])
+        trip.position = trip_data[0][15]
+        for row in trip_data:
+            (flight_id, report, rel, trip_date, dh, carrier, scheduled_begin, scheduled_block,
+             route_id, name, origin, destination, airplane_code, cabin_members, trip_id, position) = row
+            if report:
+                # Beginning of a DutyDay
+                duty_day = DutyDay()
+            route = Route(name=name, origin=Airport(origin), destination=Airport(destination),
+                          route_id=route_id)
+            itinerary = Itinerary.from_timedelta(begin=scheduled_begin, a_timedelta=scheduled_block)
+            equipment = Equipment(airplane_code, cabin_members) if airplane_code else None
+            flight = Flight(route=route, scheduled_itinerary=itinerary, equipment=equipment,
+                            carrier=carrier, event_id=flight_id)
+            if dh:
+                # dh boolean indicates this flight is a DH flight
+                flight.dh = True
+            duty_day.append(flight)
+            if rel:
+                # Ending of a DutyDay
+                trip.append(duty_day)
+        return trip
+
+    @classmethod
+    def load_by_id(cls, trip_number: str, dated: date, session: Session = None):
+        """Build the whole trip out of a single query"""
+        trip_data = repository.current().load_trip_rows(trip_number, dated, session)
+        if trip_data:
+            return cls.from_rows(trip_number, trip_data)
+
+    @classmethod
+    def load_between(cls, start: date, end: date, position: str = None, session: Session = None):
+        """Yield every trip dated within [start, end], optionally only those for position.
+        Rows are turned into one trip at a time, as the repository gives them"""
+        rows = repository.current().load_trip_rows_between(start, end, position, session)
+        for (trip_id, trip_date), trip_data in groupby(rows, key=itemgetter(14, 3)):
+            yield cls.from_rows('{:04d}'.format(trip_id), list(trip_data))
 
     @property
     def report(self):
@@ -1187,20 +1240,15 @@ class Trip(object):
         footer = footer_template.format(**self._credits)
         return header + body + footer
 
-    def save_to_db(self):
+    def save_to_db(self, session: Session = None):
         """Save to db should be only concerned with saving a trip regardless of
-           its previous status, i.e. if it has been stored before or not
+           its previous status, i.e. if it has been stored before or not.
+           Within a session, a trip that fails to be saved leaves nothing of itself behind
         """
-        with CursorFromConnectionPool() as cursor:
-            cursor.execute('SELECT * FROM public.trips '
-                           'WHERE trips.number=%s AND trips.dated=%s', (self.number, self.dated))
-            trip_data = cursor.fetchone()
-
-            if not trip_data:
-                cursor.execute('INSERT INTO public.trips (number, dated, gposition) '
-                               'VALUES (%s, %s, %s);', (self.number, self.dated, self.position))
-        for duty_day in self.duty_days:
-            duty_day.save_to_db(self)
+        with repository.current().savepoint(session):
+            repository.current().save_trip(self.number, self.dated, self.position, session)
+            for duty_day in self.duty_days:
+                duty_day.save_to_db(self, session)
 
     def update_with_actual_itineraries(self, actual_trip):
         """Beacuse self.trip already has all published information loaded from the DB,
@@ -1208,13 +1256,13 @@ class Trip(object):
         for duty_day, actual_duty_day in zip(self.duty_days, actual_trip.duty_days):
             duty_day.update_with_actual_itineraries(duty_day=actual_duty_day)
 
-    def update_from_database(self):
+    def update_from_database(self, session: Session = None):
         """ 1. Loop over each event
             2. Load each event's stored data
         """
         for duty_day in self.duty_days:
             for event in duty_day.events:
-                event.update_from_database()
+                event.update_from_database(session)
 
 
 class Line(object):
@@ -1,10 +1,22 @@
 from datetime import date, timedelta, datetime
 import dateutil.relativedelta
+from model.time_parser import MONTHS, parse_minutes, parse_delta, parse_datetime
 date_time_format = "%d%m%y %H%M"
+epoch = datetime(1970, 1, 1)
+one_minute = timedelta(minutes=1)
 
 
+def to_epoch_minutes(dt: datetime) -> int:
+    """Whole minutes from epoch to dt, seconds are dropped"""
+    return (dt - epoch) // one_minute
+
+
+def from_epoch_minutes(minutes: int) -> datetime:
+    return epoch + timedelta(minutes=minutes)
+
 
 class Duration(object):
+    __slots__ = ('minutes',)
 
     def __init__(self, minutes: int):
         """value should be a timedelta or minutes (int)"""
@@ -20,9 +32,8 @@ class Duration(object):
 
     @classmethod
     def from_string(cls, value: str):
-        hours = int(value[0:-2])
-        minutes = int(value[-2:])
-        return cls(minutes=hours*60 + minutes)
+        """value should have a HHMM or HH:MM format"""
+        return cls(minutes=parse_minutes(value))
 
     def as_timedelta(self):
         return timedelta(minutes=self.minutes)
@@ -109,11 +120,9 @@ class DateTracker(object):
     """Used to track whenever there is a change in month"""
 
     def __init__(self, year, month, carry_in=False):
-        months_sp = {'ENE': 1, 'FEB': 2, 'MAR': 3, 'ABR': 4, 'MAY': 5, 'JUN': 6,
-                     'JUL': 7, 'AGO': 8, 'SEP': 9, 'OCT': 10, 'NOV': 11, 'DIC': 12}
         three_letter_month = month[0:3]
         self.year = year
-        self.month = months_sp[three_letter_month]
+        self.month = MONTHS[three_letter_month]
         self.dated = date(self.year, self.month, 1)
         if carry_in:
             self.backwards()
@@ -147,7 +156,7 @@ class DateTimeTracker(object):
 
     def __init__(self, begin: str):
         self.datetime_format = "%d%b%Y%H:%M"
-        self.dt = datetime.strptime(begin, self.datetime_format)
+        self.dt = parse_datetime(begin)
 
     def start(self):
         "Moves one hour ahead"
@@ -161,9 +170,7 @@ class DateTimeTracker(object):
         """Moves HH hours and MM minutes forward in time.
         time_string may be of type HH:MM or HHMM
         """
-        hh = int(time_string[:2])
-        mm = int(time_string[-2:])
-        td: timedelta = timedelta(hours=hh, minutes=mm)
+        td: timedelta = parse_delta(time_string)
         self.dt += td
         return td
 
@@ -171,9 +178,7 @@ class DateTimeTracker(object):
         """Moves HH hours and MM minutes backward in time.
         time_string may be of type HH:MM or HHMM
         """
-        hh = int(time_string[:2])
-        mm = int(time_string[-2:])
-        td: timedelta = timedelta(hours=hh, minutes=mm)
+        td: timedelta = parse_delta(time_string)
         self.dt -= td
         return td
 
@@ -0,0 +1,84 @@
+"""
+Parsers for the fixed formats found in PBS files and rosters, in place of datetime.strptime:
+
+    HHMM, HH:MM     times of day and durations          1340, 13:40
+    DDMMMYYYY       dates, English or Spanish months    15FEB2018, 15ENE2018
+    DDMMYYYY        dates                               15022018
+    DDMMMYYYYHH:MM  datetimes, with or without colon    15FEB201813:40, 15FEB20181340
+
+Every valid time of day is looked up in a table built once. Dates are parsed the first
+time they are seen and kept, a month of flights names but a few dozen of them.
+"""
+from datetime import datetime, timedelta
+
+# Months as abbreviated by PBS files (English) and rosters (Spanish), in any case
+MONTH_NAMES = [('JAN', 'ENE'), ('FEB',), ('MAR',), ('APR', 'ABR'), ('MAY',), ('JUN',),
+               ('JUL',), ('AUG', 'AGO'), ('SEP',), ('OCT',), ('NOV',), ('DEC', 'DIC')]
+MONTHS = {spelling: number
+          for number, names in enumerate(MONTH_NAMES, start=1)
+          for name in names
+          for spelling in (name, name.title(), name.lower())}
+
+# Minutes since midnight of every HHMM and HH:MM time of day
+CLOCK = {text: hours * 60 + minutes
+         for hours in range(24)
+         for minutes in range(60)
+         for text in ('{:02d}{:02d}'.format(hours, minutes), '{:02d}:{:02d}'.format(hours, minutes))}
+# The same, as timedeltas to be added to a midnight
+CLOCK_DELTAS = {text: timedelta(minutes=minute) for text, minute in CLOCK.items()}
+
+# Midnight of every date parsed so far, by its DDMMMYYYY or DDMMYYYY text
+_midnights = dict()
+
+
+def parse_minutes(text: str) -> int:
+    """Minutes in a HHMM or HH:MM duration, hours may take more than two digits"""
+    try:
+        return CLOCK[text]
+    except KeyError:
+        pass
+    hours, minutes = text[:-2].rstrip(':'), text[-2:]
+    if not (hours.isdigit() and minutes.isdigit()) or int(minutes) > 59:
+        raise ValueError("{!r} is not a HHMM or HH:MM duration".format(text))
+    return int(hours) * 60 + int(minutes)
+
+
+def parse_delta(text: str) -> timedelta:
+    """timedelta of a HHMM or HH:MM duration"""
+    try:
+        return CLOCK_DELTAS[text]
+    except KeyError:
+        return timedelta(minutes=parse_minutes(text))
+
+
+def parse_time_of_day(text: str) -> timedelta:
+    """Time elapsed since midnight at a HHMM or HH:MM time of day"""
+    try:
+        return CLOCK_DELTAS[text]
+    except KeyError:
+        raise ValueError("{!r} is not a HHMM or HH:MM time of day".format(text)) from None
+
+
+def parse_midnight(text: str) -> datetime:
+    """Midnight starting a DDMMMYYYY or DDMMYYYY date"""
+    try:
+        return _midnights[text]
+    except KeyError:
+        pass
+    try:
+        if len(text) == 9:
+            midnight = datetime(int(text[5:9]), MONTHS[text[2:5]], int(text[0:2]))
+        elif len(text) == 8 and text.isdigit():
+            midnight = datetime(int(text[4:8]), int(text[2:4]), int(text[0:2]))
+        else:
+            raise ValueError
+    except (KeyError, ValueError):
+        raise ValueError("{!r} is not a DDMMMYYYY or DDMMYYYY date".format(text)) from None
+    _midnights[text] = midnight
+    return midnight
+
+
+def parse_datetime(text: str) -> datetime:
+    """A DDMMMYYYY or DDMMYYYY date followed by a HHMM or HH:MM time of day"""
+    day_length = 8 if text[2:3].isdigit() else 9
+    return parse_midnight(text[:day_length]) + parse_time_of_day(text[day_length:])
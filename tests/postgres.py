@@ -0,0 +1,45 @@
+"""
+Postgres tests never run against orgutrip, migrations rebuild its tables and tests write to them.
+They run against the throwaway database whose libpq connection string is HAPPYTRIP_TEST_DSN,
+v.gr. a copy of orgutrip:
+
+    createdb -T orgutrip happytrip_test
+    HAPPYTRIP_TEST_DSN="dbname=happytrip_test user=postgres host=localhost" python -m pytest tests
+
+and are skipped when it is not given or can't be reached.
+"""
+import os
+import unittest
+from contextlib import contextmanager
+
+import psycopg2
+
+from data.database import Database, Session
+
+test_dsn = os.environ.get('HAPPYTRIP_TEST_DSN')
+
+
+def connect() -> bool:
+    """Open the connection pool on the test database, False if there is none to connect to"""
+    if not test_dsn:
+        return False
+    try:
+        Database.initialise(dsn=test_dsn)
+    except psycopg2.OperationalError as e:
+        print("Postgres tests skipped: {}".format(e))
+        return False
+    return True
+
+
+reachable = connect()
+requires_postgres = unittest.skipUnless(reachable, "HAPPYTRIP_TEST_DSN names no reachable test database")
+
+
+@contextmanager
+def rolled_back_session():
+    """A Session whose changes are all undone once left"""
+    with Session() as session:
+        try:
+            yield session
+        finally:
+            session.conn.rollback()
@@ -1,9 +1,7 @@
 import unittest
 
-from data.database import Database
 from model.scheduleClasses import Airport
-
-Database.initialise(database="orgutrip", user="postgres", password="0933", host="localhost")
+from tests.postgres import requires_postgres
 
 
 class TestAirport(unittest.TestCase):
@@ -22,6 +20,7 @@ class TestInit(TestAirport):
         self.assertEqual(self.airport.viaticum, 'low_cost')
 
 
+@requires_postgres
 class TestDataBase(TestAirport):
     # def test_store_airport(self):
     #     self.airport.save_to_db()
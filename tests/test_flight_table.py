@@ -0,0 +1,141 @@
+import random
+import unittest
+from datetime import datetime, date, timedelta
+
+import numpy as np
+
+from data import repository
+from data.sqlite_repository import SQLiteRepository
+from model.creditator import Creditator
+from model.flight_table import FlightTable, DUTY_TYPES, night_minutes, early_morning
+from model.scheduleClasses import Airport, Equipment, Route, Itinerary, Flight, DutyDay, Trip
+from model.timeClasses import to_epoch_minutes
+
+AIRPORTS = ['MEX', 'GDL', 'MTY', 'CUN', 'JFK', 'MAD', 'CDG', 'NRT']
+CREDITS = ['block', 'dh', 'night', 'daily', 'delay', 'xturn', 'xblock', 'xduty', 'maxirre']
+
+
+def random_trips(count: int, seed: int = 0) -> list:
+    """Trips of one to four duty days, with flights of every length, some of them DH,
+    some flown later than scheduled"""
+    rnd = random.Random(seed)
+    for iata_code in AIRPORTS:
+        Airport(iata_code, 'America/Mexico_City', 'low_cost')
+    Equipment('7S8', 4)
+    trips = []
+    for number in range(count):
+        begin = datetime(2018, 7, 25) + timedelta(minutes=rnd.randrange(0, 14 * 24 * 60, 5))
+        trip = Trip(number='{:04d}'.format(number + 1), dated=begin.date())
+        trip.position = 'SOB'
+        origin = 'MEX'
+        for _ in range(rnd.randint(1, 4)):
+            duty_day = DutyDay()
+            for _ in range(rnd.choice([1, 1, 2, 2, 3, 4])):
+                destination = rnd.choice([airport for airport in AIRPORTS if airport != origin])
+                route = Route('{:04d}'.format(rnd.randrange(1, 100)), Airport(origin), Airport(destination))
+                scheduled = Itinerary.from_timedelta(begin, timedelta(minutes=rnd.randrange(30, 16 * 60, 5)))
+                flight = Flight(route=route, scheduled_itinerary=scheduled, equipment=Equipment('7S8'),
+                                dh=rnd.random() < 0.2)
+                if rnd.random() < 0.2:
+                    delayed = scheduled.begin + timedelta(minutes=rnd.randrange(0, 180, 5))
+                    flight.actual_itinerary = Itinerary.from_timedelta(
+                        delayed, scheduled.duration.as_timedelta() + timedelta(minutes=rnd.randrange(-20, 40)))
+                duty_day.append(flight)
+                begin = flight.end + timedelta(minutes=rnd.randrange(30, 5 * 60, 5))
+                origin = destination
+            trip.append(duty_day)
+            begin += timedelta(minutes=rnd.randrange(8 * 60, 30 * 60, 5))
+        trips.append(trip)
+    return trips
+
+
+class TestFlightTable(unittest.TestCase):
+    def assertMatchesCreditator(self, trips, table):
+        credits = table.credits()
+        index = 0
+        for trip in trips:
+            for duty_day in trip.duty_days:
+                Creditator.credits_from_duty_day(duty_day)
+                for key in CREDITS:
+                    self.assertEqual(duty_day._credits[key].minutes, credits[key][index],
+                                     "{} of duty day {} of trip {}".format(key, index, trip.number))
+                self.assertEqual(duty_day._credits['duty_type'], DUTY_TYPES[credits['duty_type'][index]])
+                index += 1
+        self.assertEqual(index, len(credits['block']))
+
+    def test_credits_from_trips(self):
+        trips = random_trips(500)
+        self.assertMatchesCreditator(trips, FlightTable.from_trips(trips))
+
+    def test_every_duty_type_is_found(self):
+        duty_types = FlightTable.from_trips(random_trips(500)).credits()['duty_type']
+        self.assertEqual(set(range(len(DUTY_TYPES))), set(duty_types))
+
+    def test_trip_credits(self):
+        trips = random_trips(100)
+        table = FlightTable.from_trips(trips)
+        trip_credits = table.trip_credits(table.credits(), month_scope=8)
+        creditator = Creditator(month_scope=8)
+        for index, trip in enumerate(trips):
+            creditator.credits_from_trip(trip)
+            for key in ['block', 'dh', 'daily', 'night', 'xblock', 'xduty', 'maxirre', 'xturn']:
+                self.assertEqual(trip._credits[key].minutes, trip_credits[key][index])
+
+    def test_trips_without_duty_days(self):
+        first, second = random_trips(2)
+        empty = Trip(number='0003', dated=first.dated)
+        empty.append(DutyDay())
+        table = FlightTable.from_trips([first, Trip(number='0004', dated=first.dated), second, empty])
+        block = table.trip_credits(table.credits())['block']
+        expected = FlightTable.from_trips([first, second])
+        first_block, second_block = expected.trip_credits(expected.credits())['block']
+        self.assertEqual([first_block, 0, second_block, 0], list(block))
+
+    def test_credits_from_rows(self):
+        repository.use(SQLiteRepository())
+        Route._routes.clear()
+        try:
+            for iata_code in AIRPORTS:
+                Airport(iata_code, 'America/Mexico_City', 'low_cost').save_to_db()
+            Equipment('7S8', 4).save_to_db()
+            for trip in random_trips(50, seed=1):
+                # Stored trips have no actual itineraries
+                for duty_day in trip.duty_days:
+                    for flight in duty_day.events:
+                        flight.actual_itinerary = None
+                trip.save_to_db()
+            rows = list(repository.current().load_trip_rows_between(date(2018, 7, 1), date(2018, 8, 31)))
+            trips = list(Trip.load_between(date(2018, 7, 1), date(2018, 8, 31)))
+        finally:
+            repository.use(None)
+        table = FlightTable.from_rows(rows)
+        self.assertEqual([(trip.number, trip.dated) for trip in trips], table.trip_keys)
+        self.assertMatchesCreditator(trips, table)
+
+
+class TestKernels(unittest.TestCase):
+    """Events of up to four days, checked minute by minute"""
+
+    def setUp(self):
+        rnd = random.Random(2)
+        first = to_epoch_minutes(datetime(2018, 8, 1))
+        self.begin = np.array([first + rnd.randrange(0, 3 * 24 * 60) for _ in range(300)])
+        self.end = self.begin + np.array([rnd.randrange(0, 4 * 24 * 60) for _ in range(300)])
+
+    def test_night_minutes(self):
+        expected = [sum(1 for minute in range(begin, end) if not 5 * 60 <= minute % (24 * 60) < 22 * 60)
+                    for begin, end in zip(self.begin, self.end)]
+        self.assertEqual(expected, list(night_minutes(self.begin, self.end)))
+
+    def test_early_morning(self):
+        expected = [any(59 < minute % (24 * 60) < 4 * 60 + 59 for minute in range(begin, end + 1))
+                    for begin, end in zip(self.begin, self.end)]
+        self.assertEqual(expected, list(early_morning(self.begin, self.end)))
+
+    def test_same_as_creditator(self):
+        for begin, end, night, early in zip(self.begin, self.end, night_minutes(self.begin, self.end),
+                                            early_morning(self.begin, self.end)):
+            itinerary = Itinerary(datetime(1970, 1, 1) + timedelta(minutes=int(begin)),
+                                  datetime(1970, 1, 1) + timedelta(minutes=int(end)))
+            self.assertEqual(night, Creditator.calculate_night_time(itinerary).minutes)
+            self.assertEqual(early, Creditator.has_early_morning_time(itinerary))
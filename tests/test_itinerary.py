@@ -56,3 +56,11 @@ class TestStr(TestItinerary):
         self.assertEqual('28Apr BEGIN 1430 END 1817', self.i1.__str__())
 
 
+class TestSetters(TestItinerary):
+    def test_begin_is_replaced(self):
+        self.i1.begin = datetime(2018, 4, 28, 15, 30)
+        self.assertEqual(datetime(2018, 4, 28, 15, 30), self.i1.begin)
+        self.assertEqual(167, self.i1.duration.minutes)
+
+    def test_no_instance_dict(self):
+        self.assertFalse(hasattr(self.i1, '__dict__'))
@@ -0,0 +1,38 @@
+import unittest
+from datetime import date
+
+from data.database import CursorFromConnectionPool
+from data.migrations import migrate, migrations, check_indexes, create_partitions, create_month_partitions, \
+    partitions
+from tests.postgres import requires_postgres, rolled_back_session
+
+
+@requires_postgres
+class TestMigrations(unittest.TestCase):
+    def test_every_migration_is_applied(self):
+        self.assertEqual(migrations[-1][0], migrate())
+        self.assertEqual(migrations[-1][0], migrate())
+
+    def test_month_partitions_are_created(self):
+        migrate()
+        create_partitions(date(2000, 2, 15))
+        create_partitions(date(2000, 2, 1))
+        for table in ['flights', 'reserves', 'duty_days']:
+            self.assertIn('{}_2000_02'.format(table), partitions(table))
+
+    def test_rows_without_their_month_are_moved_into_it(self):
+        migrate()
+        with rolled_back_session() as session, CursorFromConnectionPool(session=session) as cursor:
+            cursor.execute('DROP TABLE IF EXISTS public.reserves_1999_12')
+            cursor.execute("INSERT INTO public.reserves (route_id, begin, duration, gposition) "
+                           "VALUES (1, '1999-12-15 06:00', '4 hours', 'SOB') ON CONFLICT DO NOTHING")
+            create_month_partitions(cursor, date(1999, 12, 1))
+            cursor.execute("SELECT count(*) FROM public.reserves_default WHERE begin < '2000-01-01'")
+            self.assertEqual(0, cursor.fetchone()[0])
+            cursor.execute('SELECT count(*) FROM public.reserves_1999_12')
+            self.assertEqual(1, cursor.fetchone()[0])
+
+    def test_indexes_are_used(self):
+        migrate()
+        for description, index, used in check_indexes():
+            self.assertTrue(used, "{} does not use {}".format(description, index))
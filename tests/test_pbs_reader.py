@@ -0,0 +1,115 @@
+import os
+import tempfile
+import time
+from unittest import TestCase
+
+from data.pbs_reader import iter_trip_blocks, read_trips, read_trip_files, strip_page_furniture
+from data.regex import trip_RE
+
+pbs_content = """
+# 3760                                                  CHECK IN AT 06:00
+15FEB2018
+DATE  RPT  FLIGHT DEPARTS  ARRIVES  RLS  BLK        TURN        EQ
+15FEB 0600 0403   MEX 0700 JFK 1300      0600       0100        7S8
+           0404   JFK 1400 MEX 1900 1930 0500                   7S8
+                                      1100BL 0000CRD 1100TL 1330DY
+
+          TOTALS     11:00TL     11:00BL     0:00CR           13:30TAFB
+# 3761                                                  CHECK IN AT 22:00
+15FEB2018
+DATE  RPT  FLIGHT DEPARTS  ARRIVES  RLS  BLK        TURN        EQ
+15FEB 2200 0002   MEX 2300 MAD 1200 1230 1300                   788
+                     MAD 23:54           1300BL 0000CRD 1300TL 1430DY
+17FEB 1100 DH0001 MAD 1200 MEX 1800 1830 0000                   788
+                                      0000BL 1300CRD 1300TL 0730DY
+
+          TOTALS     26:00TL     13:00BL     13:00CR           44:30TAFB
+"""
+
+page_break = "8/15/2018 http://crew.am.jepphost.com/amx/portal/\ncrew.am.jepphost.com/amx/portal/ 4/430\n"
+
+
+class TestPBSReader(TestCase):
+
+    def setUp(self):
+        fd, self.file_name = tempfile.mkstemp(suffix='.txt')
+        with os.fdopen(fd, 'w', encoding='utf-8') as fp:
+            fp.write(pbs_content)
+
+    def tearDown(self):
+        os.remove(self.file_name)
+
+
+class TestIterTripBlocks(TestPBSReader):
+
+    def test_blocks_start_at_trip_headers(self):
+        blocks = list(iter_trip_blocks(self.file_name, 'utf-8'))
+        self.assertEqual(2, len(blocks))
+        for offset, block in blocks:
+            self.assertTrue(block.startswith('# 376'))
+            self.assertEqual(pbs_content.index(block[:6]), offset)
+
+    def test_empty_file(self):
+        open(self.file_name, 'w').close()
+        self.assertEqual([], list(iter_trip_blocks(self.file_name, 'utf-8')))
+
+
+class TestReadTrips(TestPBSReader):
+
+    def test_same_as_reading_whole_file(self):
+        expected = [trip_match.groupdict() for trip_match in trip_RE.finditer(pbs_content)]
+        self.assertEqual(expected, list(read_trips(self.file_name, 'utf-8')))
+
+
+class TestStripPageFurniture(TestCase):
+
+    def setUp(self):
+        self.text = "0600 0100 7S8\n" + page_break + "0404 JFK"
+
+    def test_furniture_is_removed(self):
+        clean, offset_map = strip_page_furniture(self.text)
+        self.assertNotIn('jepphost', clean)
+        self.assertNotIn('/', clean)
+        self.assertEqual(['0600', '0100', '7S8', '0404', 'JFK'], clean.split())
+
+    def test_original_positions(self):
+        clean, offset_map = strip_page_furniture(self.text, base=100)
+        for word in ['0600', '7S8', '0404', 'JFK']:
+            self.assertEqual(100 + self.text.index(word), offset_map.original(clean.index(word)))
+
+    def test_original_byte_offsets(self):
+        text = "0600 MÉXICO 7S8\n" + page_break + "0404 JFK"
+        clean, offset_map = strip_page_furniture(text, base=100, encoding='utf-8')
+        encoded = text.encode('utf-8')
+        for word in ['0600', '7S8', '0404', 'JFK']:
+            self.assertEqual(100 + encoded.index(word.encode('utf-8')), offset_map.original(clean.index(word)))
+
+    def test_page_break_within_trip(self):
+        broken_content = pbs_content.replace("           0404", page_break + "           0404")
+        expected = [trip_match.groupdict() for trip_match in trip_RE.finditer(pbs_content)]
+        actual = [trip_match.groupdict() for trip_match in trip_RE.finditer(strip_page_furniture(broken_content)[0])]
+        self.assertEqual(expected[1], actual[1])
+        self.assertEqual(expected[0]['tafb'], actual[0]['tafb'])
+
+
+class TestReadTripFiles(TestPBSReader):
+
+    def test_files_are_read_in_order(self):
+        trips = list(read_trip_files([self.file_name, self.file_name], 'utf-8', prefetch=1))
+        self.assertEqual(['3760', '3761', '3760', '3761'], [trip_dict['number'] for _, trip_dict in trips])
+
+    def test_reading_stops_once_closed(self):
+        read = []
+
+        def reader(file_name, encoding):
+            for trip_dict in read_trips(file_name, encoding):
+                read.append(trip_dict['number'])
+                yield trip_dict
+
+        trips = read_trip_files([self.file_name] * 10, 'utf-8', prefetch=1, reader=reader)
+        next(trips)
+        trips.close()
+        count = len(read)
+        self.assertLess(count, 20)
+        time.sleep(0.05)
+        self.assertEqual(count, len(read))
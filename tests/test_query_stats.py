@@ -0,0 +1,41 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+
+from data.database import QueryStats, statement_shape
+
+
+class TestQueryStats(unittest.TestCase):
+    def setUp(self):
+        QueryStats.enable(n_plus_one=3)
+        QueryStats.reset()
+
+    def tearDown(self):
+        QueryStats.disable()
+        QueryStats.reset()
+
+    def test_literals_and_placeholders_share_a_shape(self):
+        self.assertEqual(statement_shape("SELECT route_id FROM routes WHERE name='0403' AND route_id=12"),
+                         statement_shape('SELECT route_id FROM routes WHERE name=%s AND route_id=%s'))
+
+    def test_rows_of_values_share_a_shape(self):
+        self.assertEqual('INSERT INTO trips VALUES (?, ?), ... ON CONFLICT DO NOTHING',
+                         statement_shape(b"INSERT INTO trips VALUES (1, '2018-08-01'), (2, '2018-08-01') "
+                                         b"ON CONFLICT DO NOTHING"))
+
+    def test_repeated_statement_is_flagged(self):
+        for _ in range(4):
+            QueryStats.record_statement('SELECT * FROM flights WHERE flight_id=%s', 0.001, 1)
+        QueryStats.record_statement('SELECT * FROM trips', 0.002, 10)
+        lines = QueryStats.summary().splitlines()
+        self.assertIn('N+1? SELECT * FROM flights WHERE flight_id=?', lines[1])
+        self.assertNotIn('N+1?', lines[2])
+        self.assertTrue(lines[-1].startswith('5 statements'))
+
+    def test_operation_prints_nothing_unless_enabled(self):
+        QueryStats.disable()
+        output = io.StringIO()
+        with redirect_stdout(output):
+            with QueryStats.operation('nothing'):
+                pass
+        self.assertEqual('', output.getvalue())
@@ -0,0 +1,151 @@
+import unittest
+from datetime import datetime, date, time
+
+from data import repository
+from data.memory_repository import MemoryRepository
+from data.sqlite_repository import SQLiteRepository, trip_rows_sql
+from model.scheduleClasses import Airport, CrewMember, Equipment, Route, Itinerary, Flight, FlightIndex, DutyDay, Trip
+
+
+class RepositoryTests(object):
+    """Model persistence methods, run against every backend but Postgres"""
+
+    def new_repository(self) -> repository.Repository:
+        raise NotImplementedError
+
+    def setUp(self):
+        self.repository = self.new_repository()
+        repository.use(self.repository)
+        # Routes keep their route_id, given by whichever repository stored them before
+        Route._routes.clear()
+        for iata_code, timezone in [('MEX', 'America/Mexico_City'), ('GDL', 'America/Mexico_City')]:
+            Airport(iata_code, timezone, 'low_cost').save_to_db()
+        Equipment('7S8', 4).save_to_db()
+        self.trip = self.new_trip('9999', date(2000, 1, 1), 'SOB')
+
+    def tearDown(self):
+        repository.use(None)
+
+    @staticmethod
+    def new_trip(number, dated, position):
+        trip = Trip(number=number, dated=dated)
+        trip.position = position
+        duty_day = DutyDay()
+        for name, origin, destination, begin, end in [('0403', 'MEX', 'GDL', datetime(2000, 1, 1, 7),
+                                                       datetime(2000, 1, 1, 8)),
+                                                      ('0404', 'GDL', 'MEX', datetime(2000, 1, 1, 9),
+                                                       datetime(2000, 1, 1, 10))]:
+            route = Route(name, Airport(origin), Airport(destination))
+            duty_day.append(Flight(route=route, scheduled_itinerary=Itinerary(begin, end),
+                                   equipment=Equipment('7S8')))
+        trip.append(duty_day)
+        return trip
+
+    def test_saved_trip_is_loaded(self):
+        self.trip.save_to_db()
+        trip = Trip.load_by_id('9999', date(2000, 1, 1))
+        self.assertEqual(['0403', '0404'], [flight.name for flight in trip.duty_days[0].events])
+        self.assertEqual('SOB', trip.position)
+        self.assertEqual(time(7), trip.duty_days[0].events[0].begin.time())
+        self.assertEqual(4, trip.duty_days[0].events[0].equipment.cabin_members)
+
+    def test_saving_twice(self):
+        self.trip.save_to_db()
+        event_ids = [flight.event_id for flight in self.trip.duty_days[0].events]
+        self.trip.save_to_db()
+        self.assertEqual(event_ids, [flight.event_id for flight in self.trip.duty_days[0].events])
+        trip = Trip.load_by_id('9999', date(2000, 1, 1))
+        self.assertEqual(2, len(trip.duty_days[0].events))
+
+    def test_load_between(self):
+        self.trip.save_to_db()
+        other_trip = self.new_trip('9998', date(2000, 1, 1), 'EJE')
+        for flight, stored_flight in zip(other_trip.duty_days[0].events, self.trip.duty_days[0].events):
+            flight.event_id = stored_flight.event_id
+        other_trip.save_to_db()
+        self.assertEqual(['9998', '9999'],
+                         [trip.number for trip in Trip.load_between(date(2000, 1, 1), date(2000, 1, 1))])
+        self.assertEqual(['9999'], [trip.number for trip in Trip.load_between(date(2000, 1, 1), date(2000, 1, 1),
+                                                                               position='SOB')])
+        self.assertEqual([], list(Trip.load_between(date(2000, 1, 2), date(2000, 1, 2))))
+
+    def test_load_flight_by_fields(self):
+        self.trip.save_to_db()
+        flight = self.trip.duty_days[0].events[0]
+        loaded_flight = Flight.load_from_db_by_fields('AM', datetime(2000, 1, 1), flight.route)
+        self.assertEqual(flight.event_id, loaded_flight.event_id)
+        self.assertEqual(flight.scheduled_itinerary, loaded_flight.scheduled_itinerary)
+
+    def test_flight_within_a_trip_is_not_deleted(self):
+        self.trip.save_to_db()
+        self.assertFalse(self.repository.delete_flight(self.trip.duty_days[0].events[0].event_id))
+
+    def test_flight_stored_twice_keeps_its_id(self):
+        self.trip.save_to_db()
+        flight = self.trip.duty_days[0].events[0]
+        self.assertEqual(flight.event_id,
+                         self.repository.save_flight('AM', flight.route.route_id, flight.begin,
+                                                     flight.duration.as_timedelta(), '7S8'))
+
+    def test_flight_index_holds_unsaved_flights(self):
+        index = FlightIndex()
+        first, second = self.trip.duty_days[0].events
+        index.add(first)
+        self.assertIsNone(index.get('AM', first.begin, first.route).event_id)
+        self.assertIsNone(index.get('AM', second.begin, second.route))
+        self.trip.save_to_db()
+        index.add(first)
+        self.assertEqual(first.event_id, index.get('AM', first.begin, first.route).event_id)
+
+    def test_airport_is_stored_once(self):
+        self.assertEqual(('MEX', 'America/Mexico_City', 'low_cost'), self.repository.load_airport('MEX'))
+        self.assertFalse(self.repository.save_airport('MEX', 'America/Mexico_City', 'low_cost'))
+
+    def test_crew_member_is_stored_once(self):
+        crew_member = CrewMember('102711', 'JOHN DOE', 'SOB', 'A', 'MEX', 1234)
+        self.assertEqual('102711', crew_member.save_to_db())
+        self.assertIsNone(CrewMember('102711', 'JOHN ROE', 'SOB', 'A', 'MEX', 1234).save_to_db())
+        self.assertEqual(crew_member, CrewMember.load_from_db('102711'))
+
+    def test_crew_member_is_updated_or_stored(self):
+        CrewMember('102711', 'JOHN DOE', 'SOB', 'A', 'MEX', 1234).update_to_db()
+        crew_member = CrewMember('102711', 'JOHN DOE', 'JSB', 'B', 'GDL', 99)
+        crew_member.update_to_db()
+        self.assertEqual(crew_member, CrewMember.load_from_db('102711'))
+
+    def test_import_airports(self):
+        self.repository.update_airport('GDL', 'America/Monterrey', 'border')
+        zones = {'MEX': 'America/Mexico_City', 'GDL': 'America/Mexico_City', 'MAD': 'Europe/Madrid',
+                 'EZE': 'America/Argentina/Buenos_Aires'}
+        self.assertEqual((2, 1, 1), self.repository.import_airports(zones, 'low_cost'))
+        self.assertEqual(('GDL', 'America/Mexico_City', 'border'), self.repository.load_airport('GDL'))
+        self.assertEqual(('EZE', 'America/Argentina/Buenos_Aires', 'low_cost'), self.repository.load_airport('EZE'))
+        self.assertEqual((0, 0, 4), self.repository.import_airports(zones, 'low_cost'))
+
+    def test_import_time_zones(self):
+        added, changed, unchanged = Airport.import_time_zones()
+        self.assertEqual((0, 2), (changed, unchanged))
+        self.assertEqual(added + 2, len(self.repository.load_airports()))
+        self.assertEqual(('MAD', 'Europe/Madrid', 'low_cost'), self.repository.load_airport('MAD'))
+
+
+class TestSQLiteRepository(RepositoryTests, unittest.TestCase):
+    def new_repository(self):
+        return SQLiteRepository()
+
+    def test_failed_trip_is_rolled_back(self):
+        with self.assertRaises(ZeroDivisionError):
+            with self.repository.savepoint():
+                self.trip.save_to_db()
+                1 / 0
+        self.assertIsNone(Trip.load_by_id('9999', date(2000, 1, 1)))
+
+    def test_trip_lookup_uses_index(self):
+        plan = self.repository.fetchall('EXPLAIN QUERY PLAN ' + trip_rows_sql + 'WHERE trip_id = ? AND trip_date = ?',
+                                        (9999, '2000-01-01'))
+        self.assertTrue(any('duty_days_trip_idx' in step[3] for step in plan))
+
+
+class TestMemoryRepository(RepositoryTests, unittest.TestCase):
+    def new_repository(self):
+        return MemoryRepository()
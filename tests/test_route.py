@@ -1,6 +1,10 @@
+import os
+import pickle
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from unittest import TestCase
 
-from model.scheduleClasses import Route, Airport
+from model.scheduleClasses import Route, Airport, Equipment, save_registries, load_registries
 
 
 class TestRoute(TestCase):
@@ -25,4 +29,70 @@ class TestInit(TestRoute):
         self.assertEqual(self.route._id, 1)
 
     def test_carrier_code(self):
-        self.assertEqual(self.route.carrier_code, 'AM')
\ No newline at end of file
+        self.assertEqual(self.route.carrier_code, 'AM')
+
+
+class TestPickle(TestRoute):
+
+    def test_unpickled_route_is_the_flyweight(self):
+        route = pickle.loads(pickle.dumps(self.route))
+        self.assertIs(route, self.route)
+        self.assertIs(route.origin, self.origin)
+
+    def test_unpickled_route_keeps_its_route_id(self):
+        Route._routes.pop('0777MEXJFK', None)
+        unsaved = pickle.dumps(Route('0777', self.origin, self.destination))
+        Route('0777', self.origin, self.destination, 77)
+        self.assertEqual(77, pickle.loads(unsaved).route_id)
+        self.assertEqual(1, pickle.loads(pickle.dumps(self.route)).route_id)
+
+
+class TestRegistrySnapshot(TestRoute):
+
+    def setUp(self):
+        super().setUp()
+        fd, self.file_name = tempfile.mkstemp(suffix='.pickle')
+        os.close(fd)
+        self.routes = dict(Route._routes)
+        self.airports = dict(Airport._airports)
+
+    def tearDown(self):
+        Route._routes.clear()
+        Route._routes.update(self.routes)
+        Airport._airports.clear()
+        Airport._airports.update(self.airports)
+        os.remove(self.file_name)
+
+    def test_restored_registries(self):
+        save_registries(self.file_name)
+        Route._routes.clear()
+        Airport._airports.clear()
+        load_registries(self.file_name)
+        route = Route._routes['0403MEXJFK']
+        self.assertEqual(1, route.route_id)
+        self.assertIs(Airport._airports['MEX'], route.origin)
+
+
+class TestFlyweight(TestRoute):
+
+    def test_lookup_keeps_loaded_values(self):
+        Airport('CUN', 'America/Cancun', 'low_cost')
+        Equipment('73H', 4)
+        route = Route('0503', Airport('CUN'), self.destination, 7)
+        self.assertEqual('America/Cancun', Airport('CUN').timezone)
+        self.assertEqual('low_cost', Airport('CUN').viaticum)
+        self.assertEqual(4, Equipment('73H').cabin_members)
+        self.assertEqual(7, Route('0503', Airport('CUN'), self.destination).route_id)
+        self.assertIs(route, Route('0503', Airport('CUN'), self.destination))
+
+    def test_given_values_replace_loaded_ones(self):
+        Airport('CUN', 'America/Cancun', 'low_cost')
+        self.assertEqual('border', Airport('CUN', 'America/Cancun', 'border').viaticum)
+
+
+class TestThreads(TestCase):
+
+    def test_racing_threads_get_the_same_flyweight(self):
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            routes = list(executor.map(lambda _: Route('0777', Airport('MEX'), Airport('CUN')), range(200)))
+        self.assertTrue(all(route is routes[0] for route in routes))
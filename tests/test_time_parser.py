@@ -0,0 +1,67 @@
+import unittest
+from datetime import datetime, date, timedelta
+
+from model.scheduleClasses import Itinerary
+from model.timeClasses import Duration, DateTracker, DateTimeTracker
+from model.time_parser import parse_minutes, parse_delta, parse_time_of_day, parse_midnight, parse_datetime
+
+
+class TestTimeParser(unittest.TestCase):
+    def test_every_time_of_day_as_strptime(self):
+        for minute in range(24 * 60):
+            moment = datetime(2018, 8, 1) + timedelta(minutes=minute)
+            self.assertEqual(moment, parse_datetime(moment.strftime('%d%b%Y%H%M').upper()))
+            self.assertEqual(moment, parse_datetime(moment.strftime('%d%b%Y%H:%M')))
+
+    def test_every_day_as_strptime(self):
+        day = date(2015, 1, 1)
+        while day < date(2021, 1, 1):
+            text = day.strftime('%d%b%Y').upper()
+            self.assertEqual(datetime.strptime(text, '%d%b%Y'), parse_midnight(text))
+            text = day.strftime('%d%m%Y')
+            self.assertEqual(datetime.strptime(text, '%d%m%Y'), parse_midnight(text))
+            day += timedelta(days=1)
+
+    def test_spanish_months(self):
+        for text, month in [('15ENE2018', 1), ('15ABR2018', 4), ('15AGO2018', 8), ('15DIC2018', 12),
+                            ('15Ago2018', 8), ('15ago2018', 8)]:
+            self.assertEqual(datetime(2018, month, 15), parse_midnight(text))
+
+    def test_durations(self):
+        self.assertEqual(13 * 60 + 40, parse_minutes('1340'))
+        self.assertEqual(13 * 60 + 40, parse_minutes('13:40'))
+        self.assertEqual(123 * 60 + 30, parse_minutes('12330'))
+        self.assertEqual(timedelta(hours=30, minutes=5), parse_delta('30:05'))
+
+    def test_invalid_text(self):
+        for parse, text in [(parse_minutes, '12:75'), (parse_minutes, 'AB30'), (parse_time_of_day, '2400'),
+                            (parse_midnight, '32AUG2018'), (parse_midnight, '15XYZ2018'), (parse_midnight, '1508'),
+                            (parse_datetime, '15AUG2018'), (parse_datetime, '')]:
+            with self.assertRaises(ValueError, msg=text):
+                parse(text)
+
+
+class TestParsingClasses(unittest.TestCase):
+    def test_itinerary_from_date_and_strings(self):
+        itinerary = Itinerary.from_date_and_strings(date(2018, 8, 1), '2330', '0215')
+        self.assertEqual(datetime(2018, 8, 1, 23, 30), itinerary.begin)
+        self.assertEqual(datetime(2018, 8, 2, 2, 15), itinerary.end)
+
+    def test_itinerary_from_string(self):
+        itinerary = Itinerary.from_string('23122019 1340    0320')
+        self.assertEqual(datetime(2019, 12, 23, 13, 40), itinerary.begin)
+        self.assertEqual(datetime(2019, 12, 23, 17), itinerary.end)
+
+    def test_duration_from_string(self):
+        self.assertEqual(200, Duration.from_string('0320').minutes)
+
+    def test_trackers(self):
+        self.assertEqual(date(2018, 8, 1), DateTracker(2018, 'AGOSTO').dated)
+        tracker = DateTimeTracker('01AUG201823:40')
+        tracker.forward('01:30')
+        self.assertEqual(datetime(2018, 8, 2, 1, 10), tracker.dt)
+        self.assertEqual('02Aug201801:10', str(tracker))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from data.pbs_reader import get_json_trip, strip_page_furniture
+from data.regex import trip_RE
+from data.tokenizer import parse_trips, read_json_trips, TripSyntaxError, tokenize, TRIP, FLIGHT
+from tests.test_pbs_reader import pbs_content, page_break
+
+
+class TestTokenize(TestCase):
+
+    def test_flight_row(self):
+        tokens = list(tokenize("0403   MEX 0700 JFK 1300      0600       0100        7S8"))
+        self.assertEqual([(FLIGHT, 0, ('0403', 'MEX', '0700', 'JFK', '1300', '0600', '0100', '7S8'))], tokens)
+
+    def test_trip_header(self):
+        self.assertEqual([(TRIP, 0, ('3760',))], list(tokenize("# 3760")))
+        self.assertEqual([(TRIP, 0, ('3760',))], list(tokenize("#3760")))
+
+
+class TestParseTrips(TestCase):
+
+    def setUp(self):
+        self.expected = [get_json_trip(trip_match.groupdict()) for trip_match in trip_RE.finditer(pbs_content)]
+
+    def test_same_as_get_json_trip(self):
+        self.assertEqual(self.expected, list(parse_trips(pbs_content)))
+
+    def test_page_break_within_trip(self):
+        broken_content = pbs_content.replace("           0404", page_break + "           0404")
+        self.assertEqual(self.expected, list(parse_trips(strip_page_furniture(broken_content)[0])))
+
+    def test_trip_without_totals(self):
+        truncated_content = pbs_content[:pbs_content.index("          TOTALS")]
+        with self.assertRaises(TripSyntaxError):
+            list(parse_trips(truncated_content))
+
+
+class TestReadJsonTrips(TestCase):
+
+    def setUp(self):
+        fd, self.file_name = tempfile.mkstemp(suffix='.txt')
+        with os.fdopen(fd, 'w', encoding='utf-8') as fp:
+            fp.write(pbs_content.replace("          TOTALS     11:00TL", "          11:00TL", 1))
+
+    def tearDown(self):
+        os.remove(self.file_name)
+
+    def test_malformed_trip_is_skipped(self):
+        trips = list(read_json_trips(self.file_name, 'utf-8'))
+        self.assertEqual(['3761'], [json_trip['number'] for json_trip in trips])
@@ -0,0 +1,69 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from data.pbs_reader import match_trip_block
+from data.tokenizer import read_json_trips
+from data.trip_cache import TripCache, read_cached_json_trips
+from tests.test_pbs_reader import pbs_content
+
+
+class TestTripCache(TestCase):
+
+    def setUp(self):
+        fd, self.file_name = tempfile.mkstemp(suffix='.txt')
+        with os.fdopen(fd, 'w', encoding='utf-8') as fp:
+            fp.write(pbs_content)
+        fd, self.cache_file = tempfile.mkstemp(suffix='.sqlite')
+        os.close(fd)
+        self.cache = TripCache(self.cache_file)
+
+    def tearDown(self):
+        self.cache.close()
+        os.remove(self.file_name)
+        os.remove(self.cache_file)
+
+    def read(self):
+        return list(read_cached_json_trips(self.file_name, 'utf-8', cache=self.cache))
+
+
+class TestReadCachedJsonTrips(TestTripCache):
+
+    def test_same_as_parsing(self):
+        expected = list(read_json_trips(self.file_name, 'utf-8'))
+        self.assertEqual(expected, self.read())
+        self.assertEqual(expected, self.read())
+        self.assertEqual(2, self.cache.hits)
+        self.assertEqual(2, self.cache.misses)
+
+    def test_regex_parse_block(self):
+        expected = list(read_json_trips(self.file_name, 'utf-8'))
+        self.assertEqual(expected, list(read_cached_json_trips(self.file_name, 'utf-8', cache=self.cache,
+                                                               parse_block=match_trip_block)))
+
+    def test_each_parser_has_its_own_blocks(self):
+        self.read()
+        list(read_cached_json_trips(self.file_name, 'utf-8', cache=self.cache, parse_block=match_trip_block))
+        self.assertEqual(0, self.cache.hits)
+        self.assertEqual(4, self.cache.misses)
+
+    def test_only_edited_blocks_are_parsed(self):
+        self.read()
+        with open(self.file_name, 'w', encoding='utf-8') as fp:
+            fp.write(pbs_content.replace('0404   JFK 1400', '0404   JFK 1410'))
+        json_trips = self.read()
+        self.assertEqual('1410', json_trips[0]['duty_days'][0]['flights'][1]['begin'])
+        self.assertEqual(1, self.cache.hits)
+        self.assertEqual(3, self.cache.misses)
+
+
+class TestEviction(TestTripCache):
+
+    def test_least_recently_used_are_evicted(self):
+        self.cache.put('a', 'first', [{'number': '0001'}])
+        self.cache.put('b', 'second', [{'number': '0002'}])
+        self.cache.get('a')
+        self.cache.max_size = self.cache.size() - 1
+        self.assertEqual(1, self.cache.evict())
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual([{'number': '0001'}], self.cache.get('a'))
@@ -0,0 +1,131 @@
+import unittest
+from datetime import datetime, date
+
+from data import repository
+from data.database import CursorFromConnectionPool, Session
+from data.migrations import migrate, create_partitions
+from data.trip_writer import save_trips
+from model.scheduleClasses import Airport, Equipment, Route, Itinerary, Flight, DutyDay, Trip
+from tests.postgres import requires_postgres
+
+
+@requires_postgres
+class TestTripWriter(unittest.TestCase):
+    def setUp(self):
+        migrate()
+        create_partitions(date(2000, 1, 1))
+        self.trip = Trip(number='9999', dated=date(2000, 1, 1))
+        self.trip.position = 'SOB'
+        duty_day = DutyDay()
+        for name, origin, destination, begin, end in [('0403', 'MEX', 'GDL', datetime(2000, 1, 1, 7),
+                                                       datetime(2000, 1, 1, 8)),
+                                                      ('0404', 'GDL', 'MEX', datetime(2000, 1, 1, 9),
+                                                       datetime(2000, 1, 1, 10))]:
+            route = Route(name, Airport(origin), Airport(destination))
+            duty_day.append(Flight(route=route, scheduled_itinerary=Itinerary(begin, end),
+                                   equipment=Equipment('7S8')))
+        self.trip.append(duty_day)
+
+    def tearDown(self):
+        with CursorFromConnectionPool() as cursor:
+            cursor.execute('DELETE FROM public.duty_days WHERE trip_id = 9999 AND trip_date = %s', (date(2000, 1, 1),))
+            cursor.execute('DELETE FROM public.trips WHERE number = 9999 AND dated = %s', (date(2000, 1, 1),))
+
+
+class TestSaveTrips(TestTripWriter):
+    def test_ids_are_given(self):
+        save_trips([self.trip])
+        for flight in self.trip.duty_days[0].events:
+            self.assertIsNotNone(flight.route.route_id)
+            self.assertIsNotNone(flight.event_id)
+
+    def test_saving_twice(self):
+        save_trips([self.trip])
+        event_ids = [flight.event_id for flight in self.trip.duty_days[0].events]
+        for flight in self.trip.duty_days[0].events:
+            flight.event_id = None
+        save_trips([self.trip])
+        self.assertEqual(event_ids, [flight.event_id for flight in self.trip.duty_days[0].events])
+
+    def test_load_saved_trip(self):
+        save_trips([self.trip])
+        trip = Trip.load_by_id('9999', date(2000, 1, 1))
+        self.assertEqual(['0403', '0404'], [flight.name for flight in trip.duty_days[0].events])
+
+    def test_flight_within_a_trip_is_not_deleted(self):
+        save_trips([self.trip])
+        self.assertFalse(repository.current().delete_flight(self.trip.duty_days[0].events[0].event_id))
+
+    def test_duty_days_reference_their_flights(self):
+        save_trips([self.trip])
+        with CursorFromConnectionPool() as cursor:
+            cursor.execute('SELECT count(*) FROM public.duty_days '
+                           '    INNER JOIN public.flights ON duty_days.flight_id = flights.flight_id '
+                           '                             AND duty_days.flight_begin = flights.scheduled_begin '
+                           '    WHERE trip_id = 9999 AND trip_date = %s', (date(2000, 1, 1),))
+            self.assertEqual(2, cursor.fetchone()[0])
+
+    def test_load_between(self):
+        save_trips([self.trip])
+        trips = list(Trip.load_between(date(2000, 1, 1), date(2000, 1, 1), position='SOB'))
+        self.assertEqual(['9999'], [trip.number for trip in trips])
+        self.assertEqual('SOB', trips[0].position)
+        self.assertEqual([], list(Trip.load_between(date(2000, 1, 1), date(2000, 1, 1), position='EJE')))
+
+
+class TestSession(TestTripWriter):
+    def test_trips_loaded_between_within_a_session(self):
+        save_trips([self.trip])
+        with Session() as session:
+            abandoned = Trip.load_between(date(2000, 1, 1), date(2000, 1, 1), session=session)
+            next(abandoned)
+            abandoned.close()
+            for trip in Trip.load_between(date(2000, 1, 1), date(2000, 1, 1), session=session):
+                nested = list(Trip.load_between(date(2000, 1, 1), date(2000, 1, 1), session=session))
+                self.assertEqual([trip.number], [nested_trip.number for nested_trip in nested])
+
+    def test_rolled_back_session_stores_nothing(self):
+        with self.assertRaises(ZeroDivisionError):
+            with Session() as session:
+                save_trips([self.trip], session)
+                self.assertIsNotNone(Trip.load_by_id('9999', date(2000, 1, 1), session))
+                1 / 0
+        self.assertIsNone(Trip.load_by_id('9999', date(2000, 1, 1)))
+
+    def test_failed_trip_is_rolled_back_to_its_savepoint(self):
+        with Session() as session:
+            save_trips([self.trip], session)
+            with self.assertRaises(ZeroDivisionError):
+                with session.savepoint():
+                    with CursorFromConnectionPool(session=session) as cursor:
+                        cursor.execute('DELETE FROM public.duty_days WHERE trip_id = 9999')
+                    1 / 0
+        self.assertIsNotNone(Trip.load_by_id('9999', date(2000, 1, 1)))
+
+
+class TestPreparedStatements(TestTripWriter):
+    def test_statements_are_prepared_once_per_connection(self):
+        for flight in self.trip.duty_days[0].events:
+            flight.route.route_id = None
+            flight.event_id = None
+        with Session() as session:
+            self.trip.save_to_db(session)
+            self.trip.save_to_db(session)
+            self.assertTrue({'save_route', 'save_flight', 'save_trip', 'insert_duty_day'} <= session.conn.prepared)
+            with CursorFromConnectionPool(session=session) as cursor:
+                cursor.execute('SELECT name FROM pg_prepared_statements')
+                self.assertEqual(session.conn.prepared, {name for name, in cursor})
+
+    def test_statements_dropped_by_the_server_are_prepared_again(self):
+        with Session() as session:
+            self.trip.save_to_db(session)
+            for first_statement in [None, 'SELECT 1']:
+                with CursorFromConnectionPool(session=session) as cursor:
+                    cursor.execute('DEALLOCATE ALL')
+                session.commit()
+                if first_statement:
+                    # Within a transaction already begun, the statement is run again within a savepoint
+                    with CursorFromConnectionPool(session=session) as cursor:
+                        cursor.execute(first_statement)
+                self.trip.save_to_db(session)
+            self.assertIsNotNone(Trip.load_by_id('9999', date(2000, 1, 1), session))
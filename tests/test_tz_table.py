@@ -0,0 +1,105 @@
+import unittest
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from data import tz_table
+from data.tz_table import TimeZoneTable
+from model.scheduleClasses import Airport, Itinerary
+from model.timeClasses import to_epoch_minutes, from_epoch_minutes
+
+ZONES = {'MEX': 'America/Mexico_City', 'MAD': 'Europe/Madrid', 'JFK': 'America/New_York',
+         'NRT': 'Asia/Tokyo', 'CUN': 'America/Cancun', 'GRU': 'America/Sap_Paulo'}
+
+
+def zoneinfo_offset(zone_name: str, minutes: int) -> int:
+    moment = datetime.fromtimestamp(minutes * 60, timezone.utc).astimezone(ZoneInfo(zone_name))
+    return int(moment.utcoffset().total_seconds()) // 60
+
+
+class TestTimeZoneTable(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.table = TimeZoneTable.compile(ZONES, 2014, 2016)
+
+    def test_unknown_zones_are_left_out(self):
+        self.assertNotIn('GRU', self.table.airport_codes)
+        self.assertEqual(5, len(self.table.zone_names))
+
+    def test_airports_left_out_are_named(self):
+        self.assertEqual(self.table.zone_of('MEX'), self.table.zone_of(Airport('TLC', 'America/Mexico_City')))
+        with self.assertRaisesRegex(ValueError, 'GRU'):
+            self.table.zone_of('GRU')
+        with self.assertRaisesRegex(ValueError, 'SCL'):
+            self.table.zone_of(Airport('SCL', 'America/Santiago'))
+
+    def test_offsets_as_zoneinfo(self):
+        first = to_epoch_minutes(datetime(2014, 1, 1))
+        minutes = np.arange(first, first + 3 * 365 * 24 * 60, 97)
+        for iata_code in ['MEX', 'MAD', 'JFK', 'NRT', 'CUN']:
+            expected = [zoneinfo_offset(ZONES[iata_code], int(m)) for m in minutes]
+            zones = np.full(len(minutes), self.table.zone_of(iata_code))
+            self.assertEqual(expected, self.table.utc_offsets(zones, minutes).tolist(), iata_code)
+
+    def test_local_offset(self):
+        # Madrid moved clocks forward on 29MAR2015 01:00 UTC
+        self.assertEqual(60, self.table.local_offset('MAD', to_epoch_minutes(datetime(2015, 3, 29, 0, 59))))
+        self.assertEqual(120, self.table.local_offset('MAD', to_epoch_minutes(datetime(2015, 3, 29, 1))))
+        self.assertEqual(-300, self.table.local_offset(Airport('MEX', 'America/Mexico_City'),
+                                                       to_epoch_minutes(datetime(2015, 7, 1))))
+
+    def test_to_utc_undoes_to_local(self):
+        first = to_epoch_minutes(datetime(2014, 1, 1))
+        minutes = np.arange(first, first + 3 * 365 * 24 * 60, 61)
+        zones = np.arange(len(minutes)) % len(self.table.zone_names)
+        local = self.table.to_local(zones, minutes)
+        utc = self.table.to_utc(zones, local)
+        # Repeated local times come back as either of the two UTC times they stand for
+        self.assertTrue(np.array_equal(local, self.table.to_local(zones, utc)))
+        self.assertLess(np.count_nonzero(utc != minutes), 100)
+
+    def test_save_and_load(self):
+        file_name = '/tmp/test_tz_table.npz'
+        self.table.save(file_name)
+        loaded = TimeZoneTable.load(file_name)
+        self.assertEqual(self.table.zone_names, loaded.zone_names)
+        self.assertTrue(np.array_equal(self.table.keys, loaded.keys))
+        self.assertEqual(self.table.local_offset('NRT', 0), loaded.local_offset('NRT', 0))
+
+
+class TestItineraryLocalTimes(unittest.TestCase):
+    def setUp(self):
+        tz_table.use(TimeZoneTable.compile(ZONES, 2018, 2018))
+
+    def tearDown(self):
+        tz_table.use(None)
+
+    def test_from_local(self):
+        mex = Airport('MEX', 'America/Mexico_City')
+        mad = Airport('MAD', 'Europe/Madrid')
+        itinerary = Itinerary.from_local(datetime(2018, 8, 1, 21, 30), mex, datetime(2018, 8, 2, 14, 5), mad)
+        self.assertTrue(itinerary.utc)
+        self.assertEqual(datetime(2018, 8, 2, 2, 30), itinerary.begin)
+        self.assertEqual(datetime(2018, 8, 2, 12, 5), itinerary.end)
+        self.assertEqual(datetime(2018, 8, 1, 21, 30), itinerary.begin_at(mex))
+        self.assertEqual(datetime(2018, 8, 2, 14, 5), itinerary.end_at(mad))
+        self.assertEqual(datetime(2018, 8, 2, 4, 30), itinerary.begin_at(mad))
+
+    def test_across_a_change_of_offset(self):
+        # Europe went back to winter time on 28OCT2018 01:00 UTC
+        itinerary = Itinerary(datetime(2018, 10, 28, 0, 30), datetime(2018, 10, 28, 1, 30), utc=True)
+        self.assertEqual(datetime(2018, 10, 28, 2, 30), itinerary.begin_at('MAD'))
+        self.assertEqual(datetime(2018, 10, 28, 2, 30), itinerary.end_at('MAD'))
+        self.assertEqual(from_epoch_minutes(itinerary._end + 60), itinerary.end_at('MAD'))
+
+    def test_local_itineraries_have_no_local_times(self):
+        itinerary = Itinerary(datetime(2018, 8, 1, 10), datetime(2018, 8, 1, 12))
+        with self.assertRaises(ValueError):
+            itinerary.begin_at('MEX')
+        with self.assertRaises(ValueError):
+            itinerary.end_at('MEX')
+
+
+if __name__ == '__main__':
+    unittest.main()